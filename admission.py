@@ -0,0 +1,188 @@
+import asyncio
+import heapq
+import itertools
+import math
+import time
+
+from config import (
+    ADMISSION_CHARS_PER_SECOND,
+    ADMISSION_MAX_CONCURRENT,
+    ADMISSION_MAX_QUEUE,
+    ADMISSION_MAX_QUEUE_PER_CLIENT,
+    ADMISSION_MAX_WAIT,
+    ADMISSION_SENTENCE_COST,
+)
+from metrics import admission_rejected_total
+
+# Longest Retry-After suggested to clients, in seconds
+MAX_RETRY_AFTER = 300
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request can't be queued, with the HTTP status to answer"""
+
+    def __init__(self, status_code, detail, retry_after):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+def estimate_cost(sentences):
+    """Estimate the synthesis cost of sentences from their characters"""
+    return sum(
+        len(sentence["text"]) + ADMISSION_SENTENCE_COST for sentence in sentences
+    )
+
+
+class Ticket:
+    """A request waiting for, or holding, a synthesis slot"""
+
+    def __init__(self, client, cost, future):
+        self.client = client
+        self.cost = cost
+        self.future = future
+        self.state = "queued"
+        self.started_at = None
+
+
+class AdmissionController:
+    """Bounded synthesis concurrency with a bounded, per-client fair wait queue.
+
+    Waiting requests are ordered by start-time fair queuing: each client's
+    requests are tagged one after another by cost, so a client with a large
+    batch queued waits behind other clients' small requests instead of
+    starving them. Runs on the event loop, so it needs no locking.
+    """
+
+    def __init__(
+        self,
+        max_concurrent=ADMISSION_MAX_CONCURRENT,
+        max_queue=ADMISSION_MAX_QUEUE,
+        max_queue_per_client=ADMISSION_MAX_QUEUE_PER_CLIENT,
+        max_wait=ADMISSION_MAX_WAIT,
+        chars_per_second=ADMISSION_CHARS_PER_SECOND,
+    ):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.max_queue_per_client = max_queue_per_client
+        self.max_wait = max_wait
+        # Measured synthesis speed of one request, used for Retry-After
+        self.chars_per_second = chars_per_second
+
+        self._queue = []
+        self._sequence = itertools.count()
+        self._virtual_time = 0.0
+        self._client_tags = {}
+        self._client_queued = {}
+        self._queued_cost = 0
+        self._running = 0
+        self._running_cost = 0
+
+    def _retry_after(self):
+        """Seconds for the queue to drain at the measured speed"""
+        cost = self._queued_cost + self._running_cost
+        seconds = cost / self.chars_per_second / self.max_concurrent
+        return max(1, min(math.ceil(seconds), MAX_RETRY_AFTER))
+
+    def _reject(self, status_code, detail):
+        admission_rejected_total.inc(status=status_code)
+        raise AdmissionRejected(status_code, detail, self._retry_after())
+
+    def _start(self, ticket):
+        ticket.state = "running"
+        ticket.started_at = time.perf_counter()
+        self._running += 1
+        self._running_cost += ticket.cost
+
+    def _dequeue(self, ticket):
+        self._queued_cost -= ticket.cost
+        self._client_queued[ticket.client] -= 1
+        if not self._client_queued[ticket.client]:
+            del self._client_queued[ticket.client]
+
+    def _dispatch(self):
+        """Start the waiting requests with the lowest tags while slots are free"""
+        while self._queue and self._running < self.max_concurrent:
+            tag, _, ticket = heapq.heappop(self._queue)
+            if ticket.state != "queued":
+                continue
+            self._dequeue(ticket)
+            self._virtual_time = tag
+            self._start(ticket)
+            ticket.future.set_result(None)
+
+        # Tags of clients that fell behind the virtual time are no longer needed
+        if len(self._client_tags) > self.max_queue * 4:
+            self._client_tags = {
+                client: tag
+                for client, tag in self._client_tags.items()
+                if tag > self._virtual_time
+            }
+
+    async def acquire(self, client, cost):
+        """Wait for a synthesis slot, or raise AdmissionRejected"""
+        loop = asyncio.get_running_loop()
+        ticket = Ticket(client, cost, loop.create_future())
+        tag = max(self._virtual_time, self._client_tags.get(client, 0.0))
+        if self._running < self.max_concurrent and not self._client_queued:
+            # Requests started right away still count towards the client's share
+            self._client_tags[client] = tag + cost
+            self._start(ticket)
+            return ticket
+
+        if sum(self._client_queued.values()) >= self.max_queue:
+            self._reject(503, "Server is busy, try again later")
+        if self._client_queued.get(client, 0) >= self.max_queue_per_client:
+            self._reject(429, "Too many queued requests for this client")
+
+        self._client_tags[client] = tag + cost
+        heapq.heappush(self._queue, (tag, next(self._sequence), ticket))
+        self._client_queued[client] = self._client_queued.get(client, 0) + 1
+        self._queued_cost += cost
+
+        try:
+            await asyncio.wait_for(asyncio.shield(ticket.future), self.max_wait)
+        except asyncio.TimeoutError:
+            self._abandon(ticket)
+            self._reject(503, "Timed out waiting for a synthesis slot")
+        except asyncio.CancelledError:
+            # The client went away while waiting
+            self._abandon(ticket)
+            raise
+        return ticket
+
+    def _abandon(self, ticket):
+        if ticket.state == "queued":
+            # Left in the heap and skipped when it comes up
+            ticket.state = "abandoned"
+            self._dequeue(ticket)
+        else:
+            self.release(ticket)
+
+    def release(self, ticket):
+        """Give back a slot and start the next waiting request; safe to repeat"""
+        if ticket.state != "running":
+            return
+        ticket.state = "released"
+        self._running -= 1
+        self._running_cost -= ticket.cost
+
+        elapsed = time.perf_counter() - ticket.started_at
+        if elapsed > 0 and ticket.cost:
+            # Smooth the measured speed so one outlier doesn't swing Retry-After
+            speed = ticket.cost / elapsed
+            self.chars_per_second = 0.8 * self.chars_per_second + 0.2 * speed
+        self._dispatch()
+
+    def stats(self):
+        """Report running and queued requests"""
+        return {
+            "running": self._running,
+            "max_concurrent": self.max_concurrent,
+            "queued": sum(self._client_queued.values()),
+            "max_queue": self.max_queue,
+            "queued_cost": self._queued_cost,
+            "queued_by_client": dict(self._client_queued),
+            "chars_per_second": self.chars_per_second,
+            "retry_after": self._retry_after(),
+        }
@@ -1,32 +1,88 @@
+import asyncio
+import json
+import logging
 import os
-from typing import List
+import re
+import time
 
-import numpy as np
-from fastapi import FastAPI, HTTPException
+# Taken before the heavier imports below, for the startup timings
+IMPORT_STARTED_AT = time.perf_counter()
+
+from contextlib import contextmanager
+from email.utils import formatdate, parsedate_to_datetime
+from typing import List, Optional
+
+from fastapi import FastAPI, HTTPException, Request, WebSocket
+from fastapi.concurrency import iterate_in_threadpool, run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
-from pydantic import BaseModel
+from fastapi.responses import (
+    FileResponse,
+    JSONResponse,
+    PlainTextResponse,
+    Response,
+    StreamingResponse,
+)
+from pydantic import BaseModel, field_validator
+from starlette.background import BackgroundTask
 
+from admission import AdmissionController, AdmissionRejected, estimate_cost
+from artifacts import (
+    artifact_store,
+    check_output_settings,
+    get_download_url,
+    get_file_etag,
+    get_file_hash,
+)
+from audio_index import INDEX_SUFFIX, encode_sentence_audio
+from cache import synthesis_cache
 from config import (
+    ADMISSION_CLIENT_HEADER,
     DEFAULT_MAX_PAUSE,
     DEFAULT_MIN_PAUSE,
-    DEFAULT_MODEL_FILE,
+    DEFAULT_MODEL,
+    DEFAULT_ONNX_PROFILE,
     DEFAULT_OUTPUT_FORMAT,
     DEFAULT_SAMPLE_RATE,
-    DEFAULT_VOICES_FILE,
+    DEFAULT_SENTENCE,
+    DEFAULT_STREAM_FORMAT,
+    DOCUMENT_MAX_BYTES,
+    DOWNLOAD_CACHE_CONTROL,
+    DOWNLOAD_MUTABLE_CACHE_CONTROL,
     LANGS,
-    TEMP_DIR,
+    MAX_SPEED,
+    MIN_SPEED,
+    MODELS,
+    MODELS_DIR,
+    ONNX_PROFILES,
+    OUTPUT_FORMATS,
+    VOICE_BLENDS,
 )
-from utils import (
-    generate_audio_for_sentence,
-    generate_silence,
-    load_kokoro_model,
-    save_final_audio,
-    save_sentence_audio,
+from documents import (
+    CHAPTER_INDEX_FILE,
+    DOCUMENT_FILE,
+    DOCUMENT_SETTINGS_FILE,
+    count_document_sentences,
+    render_document,
 )
+from health import Readiness
+from jobs import JobManager
+from live import LIVE_STREAM_FORMATS, LiveSession
+from metrics import metrics_registry, record_error, request_seconds, requests_total
+from parallel import close_synthesis_pools, get_synthesis_pool
+from phonemes import phoneme_cache
+from registry import model_registry
+from streaming import STREAM_MEDIA_TYPES, iter_audio_stream
+from utils import RenderCancelled, render_audio
+from voices import normalize_voice_spec
 
 app = FastAPI()
 
+logger = logging.getLogger(__name__)
+
+# Startup progress reported by the health probes
+readiness = Readiness(IMPORT_STARTED_AT)
+readiness.imported()
+
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -36,19 +92,123 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize Kokoro model
-try:
-    kokoro = load_kokoro_model(DEFAULT_MODEL_FILE, DEFAULT_VOICES_FILE)
-except Exception as e:
-    print(f"Error loading model: {e}")
-    kokoro = None
+# Latest job of each document, so a document isn't rendered twice at once
+document_jobs = {}
+
+
+def forget_document_job(job):
+    """Drop a document's job once the job manager has expired it"""
+    for request_id, document_job in list(document_jobs.items()):
+        if document_job is job:
+            del document_jobs[request_id]
+
+
+# Background jobs run synthesis on a bounded worker pool
+job_manager = JobManager(on_expire=forget_document_job)
+
+# Synchronous synthesis requests wait for a slot in a bounded, fair queue
+admission_controller = AdmissionController()
+
+# Media types of the files served by /download
+MEDIA_TYPES = {
+    ".mp3": "audio/mpeg",
+    ".wav": "audio/wav",
+    ".flac": "audio/flac",
+    ".ogg": "audio/ogg",
+    ".json": "application/json",
+}
+
+# Sentence audio is sliced out of the final file unless it was saved
+SENTENCE_FILE_PATTERN = re.compile(
+    rf"^sentence_(\d+)\.({'|'.join(map(re.escape, OUTPUT_FORMATS))})$"
+)
+
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    start = time.perf_counter()
+
+    def record(status):
+        # Label by route template so request ids don't create new series
+        route = request.scope.get("route")
+        endpoint = route.path if route else "unmatched"
+        requests_total.inc(endpoint=endpoint, status=status)
+        request_seconds.observe(time.perf_counter() - start, endpoint=endpoint)
+
+    try:
+        response = await call_next(request)
+    except Exception as e:
+        # Unhandled errors reach the client as a 500
+        record_error(e)
+        record(500)
+        raise
+    record(response.status_code)
+    return response
+
+
+def collect_cache_metrics():
+    stats = synthesis_cache.stats()
+    return [
+        ("audio_studio_cache_hit_rate", "Synthesis cache hit rate", stats["hit_rate"]),
+        (
+            "audio_studio_cache_memory_bytes",
+            "Synthesis cache memory tier size",
+            stats["memory_bytes"],
+        ),
+        (
+            "audio_studio_cache_disk_bytes",
+            "Synthesis cache disk tier size",
+            stats["disk_bytes"],
+        ),
+        (
+            "audio_studio_phoneme_cache_hit_rate",
+            "Phoneme cache hit rate",
+            phoneme_cache.stats()["hit_rate"],
+        ),
+    ]
+
+
+def collect_admission_metrics():
+    stats = admission_controller.stats()
+    return [
+        (
+            "audio_studio_admission_running",
+            "Synthesis requests holding a slot",
+            stats["running"],
+        ),
+        (
+            "audio_studio_admission_queue_depth",
+            "Synthesis requests waiting for a slot",
+            stats["queued"],
+        ),
+    ]
+
+
+metrics_registry.add_collector(collect_cache_metrics)
+metrics_registry.add_collector(collect_admission_metrics)
 
 
 class Sentence(BaseModel):
     text: str
     lang: str
+    # A voice name, a named blend or a weighted blend like "af_sarah:0.6,af_nicole:0.4"
     voice: str
     speed: float
+    # Pre-phonemized text, used instead of phonemizing the text
+    phonemes: Optional[str] = None
+
+    @field_validator("voice")
+    @classmethod
+    def check_voice(cls, voice):
+        normalize_voice_spec(voice)
+        return voice
+
+    @field_validator("speed")
+    @classmethod
+    def check_speed(cls, speed):
+        if not MIN_SPEED <= speed <= MAX_SPEED:
+            raise ValueError(f"Speed must be between {MIN_SPEED} and {MAX_SPEED}")
+        return speed
 
 
 class AudioRequest(BaseModel):
@@ -56,92 +216,676 @@ class AudioRequest(BaseModel):
     min_pause: float = DEFAULT_MIN_PAUSE
     max_pause: float = DEFAULT_MAX_PAUSE
     output_format: str = DEFAULT_OUTPUT_FORMAT
+    sample_rate: int = DEFAULT_SAMPLE_RATE
+    # Target bitrate (bits per second) of Opus output
+    bitrate: Optional[int] = None
+    parallel: bool = False
+    model: str = DEFAULT_MODEL
+    profile: str = DEFAULT_ONNX_PROFILE
+    sentence_files: bool = False
 
 
-@app.post("/generate-audio")
-async def generate_audio(request: AudioRequest):
-    if not kokoro:
-        raise HTTPException(status_code=500, detail="TTS model not initialized")
+class StreamRequest(BaseModel):
+    sentences: List[Sentence]
+    min_pause: float = DEFAULT_MIN_PAUSE
+    max_pause: float = DEFAULT_MAX_PAUSE
+    stream_format: str = DEFAULT_STREAM_FORMAT
+    sample_rate: int = DEFAULT_SAMPLE_RATE
+    model: str = DEFAULT_MODEL
+    profile: str = DEFAULT_ONNX_PROFILE
 
-    try:
-        # Generate audio for all sentences
-        audios = []
-        sentence_files = []
-        sample_rate = DEFAULT_SAMPLE_RATE
 
-        for idx, sentence in enumerate(request.sentences):
-            # Generate audio for sentence
-            samples, sample_rate = generate_audio_for_sentence(
-                kokoro,
-                {
-                    "text": sentence.text,
-                    "lang": sentence.lang,
-                    "voice": sentence.voice,
-                    "speed": sentence.speed,
-                },
-                sample_rate,
-            )
-            audios.append(samples)
+class ModelRequest(BaseModel):
+    model_file: str
+    voices_file: str
 
-            # Save individual sentence audio
-            sentence_files.append(
-                save_sentence_audio(samples, sample_rate, idx, request.output_format)
-            )
 
-            # Add silence between sentences (except for last sentence)
-            if idx < len(request.sentences) - 1:
-                silence = generate_silence(
-                    sample_rate, request.min_pause, request.max_pause
-                )
-                audios.append(silence)
+def get_request_sentences(request):
+    """Convert request sentences to the dicts used by the synthesis helpers"""
+    sentences = []
+    for sentence in request.sentences:
+        data = {
+            "text": sentence.text,
+            "lang": sentence.lang,
+            "voice": sentence.voice,
+            "speed": sentence.speed,
+        }
+        if sentence.phonemes:
+            data["phonemes"] = sentence.phonemes
+        sentences.append(data)
+    return sentences
+
+
+def get_sentence_urls(audio_file, count):
+    """Download URLs of each sentence of a rendered file"""
+    output_dir, file_name = os.path.split(audio_file)
+    extension = os.path.splitext(file_name)[1]
+    return [
+        get_download_url(os.path.join(output_dir, f"sentence_{idx}{extension}"))
+        for idx in range(count)
+    ]
+
+
+def get_sentence_source(request_id, file_name):
+    """Find (final file, sentence index, format) a sentence is sliced from, or None"""
+    match = SENTENCE_FILE_PATTERN.match(file_name)
+    if not match:
+        return None
+
+    index_file = artifact_store.get_path(request_id, f"output{INDEX_SUFFIX}")
+    if not index_file:
+        return None
+    with open(index_file) as f:
+        audio_file = artifact_store.get_path(request_id, json.load(f)["file"])
+    if not audio_file:
+        return None
+    return audio_file, int(match.group(1)), match.group(2)
+
+
+def get_cache_headers(file_name, etag, last_modified):
+    """Validators and caching policy of a downloadable file"""
+    # The chapter index is rewritten while a document renders
+    if file_name == CHAPTER_INDEX_FILE:
+        cache_control = DOWNLOAD_MUTABLE_CACHE_CONTROL
+    else:
+        cache_control = DOWNLOAD_CACHE_CONTROL
+    return {
+        "ETag": etag,
+        "Last-Modified": formatdate(last_modified, usegmt=True),
+        "Cache-Control": cache_control,
+    }
+
+
+def is_not_modified(request, etag, last_modified):
+    """Evaluate If-None-Match, or If-Modified-Since when there is no ETag check"""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        # If-None-Match uses the weak comparison
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return "*" in tags or etag in tags
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+        return int(last_modified) <= since
+    return False
+
+
+def get_client_id(request):
+    """Identify the caller for fair queuing"""
+    client_id = request.headers.get(ADMISSION_CLIENT_HEADER)
+    if client_id:
+        return client_id
+    return request.client.host if request.client else "unknown"
 
-        # Concatenate all audio samples
-        combined_samples = np.concatenate(audios)
 
-        # Save final audio file
-        audio_file = save_final_audio(
-            combined_samples, sample_rate, request.output_format
+async def admit_request(http_request, sentences):
+    """Wait for a synthesis slot, answering 429/503 with Retry-After when full"""
+    try:
+        return await admission_controller.acquire(
+            get_client_id(http_request), estimate_cost(sentences)
+        )
+    except AdmissionRejected as e:
+        raise HTTPException(
+            status_code=e.status_code,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)},
         )
 
+
+@contextmanager
+def job_admission(loop, job, client_id, sentences):
+    """Hold a synthesis slot from a job thread, so jobs share the admission queue.
+
+    A job has no client to retry it, so when the queue is full it waits for
+    the Retry-After and asks again, until it gets a slot or is cancelled.
+    """
+    cost = estimate_cost(sentences)
+    while True:
+        try:
+            ticket = asyncio.run_coroutine_threadsafe(
+                admission_controller.acquire(client_id, cost), loop
+            ).result()
+            break
+        except AdmissionRejected as e:
+            for _ in range(e.retry_after):
+                if job.is_cancelled():
+                    raise RenderCancelled("Render cancelled")
+                time.sleep(1)
+
+    try:
+        yield
+    finally:
+        # The controller runs on the event loop
+        loop.call_soon_threadsafe(admission_controller.release, ticket)
+
+
+def check_sentence_settings(lang, voice, speed):
+    """Raise ValueError for a language, voice or speed that can't be spoken"""
+    if lang not in LANGS.values():
+        raise ValueError(f"Unsupported language: {lang}")
+    normalize_voice_spec(voice)
+    if not MIN_SPEED <= speed <= MAX_SPEED:
+        raise ValueError(f"Speed must be between {MIN_SPEED} and {MAX_SPEED}")
+
+
+def check_request_output(request):
+    """Reject output formats and sample rates that can't be written"""
+    try:
+        check_output_settings(request.output_format, request.sample_rate)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def get_request_pool(request):
+    """Get the worker pool when the request opts into parallel synthesis"""
+    if not request.parallel:
+        return None
+    return get_synthesis_pool(
+        *model_registry.get_files(request.model), profile=request.profile
+    )
+
+
+async def get_model(name, profile=DEFAULT_ONNX_PROFILE):
+    """Get a registered model, loading it off the event loop on first use"""
+    if profile not in ONNX_PROFILES:
+        raise HTTPException(status_code=400, detail=f"Unknown ONNX profile: {profile}")
+
+    try:
+        return await run_in_threadpool(model_registry.get_named, name, profile)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Unknown model: {name}")
+    except Exception as e:
+        logger.exception("Error loading model")
+        record_error(e)
+        raise HTTPException(status_code=500, detail=f"TTS model not initialized: {e}")
+
+
+@app.post("/generate-audio")
+async def generate_audio(request: AudioRequest, http_request: Request):
+    check_request_output(request)
+    kokoro = await get_model(request.model, request.profile)
+    sentences = get_request_sentences(request)
+    ticket = await admit_request(http_request, sentences)
+
+    try:
+        # Run synthesis off the event loop so other requests are still served
+        with artifact_store.new_request() as (_, request_dir):
+            audio_file, _ = await run_in_threadpool(
+                render_audio,
+                kokoro,
+                sentences,
+                DEFAULT_SAMPLE_RATE,
+                request.min_pause,
+                request.max_pause,
+                request.output_format,
+                synthesis_cache,
+                get_request_pool(request),
+                request_dir,
+                save_sentences=request.sentence_files,
+                output_rate=request.sample_rate,
+                bitrate=request.bitrate,
+            )
+
         return {
-            "url_download": f"/download/{os.path.basename(audio_file)}",
+            "url_download": get_download_url(audio_file),
+            "url_sentences": get_sentence_urls(audio_file, len(request.sentences)),
         }
 
     except Exception as e:
+        record_error(e)
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        admission_controller.release(ticket)
 
 
-@app.get("/download/{file_name}")
-async def download_audio(file_name: str):
-    file_path = os.path.join(TEMP_DIR, file_name)
-    if not os.path.exists(file_path):
-        raise HTTPException(status_code=404, detail="File not found")
+@app.post("/generate-audio/stream")
+async def generate_audio_stream(request: StreamRequest, http_request: Request):
+    kokoro = await get_model(request.model, request.profile)
+
+    if request.stream_format not in STREAM_MEDIA_TYPES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported stream format: {request.stream_format}",
+        )
+
+    # The Ogg stream is Opus like Ogg files, PCM takes any rate a WAV does
+    try:
+        check_output_settings(
+            "ogg" if request.stream_format == "ogg" else "wav", request.sample_rate
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    media_type = STREAM_MEDIA_TYPES[request.stream_format]
+    if request.stream_format == "pcm":
+        media_type = f"{media_type};rate={request.sample_rate};channels=1"
+
+    sentences = get_request_sentences(request)
+    ticket = await admit_request(http_request, sentences)
 
-    # Determine media type based on file extension
+    # The generator is iterated in the threadpool, one sentence per chunk, and
+    # the slot is held until the last chunk is sent
+    async def stream():
+        try:
+            async for chunk in iterate_in_threadpool(
+                iter_audio_stream(
+                    kokoro,
+                    sentences,
+                    DEFAULT_SAMPLE_RATE,
+                    request.min_pause,
+                    request.max_pause,
+                    request.stream_format,
+                    synthesis_cache,
+                    request.sample_rate,
+                )
+            ):
+                yield chunk
+        finally:
+            admission_controller.release(ticket)
+
+    # The background task also releases the slot when the stream never starts
+    return StreamingResponse(
+        stream(),
+        media_type=media_type,
+        background=BackgroundTask(admission_controller.release, ticket),
+    )
+
+
+@app.websocket("/generate-audio/live")
+async def generate_audio_live(
+    websocket: WebSocket,
+    lang: str = DEFAULT_SENTENCE["lang"],
+    voice: str = DEFAULT_SENTENCE["voice"],
+    speed: float = DEFAULT_SENTENCE["speed"],
+    min_pause: float = DEFAULT_MIN_PAUSE,
+    max_pause: float = DEFAULT_MAX_PAUSE,
+    stream_format: str = "pcm",
+    sample_rate: int = DEFAULT_SAMPLE_RATE,
+    model: str = DEFAULT_MODEL,
+    profile: str = DEFAULT_ONNX_PROFILE,
+):
+    await websocket.accept()
+    try:
+        if stream_format not in LIVE_STREAM_FORMATS:
+            raise ValueError(f"Unsupported stream format: {stream_format}")
+        check_sentence_settings(lang, voice, speed)
+        check_output_settings("wav", sample_rate)
+        kokoro = await get_model(model, profile)
+    except (ValueError, HTTPException) as e:
+        await websocket.send_json(
+            {"type": "error", "detail": getattr(e, "detail", str(e))}
+        )
+        await websocket.close(code=1008)
+        return
+
+    # Each sentence waits for a synthesis slot like a request of its own
+    session = LiveSession(
+        websocket,
+        kokoro,
+        {"lang": lang, "voice": voice, "speed": speed},
+        DEFAULT_SAMPLE_RATE,
+        min_pause,
+        max_pause,
+        stream_format,
+        sample_rate,
+        synthesis_cache,
+        admission_controller,
+        get_client_id(websocket),
+    )
+    await session.run()
+
+
+@app.post("/jobs", status_code=202)
+async def create_job(request: AudioRequest, http_request: Request):
+    check_request_output(request)
+    kokoro = await get_model(request.model, request.profile)
+
+    sentences = get_request_sentences(request)
+    pool = get_request_pool(request)
+    loop = asyncio.get_running_loop()
+    client_id = get_client_id(http_request)
+
+    def render(job):
+        admission = job_admission(loop, job, client_id, sentences)
+        with admission, artifact_store.new_request() as (_, request_dir):
+            audio_file, _ = render_audio(
+                kokoro,
+                sentences,
+                DEFAULT_SAMPLE_RATE,
+                request.min_pause,
+                request.max_pause,
+                request.output_format,
+                synthesis_cache,
+                pool,
+                request_dir,
+                on_progress=lambda done, total: job.set_progress(done),
+                should_cancel=job.is_cancelled,
+                save_sentences=request.sentence_files,
+                output_rate=request.sample_rate,
+                bitrate=request.bitrate,
+            )
+        return audio_file
+
+    job = job_manager.submit(render, len(sentences))
+    return job.to_dict()
+
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    job = await run_in_threadpool(job_manager.describe, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    return job
+
+
+@app.delete("/jobs/{job_id}")
+async def cancel_job(job_id: str):
+    job = await run_in_threadpool(job_manager.cancel, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    return job
+
+
+async def submit_document_job(request_id, settings, client_id):
+    """Queue the render of an uploaded document, resuming any earlier progress"""
+    kokoro = await get_model(settings["model"], settings["profile"])
+    loop = asyncio.get_running_loop()
+
+    job = document_jobs.get(request_id)
+    if job and job.status in ("queued", "running"):
+        raise HTTPException(status_code=409, detail="Document is already rendering")
+
+    def render(job):
+        with artifact_store.open_request(request_id) as (_, request_dir):
+            document_file = os.path.join(request_dir, DOCUMENT_FILE)
+            with open(document_file, encoding="utf-8", errors="replace") as f:
+                job.total = count_document_sentences(f, settings["lang"])
+
+            with open(document_file, encoding="utf-8", errors="replace") as f:
+                return render_document(
+                    kokoro,
+                    f,
+                    settings["lang"],
+                    settings["voice"],
+                    settings["speed"],
+                    DEFAULT_SAMPLE_RATE,
+                    settings["min_pause"],
+                    settings["max_pause"],
+                    settings["output_format"],
+                    request_dir,
+                    synthesis_cache,
+                    on_progress=job.set_progress,
+                    should_cancel=job.is_cancelled,
+                    # Each chunk waits for a slot, so renders share the queue
+                    admission=lambda sentences: job_admission(
+                        loop, job, client_id, sentences
+                    ),
+                )
+
+    job = job_manager.submit(render, 0)
+    document_jobs[request_id] = job
+    return dict(job.to_dict(), request_id=request_id)
+
+
+@app.post("/documents", status_code=202)
+async def create_document_job(
+    request: Request,
+    lang: str = DEFAULT_SENTENCE["lang"],
+    voice: str = DEFAULT_SENTENCE["voice"],
+    speed: float = DEFAULT_SENTENCE["speed"],
+    min_pause: float = DEFAULT_MIN_PAUSE,
+    max_pause: float = DEFAULT_MAX_PAUSE,
+    output_format: str = DEFAULT_OUTPUT_FORMAT,
+    model: str = DEFAULT_MODEL,
+    profile: str = DEFAULT_ONNX_PROFILE,
+):
+    settings = {
+        "lang": lang,
+        "voice": voice,
+        "speed": speed,
+        "min_pause": min_pause,
+        "max_pause": max_pause,
+        "output_format": output_format,
+        "model": model,
+        "profile": profile,
+    }
+    # Documents are rendered at the model's rate
+    try:
+        check_output_settings(output_format, DEFAULT_SAMPLE_RATE)
+        check_sentence_settings(lang, voice, speed)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    await get_model(model, profile)
+
+    too_large_detail = f"Documents are limited to {DOCUMENT_MAX_BYTES} bytes"
+    if int(request.headers.get("content-length") or 0) > DOCUMENT_MAX_BYTES:
+        raise HTTPException(status_code=413, detail=too_large_detail)
+
+    # The document is streamed to disk, it is never held in memory whole
+    size = 0
+    with artifact_store.new_request() as (request_id, request_dir):
+        with open(os.path.join(request_dir, DOCUMENT_FILE), "wb") as f:
+            async for chunk in request.stream():
+                size += len(chunk)
+                if size > DOCUMENT_MAX_BYTES:
+                    break
+                await run_in_threadpool(f.write, chunk)
+        if size <= DOCUMENT_MAX_BYTES:
+            with open(os.path.join(request_dir, DOCUMENT_SETTINGS_FILE), "w") as f:
+                json.dump(settings, f)
+
+    if size > DOCUMENT_MAX_BYTES:
+        artifact_store.remove(request_id)
+        raise HTTPException(status_code=413, detail=too_large_detail)
+
+    return await submit_document_job(request_id, settings, get_client_id(request))
+
+
+@app.post("/documents/{request_id}/resume", status_code=202)
+async def resume_document_job(request_id: str, http_request: Request):
+    try:
+        with artifact_store.open_request(request_id) as (_, request_dir):
+            with open(os.path.join(request_dir, DOCUMENT_SETTINGS_FILE)) as f:
+                settings = json.load(f)
+    except (KeyError, OSError):
+        raise HTTPException(status_code=404, detail="Document not found")
+
+    return await submit_document_job(
+        request_id, settings, get_client_id(http_request)
+    )
+
+
+@app.api_route("/download/{request_id}/{file_name}", methods=["GET", "HEAD"])
+async def download_audio(request: Request, request_id: str, file_name: str):
+    # Default to WAV for unknown extensions
     file_extension = os.path.splitext(file_name)[1].lower()
-    if file_extension == ".mp3":
-        media_type = "audio/mpeg"
-    elif file_extension == ".wav":
-        media_type = "audio/wav"
-    else:
-        media_type = "audio/wav"  # Default fallback
+    media_type = MEDIA_TYPES.get(file_extension, "audio/wav")
+
+    file_path = artifact_store.get_path(request_id, file_name)
+    if file_path:
+        etag = await run_in_threadpool(get_file_etag, file_path)
+        last_modified = os.path.getmtime(file_path)
+        headers = get_cache_headers(file_name, etag, last_modified)
+        if is_not_modified(request, etag, last_modified):
+            return Response(status_code=304, headers=headers)
 
-    return FileResponse(file_path, media_type=media_type, filename=file_name)
+        # FileResponse answers Range requests (206) and streams from disk
+        return FileResponse(
+            file_path, media_type=media_type, filename=file_name, headers=headers
+        )
+
+    source = await run_in_threadpool(get_sentence_source, request_id, file_name)
+    if source is None:
+        raise HTTPException(status_code=404, detail="File not found")
+
+    # A slice only changes with the final file it is cut from
+    audio_file, idx, output_format = source
+    file_hash = await run_in_threadpool(get_file_hash, audio_file)
+    etag = f'"{file_hash}-{idx}.{output_format}"'
+    last_modified = os.path.getmtime(audio_file)
+    headers = get_cache_headers(file_name, etag, last_modified)
+    if is_not_modified(request, etag, last_modified):
+        return Response(status_code=304, headers=headers)
+
+    try:
+        content = await run_in_threadpool(
+            encode_sentence_audio, audio_file, idx, output_format
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if content is None:
+        raise HTTPException(status_code=404, detail="File not found")
+
+    headers["Content-Disposition"] = f'attachment; filename="{file_name}"'
+    return Response(content, media_type=media_type, headers=headers)
 
 
 # Add route before the main block
 @app.get("/voices")
-async def list_voices():
-    if not kokoro:
-        raise HTTPException(status_code=500, detail="TTS model not initialized")
+async def list_voices(model: str = DEFAULT_MODEL):
+    kokoro = await get_model(model)
 
     try:
         # Get available voices from the model
         voices = kokoro.get_voices()
-        return {"voices": voices}
+        return {"voices": voices, "blends": VOICE_BLENDS}
+    except Exception as e:
+        record_error(e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/models")
+async def list_models():
+    return {"models": model_registry.list_models()}
+
+
+def check_model_files(*paths):
+    """Only accept files in the models directory or configured in MODELS"""
+    models_dir = os.path.realpath(MODELS_DIR)
+    configured = {
+        os.path.realpath(path) for files in MODELS.values() for path in files
+    }
+    for path in paths:
+        real_path = os.path.realpath(path)
+        if real_path in configured:
+            continue
+        if os.path.commonpath([real_path, models_dir]) != models_dir:
+            raise HTTPException(
+                status_code=403,
+                detail=f"Model files must be in the {MODELS_DIR} directory",
+            )
+
+
+@app.put("/models/{name}")
+async def register_model(name: str, request: ModelRequest):
+    check_model_files(request.model_file, request.voices_file)
+
+    # The new model is loaded and warmed up before requests switch to it
+    try:
+        await run_in_threadpool(
+            model_registry.register, name, request.model_file, request.voices_file
+        )
     except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return {"models": model_registry.list_models()}
+
+
+@app.post("/models/{name}/reload")
+async def reload_model(name: str):
+    try:
+        files = model_registry.get_files(name)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Unknown model: {name}")
+
+    try:
+        await run_in_threadpool(model_registry.reload, *files)
+    except Exception as e:
+        record_error(e)
         raise HTTPException(status_code=500, detail=str(e))
 
+    return {"models": model_registry.list_models()}
+
+
+@app.get("/profiles")
+async def list_profiles():
+    return {"default": DEFAULT_ONNX_PROFILE, "profiles": ONNX_PROFILES}
+
+
+@app.get("/cache")
+async def cache_stats():
+    return dict(synthesis_cache.stats(), phonemes=phoneme_cache.stats())
+
+
+@app.get("/admission")
+async def admission_stats():
+    return admission_controller.stats()
+
+
+@app.get("/artifacts")
+async def artifact_stats():
+    return await run_in_threadpool(artifact_store.stats)
+
+
+@app.get("/metrics")
+async def metrics():
+    return PlainTextResponse(
+        metrics_registry.render(), media_type="text/plain; version=0.0.4"
+    )
+
+
+@app.get("/health/live")
+async def health_live():
+    # Answers as soon as the server runs, even while the model loads
+    return {"status": "alive"}
+
+
+@app.get("/health/ready")
+async def health_ready():
+    data = readiness.describe()
+    if not readiness.is_ready():
+        return JSONResponse(data, status_code=503)
+    return data
+
+
+def load_startup_model():
+    """Load and warm up the default model, recording progress for /health/ready"""
+    try:
+        model_registry.get_named(
+            DEFAULT_MODEL, DEFAULT_ONNX_PROFILE, progress=readiness.set_stage
+        )
+    except Exception as e:
+        logger.exception("Error loading model")
+        record_error(e)
+        readiness.set_failed(e)
+        return
+    readiness.set_ready()
+    print(
+        f"Ready in {readiness.ready_seconds:.2f}s "
+        f"(imports took {readiness.import_seconds:.2f}s)"
+    )
+
+
+@app.on_event("startup")
+async def load_default_model():
+    # Load in the background, so the server answers the health probes while
+    # the model loads; requests arriving first wait for the same load
+    app.state.model_loader = asyncio.create_task(
+        run_in_threadpool(load_startup_model)
+    )
+
+
+@app.on_event("shutdown")
+async def shutdown_workers():
+    job_manager.shutdown()
+    close_synthesis_pools()
+
 
 if __name__ == "__main__":
     import uvicorn
@@ -1,31 +1,50 @@
 import os
 
-import numpy as np
 import streamlit as st
 
 # Must be the first Streamlit command
 st.set_page_config(page_title="Audio Studio AI", layout="wide")
 
+from artifacts import artifact_store, get_request_id
+from audio_index import encode_sentence_audio, wav_header
+from cache import make_cache_key, synthesis_cache
 from config import (
     DEFAULT_MAX_PAUSE,
     DEFAULT_MIN_PAUSE,
     DEFAULT_MODEL_FILE,
+    DEFAULT_ONNX_PROFILE,
     DEFAULT_OUTPUT_FORMAT,
     DEFAULT_SAMPLE_RATE,
+    DEFAULT_SENTENCE,
     DEFAULT_VOICES_FILE,
     LANGS,
+    ONNX_PROFILES,
+    OUTPUT_FORMATS,
+    OUTPUT_SAMPLE_RATES,
+    PARALLEL_ONNX_THREADS,
+    PARALLEL_WORKERS,
 )
+from documents import (
+    DOCUMENT_FILE,
+    count_document_sentences,
+    load_chapter_index,
+    render_document,
+)
+from metrics import collect_timings
+from parallel import get_synthesis_pool
+from profiles import get_profile, resolve_model_variant
+from registry import model_registry
+from session_audio import SessionAudioStore, read_file
+from streaming import to_pcm16
+from timestretch import stretch_to_speed
 from utils import (
+    assemble_audio,
     create_new_sentence,
     export_sentences,
-    generate_audio_for_sentence,
-    generate_silence,
+    generate_audio_for_sentences,
     get_voices_for_lang,
     import_sentences,
-    load_kokoro_model,
     move_sentence,
-    save_final_audio,
-    save_sentence_audio,
     validate_voice_for_lang,
 )
 
@@ -38,8 +57,21 @@ def init_session_state():
         st.session_state.audio_generated = False
     if "audio_file" not in st.session_state:
         st.session_state.audio_file = ""
-    if "sentence_files" not in st.session_state:
-        st.session_state.sentence_files = []
+    if "audio_sentences" not in st.session_state:
+        st.session_state.audio_sentences = 0
+    # Encoded audio of this session, so reruns don't read it from disk again
+    if "audio_store" not in st.session_state:
+        st.session_state.audio_store = SessionAudioStore()
+    # Request directory of the document being rendered, to resume it
+    if "document_request" not in st.session_state:
+        st.session_state.document_request = None
+    # Synthesized samples of each sentence, keyed by its fingerprint
+    if "sentence_samples" not in st.session_state:
+        st.session_state.sentence_samples = {}
+    # (text, lang, voice) -> (speed, fingerprint) of the last synthesis,
+    # which speed previews are stretched from
+    if "speed_sources" not in st.session_state:
+        st.session_state.speed_sources = {}
     # This ID will be used to create unique keys for all UI components
     if "ui_key_base" not in st.session_state:
         st.session_state.ui_key_base = 0
@@ -113,7 +145,7 @@ def render_sidebar():
 
     st.sidebar.markdown("#### Audio Settings")
 
-    output_formats = ["wav", "mp3"]
+    output_formats = list(OUTPUT_FORMATS)
     config = {
         "output_format": st.sidebar.selectbox(
             "Output format",
@@ -141,6 +173,40 @@ def render_sidebar():
             0.1,
             key=f"max_pause_{st.session_state.ui_key_base}",
         ),
+    }
+
+    # Only the sample rates the chosen encoder accepts are offered
+    encoding = OUTPUT_FORMATS[config["output_format"]]
+    sample_rates = [
+        rate
+        for rate in OUTPUT_SAMPLE_RATES
+        if not encoding["sample_rates"] or rate in encoding["sample_rates"]
+    ]
+    config["sample_rate"] = st.sidebar.selectbox(
+        "Sample rate (Hz)",
+        sample_rates,
+        index=(
+            sample_rates.index(DEFAULT_SAMPLE_RATE)
+            if DEFAULT_SAMPLE_RATE in sample_rates
+            else 0
+        ),
+        key=f"sample_rate_{st.session_state.ui_key_base}",
+    )
+    config["bitrate"] = None
+    if encoding.get("bitrate"):
+        config["bitrate"] = (
+            st.sidebar.slider(
+                "Bitrate (kbps)",
+                8,
+                256,
+                encoding["bitrate"] // 1000,
+                8,
+                key=f"bitrate_{st.session_state.ui_key_base}",
+            )
+            * 1000
+        )
+
+    config |= {
         "model_file": st.sidebar.text_input(
             "Model file (.onnx)",
             DEFAULT_MODEL_FILE,
@@ -151,8 +217,39 @@ def render_sidebar():
             DEFAULT_VOICES_FILE,
             key=f"voices_file_{st.session_state.ui_key_base}",
         ),
+        "profile": st.sidebar.selectbox(
+            "ONNX profile",
+            list(ONNX_PROFILES),
+            index=(
+                list(ONNX_PROFILES).index(DEFAULT_ONNX_PROFILE)
+                if DEFAULT_ONNX_PROFILE in ONNX_PROFILES
+                else 0
+            ),
+            key=f"profile_{st.session_state.ui_key_base}",
+        ),
+        "parallel": st.sidebar.checkbox(
+            "Parallel synthesis",
+            False,
+            key=f"parallel_{st.session_state.ui_key_base}",
+        ),
     }
 
+    if config["parallel"]:
+        config["parallel_workers"] = st.sidebar.number_input(
+            "Worker processes",
+            1,
+            os.cpu_count() or 1,
+            PARALLEL_WORKERS,
+            key=f"parallel_workers_{st.session_state.ui_key_base}",
+        )
+        config["onnx_threads"] = st.sidebar.number_input(
+            "ONNX threads per worker",
+            1,
+            os.cpu_count() or 1,
+            PARALLEL_ONNX_THREADS,
+            key=f"onnx_threads_{st.session_state.ui_key_base}",
+        )
+
     # Import functionality
     st.sidebar.markdown("---")
     st.sidebar.markdown("#### Import/Export Sentences")
@@ -255,6 +352,39 @@ def render_sentence_editor(idx, sent):
         delete_sentence_callback(idx)
         st.rerun()
 
+    render_speed_preview(sent)
+
+
+def render_speed_preview(sent):
+    """Play a sentence at a new speed by time-stretching its last synthesis.
+
+    Only a preview: generating the audio synthesizes the sentence again at
+    the new speed, which sounds more natural than stretched audio.
+    """
+    source = st.session_state.speed_sources.get(
+        (sent["text"], sent["lang"], sent["voice"])
+    )
+    if source is None:
+        return
+    speed, fingerprint = source
+    audio = st.session_state.sentence_samples.get(fingerprint)
+    if audio is None or abs(sent["speed"] - speed) < 1e-6:
+        return
+
+    def encode_preview():
+        samples, sample_rate = audio
+        pcm = to_pcm16(stretch_to_speed(samples, sample_rate, speed, sent["speed"]))
+        return wav_header(sample_rate, len(pcm)) + pcm
+
+    preview = st.session_state.audio_store.get(
+        ("speed_preview", fingerprint, round(sent["speed"], 2)), encode_preview
+    )
+    st.caption(
+        f"Preview at speed {sent['speed']:.1f}, stretched from the audio "
+        f"generated at {speed:.1f}"
+    )
+    st.audio(preview, format="audio/wav")
+
 
 def render_sentences_tab():
     """Render the sentences editor tab"""
@@ -272,80 +402,166 @@ def render_sentences_tab():
         st.rerun()
 
 
-def render_generation_tab(config):
-    """Render the audio generation tab"""
-    st.header("Audio Generation")
-
-    if st.button("Generate Audio", key=f"gen_audio_{st.session_state.ui_key_base}"):
-        st.session_state.audio_generated = False
-        st.session_state.audio_file = ""
-        st.session_state.sentence_files = []
-
-        # Validate model files
-        if not os.path.exists(config["model_file"]):
-            st.error(f"Model file not found: {config['model_file']}")
-            st.info(
-                "Please download the model files and place them in the app directory."
-            )
-            return
-
-        if not os.path.exists(config["voices_file"]):
-            st.error(f"Voices file not found: {config['voices_file']}")
-            st.info(
-                "Please download the voices file and place it in the app directory."
-            )
-            return
-
+def get_sentence_fingerprints(sentences, config):
+    """Fingerprint each sentence by its text, lang, voice, speed and model files"""
+    # Quantized profiles load a different model file, so they synthesize anew
+    model_file = resolve_model_variant(
+        config["model_file"], get_profile(config["profile"]).get("variant")
+    )
+    return [
+        make_cache_key(sent, model_file, config["voices_file"]) for sent in sentences
+    ]
+
+
+def validate_model_files(config):
+    """Check that the configured model files exist, showing an error if not"""
+    if not os.path.exists(config["model_file"]):
+        st.error(f"Model file not found: {config['model_file']}")
+        st.info("Please download the model files and place them in the app directory.")
+        return False
+
+    if not os.path.exists(config["voices_file"]):
+        st.error(f"Voices file not found: {config['voices_file']}")
+        st.info("Please download the voices file and place it in the app directory.")
+        return False
+
+    return True
+
+
+def generate_audio(config):
+    """Synthesize changed sentences and assemble the final audio"""
+    # Release the files of this session's previous generation
+    if st.session_state.audio_file:
+        artifact_store.remove(get_request_id(st.session_state.audio_file))
+    st.session_state.audio_store.clear()
+    st.session_state.audio_generated = False
+    st.session_state.audio_file = ""
+
+    if not validate_model_files(config):
+        return False
+
+    # Only sentences whose fingerprint changed since the last generation
+    # need synthesis, reordered and deleted ones reuse the stored samples
+    sentences = st.session_state.sentences
+    fingerprints = get_sentence_fingerprints(sentences, config)
+    stored = st.session_state.sentence_samples
+    dirty = {}
+    for fingerprint, sent in zip(fingerprints, sentences):
+        if fingerprint not in stored:
+            dirty[fingerprint] = sent
+
+    progress = st.progress(0, "Generating audio for sentences...")
+
+    if dirty:
         # Load model and generate audio
         with st.spinner("Loading Kokoro model..."):
             try:
-                kokoro = load_kokoro_model(config["model_file"], config["voices_file"])
+                kokoro = model_registry.get(
+                    config["model_file"], config["voices_file"], config["profile"]
+                )
             except Exception as e:
                 st.error(str(e))
-                return
-
-        audios = []
-        sentence_files = []
+                return False
+
+        pool = None
+        if config["parallel"]:
+            pool = get_synthesis_pool(
+                config["model_file"],
+                config["voices_file"],
+                config["parallel_workers"],
+                config["onnx_threads"],
+                config["profile"],
+            )
 
-        progress = st.progress(0, "Generating audio for sentences...")
-        for i, sent in enumerate(st.session_state.sentences):
+        # Generate audio for changed sentences, reusing cached synthesis
+        for i, (fingerprint, audio) in enumerate(
+            zip(
+                dirty,
+                generate_audio_for_sentences(
+                    kokoro,
+                    list(dirty.values()),
+                    DEFAULT_SAMPLE_RATE,
+                    synthesis_cache,
+                    pool,
+                ),
+            )
+        ):
+            stored[fingerprint] = audio
             progress.progress(
-                i / len(st.session_state.sentences),
-                f"Processing sentence {i+1}/{len(st.session_state.sentences)}",
+                (i + 1) / len(dirty),
+                f"Synthesized changed sentence {i+1}/{len(dirty)}",
             )
 
-            # Generate audio for sentence
-            samples, sample_rate = generate_audio_for_sentence(
-                kokoro, sent, DEFAULT_SAMPLE_RATE
-            )
-            audios.append(samples)
+    # Forget samples of sentences that are no longer in the script
+    st.session_state.sentence_samples = {
+        fingerprint: stored[fingerprint] for fingerprint in fingerprints
+    }
+    st.session_state.speed_sources = {
+        (sent["text"], sent["lang"], sent["voice"]): (sent["speed"], fingerprint)
+        for fingerprint, sent in zip(fingerprints, sentences)
+    }
 
-            # Save individual sentence audio
-            sentence_files.append(
-                save_sentence_audio(samples, sample_rate, i, config["output_format"])
-            )
+    with artifact_store.new_request() as (_, request_dir):
+        audio_file, _ = assemble_audio(
+            (stored[fingerprint] for fingerprint in fingerprints),
+            len(fingerprints),
+            DEFAULT_SAMPLE_RATE,
+            config["min_pause"],
+            config["max_pause"],
+            config["output_format"],
+            request_dir,
+            output_rate=config["sample_rate"],
+            bitrate=config["bitrate"],
+        )
+    st.session_state.audio_file = audio_file
+    st.session_state.audio_sentences = len(fingerprints)
+    st.session_state.audio_generated = True
+    progress.progress(1.0, "Done!")
+
+    stats = synthesis_cache.stats()
+    st.caption(
+        f"Synthesized {len(dirty)} of {len(fingerprints)} sentences. "
+        f"Synthesis cache: {stats['hits']} hits, {stats['misses']} misses "
+        f"({stats['hit_rate']:.0%} hit rate)"
+    )
+    return True
 
-            # Add silence between sentences
-            silence = generate_silence(
-                sample_rate, config["min_pause"], config["max_pause"]
-            )
-            audios.append(silence)
 
-        # Save final audio
-        full_audio = np.concatenate(audios)
-        st.session_state.audio_file = save_final_audio(
-            full_audio, DEFAULT_SAMPLE_RATE, config["output_format"]
+def render_timings(timings):
+    """Show where the time of the last generation went"""
+    with st.expander("Timing"):
+        st.table(
+            [
+                {"Stage": stage, "Seconds": f"{seconds:.3f}", "Calls": count}
+                for stage, (seconds, count) in sorted(
+                    timings.items(), key=lambda item: -item[1][0]
+                )
+            ]
         )
-        st.session_state.audio_generated = True
-        st.session_state.sentence_files = sentence_files
-        progress.progress(1.0, "Done!")
+
+
+def render_generation_tab(config):
+    """Render the audio generation tab"""
+    st.header("Audio Generation")
+
+    if st.button("Generate Audio", key=f"gen_audio_{st.session_state.ui_key_base}"):
+        with collect_timings() as timings:
+            generated = generate_audio(config)
+        if generated:
+            render_timings(timings)
 
     # Show generated audio
-    if st.session_state.audio_generated and st.session_state.audio_file:
+    audio_file = st.session_state.audio_file
+    if st.session_state.audio_generated and audio_file:
+        if not os.path.exists(audio_file):
+            st.info("The generated audio has expired, please generate it again.")
+            return
+
         st.success("Audio generated successfully!")
 
-        # Play full audio
-        audio_bytes = open(st.session_state.audio_file, "rb").read()
+        # Play full audio, read from disk once per generation
+        store = st.session_state.audio_store
+        audio_bytes = store.get((audio_file, "output"), lambda: read_file(audio_file))
         st.audio(
             audio_bytes,
             format=f"audio/{config['output_format']}",
@@ -361,13 +577,157 @@ def render_generation_tab(config):
 
         # Individual sentence preview
         st.subheader("Preview Each Sentence")
-        for idx, sent_file in enumerate(st.session_state.sentence_files):
-            if os.path.exists(sent_file):
-                st.markdown(f"Sentence {idx+1}:")
-                st.audio(
-                    open(sent_file, "rb").read(),
-                    format=f"audio/{config['output_format']}",
-                )
+        # Sentences are sliced out of the final file using its offset index,
+        # and encoded once as WAV
+        for idx in range(st.session_state.audio_sentences):
+            sentence_bytes = store.get(
+                (audio_file, "sentence", idx),
+                lambda: encode_sentence_audio(audio_file, idx, "wav"),
+            )
+            if sentence_bytes is None:
+                continue
+            st.markdown(f"Sentence {idx+1}:")
+            st.audio(sentence_bytes, format="audio/wav")
+
+
+def render_uploaded_document(config, uploaded, lang, voice, speed):
+    """Render an uploaded document, resuming this session's unfinished render"""
+    if not validate_model_files(config):
+        return
+
+    # Reuse the previous request directory when the same file was being
+    # rendered, render_document then picks up after its finished chunks
+    upload_id = (uploaded.name, uploaded.size)
+    previous = st.session_state.document_request
+    request = None
+    if previous and previous["upload_id"] == upload_id:
+        try:
+            request = artifact_store.open_request(previous["request_id"])
+        except KeyError:
+            pass
+    if request is None:
+        if previous:
+            artifact_store.remove(previous["request_id"])
+        request = artifact_store.new_request()
+
+    with st.spinner("Loading Kokoro model..."):
+        try:
+            kokoro = model_registry.get(
+                config["model_file"], config["voices_file"], config["profile"]
+            )
+        except Exception as e:
+            st.error(str(e))
+            return
+
+    pool = None
+    if config["parallel"]:
+        pool = get_synthesis_pool(
+            config["model_file"],
+            config["voices_file"],
+            config["parallel_workers"],
+            config["onnx_threads"],
+            config["profile"],
+        )
+
+    with request as (request_id, request_dir):
+        st.session_state.document_request = {
+            "upload_id": upload_id,
+            "request_id": request_id,
+            "request_dir": request_dir,
+        }
+
+        document_file = os.path.join(request_dir, DOCUMENT_FILE)
+        if not os.path.exists(document_file):
+            with open(document_file, "wb") as f:
+                f.write(uploaded.getvalue())
+
+        with open(document_file, encoding="utf-8", errors="replace") as f:
+            total = count_document_sentences(f, lang)
+
+        progress = st.progress(0, "Rendering document...")
+
+        def on_progress(done):
+            progress.progress(done / total, f"Rendered {done}/{total} sentences")
+
+        with open(document_file, encoding="utf-8", errors="replace") as f:
+            render_document(
+                kokoro,
+                f,
+                lang,
+                voice,
+                speed,
+                DEFAULT_SAMPLE_RATE,
+                config["min_pause"],
+                config["max_pause"],
+                config["output_format"],
+                request_dir,
+                synthesis_cache,
+                pool,
+                on_progress=on_progress,
+            )
+        progress.progress(1.0, "Done!")
+
+
+def render_document_tab(config):
+    """Render the long document tab"""
+    st.header("Document")
+    st.markdown(
+        "Render a book or long text (plain text or markdown) into one audio file "
+        "per chapter. Chapters start at `#`/`##` headings or lines like "
+        "*Chapter 1*. An interrupted render continues where it stopped."
+    )
+
+    uploaded = st.file_uploader(
+        "Document", type=["txt", "md", "markdown"], key="document_file"
+    )
+
+    cols = st.columns(3)
+    lang = cols[0].selectbox(
+        "Language",
+        list(LANGS.values()),
+        index=list(LANGS.values()).index(DEFAULT_SENTENCE["lang"]),
+        key="document_lang",
+    )
+    voices = get_voices_for_lang(lang)
+    voice = cols[1].selectbox(
+        "Voice",
+        voices,
+        index=(
+            voices.index(DEFAULT_SENTENCE["voice"])
+            if DEFAULT_SENTENCE["voice"] in voices
+            else 0
+        ),
+        key="document_voice",
+    )
+    speed = cols[2].number_input(
+        "Speed", 0.5, 2.0, DEFAULT_SENTENCE["speed"], 0.1, key="document_speed"
+    )
+
+    if uploaded is not None and st.button("Render Document", key="render_document"):
+        render_uploaded_document(config, uploaded, lang, voice, speed)
+
+    # Show the chapters rendered so far
+    request = st.session_state.document_request
+    index = load_chapter_index(request["request_dir"]) if request else None
+    if not index:
+        return
+
+    if not index["complete"]:
+        st.info("The render was interrupted, render again to resume it.")
+
+    for chapter in index["chapters"]:
+        chapter_file = os.path.join(request["request_dir"], chapter["file"])
+        if not os.path.exists(chapter_file):
+            continue
+        minutes, seconds = divmod(int(chapter["duration"]), 60)
+        st.markdown(f"**{chapter['title']}** ({minutes}:{seconds:02d})")
+        chapter_bytes = st.session_state.audio_store.get(
+            (chapter_file, "chapter"), lambda: read_file(chapter_file)
+        )
+        st.audio(
+            chapter_bytes,
+            format=f"audio/{index['settings']['output_format']}",
+        )
 
 
 def main():
@@ -378,7 +738,7 @@ def main():
     config = render_sidebar()
 
     # Create tabs
-    tab1, tab2 = st.tabs(["Sentences", "Audio Generation"])
+    tab1, tab2, tab3 = st.tabs(["Sentences", "Audio Generation", "Document"])
 
     with tab1:
         render_sentences_tab()
@@ -386,6 +746,9 @@ def main():
     with tab2:
         render_generation_tab(config)
 
+    with tab3:
+        render_document_tab(config)
+
 
 if __name__ == "__main__":
     main()
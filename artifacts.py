@@ -0,0 +1,438 @@
+import hashlib
+import os
+import re
+import shutil
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from functools import lru_cache
+
+import numpy as np
+
+from config import (
+    ARTIFACT_MAX_BYTES,
+    ARTIFACT_MAX_FILES,
+    ARTIFACT_SWEEP_INTERVAL,
+    ARTIFACT_TTL,
+    ARTIFACTS_DIR,
+    OUTPUT_FORMATS,
+    OUTPUT_SAMPLE_RATES,
+)
+from metadata import MetadataStore
+from metrics import time_stage
+from resample import Resampler
+from storage import create_backend
+
+REQUEST_ID_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+
+# libsndfile maps Opus compression levels 0..1 linearly onto this bitrate range
+OPUS_MAX_BITRATE = 256000
+OPUS_MIN_BITRATE = 6000
+
+
+def get_request_id(path):
+    """Get the request id of an artifact from its path"""
+    return os.path.basename(os.path.dirname(path))
+
+
+@lru_cache(maxsize=4096)
+def _hash_file(path, size, mtime_ns):
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def get_file_hash(path):
+    """Content hash of a file, computed once per file version"""
+    stat = os.stat(path)
+    return _hash_file(os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+
+
+def get_file_etag(path):
+    """Strong ETag from the file content"""
+    return f'"{get_file_hash(path)}"'
+
+
+def check_output_settings(output_format, sample_rate):
+    """Raise ValueError for a format or sample rate that can't be written"""
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Unsupported output format: {output_format}")
+    if sample_rate not in OUTPUT_SAMPLE_RATES:
+        raise ValueError(f"Unsupported sample rate: {sample_rate}")
+    sample_rates = OUTPUT_FORMATS[output_format]["sample_rates"]
+    if sample_rates and sample_rate not in sample_rates:
+        raise ValueError(
+            f"Sample rate {sample_rate} is not supported by {output_format}"
+        )
+
+
+def get_compression_level(encoding, bitrate=None):
+    """Compression level giving a target Opus bitrate, or None"""
+    bitrate = bitrate or encoding.get("bitrate")
+    if not bitrate or encoding.get("subtype") != "OPUS":
+        return None
+    level = (OPUS_MAX_BITRATE - bitrate) / (OPUS_MAX_BITRATE - OPUS_MIN_BITRATE)
+    return min(max(level, 0.0), 1.0)
+
+
+def get_download_url(path):
+    """Build the download URL of an artifact"""
+    return f"/download/{get_request_id(path)}/{os.path.basename(path)}"
+
+
+class AudioWriter:
+    """Append audio to a file as it is produced, renaming it into place when done.
+
+    The encoding follows the file extension (see OUTPUT_FORMATS). With an
+    output rate, samples are resampled on the way to the file, and frames
+    counts the output frames of everything written so far.
+    """
+
+    def __init__(
+        self,
+        path,
+        sample_rate,
+        channels=1,
+        subtype=None,
+        output_rate=None,
+        bitrate=None,
+    ):
+        directory, file_name = os.path.split(path)
+        extension = os.path.splitext(file_name)[1]
+        encoding = OUTPUT_FORMATS.get(extension[1:].lower(), {})
+        self.path = path
+        self.sample_rate = output_rate or sample_rate
+        self.frames = 0
+        self._input_frames = 0
+        self._resampler = None
+        if self.sample_rate != sample_rate:
+            self._resampler = Resampler(sample_rate, self.sample_rate)
+
+        options = {}
+        compression_level = get_compression_level(encoding, bitrate)
+        if compression_level is not None:
+            options["compression_level"] = compression_level
+
+        # Hidden temp names are never served by the download endpoint
+        self._temp_path = os.path.join(directory, f".{uuid.uuid4().hex}{extension}")
+        # Imported here so that importing this module doesn't load libsndfile
+        import soundfile as sf
+
+        self._file = sf.SoundFile(
+            self._temp_path,
+            mode="w",
+            samplerate=self.sample_rate,
+            channels=channels,
+            subtype=subtype or encoding.get("subtype"),
+            format=encoding.get("format"),
+            **options,
+        )
+
+    def write(self, samples):
+        """Append samples, keeping them float32"""
+        samples = np.asarray(samples, dtype=np.float32)
+        self._input_frames += len(samples)
+        if self._resampler is None:
+            self.frames = self._input_frames
+        else:
+            self.frames = self._resampler.output_frames(self._input_frames)
+            with time_stage("resample"):
+                samples = self._resampler.process(samples)
+        self._file.write(samples)
+
+    def close(self):
+        """Finish the file and move it to its final path"""
+        if self._resampler is not None:
+            self._file.write(self._resampler.flush())
+        self._file.close()
+        os.replace(self._temp_path, self.path)
+        return self.path
+
+    def abort(self):
+        """Discard the partially written file"""
+        self._file.close()
+        if os.path.exists(self._temp_path):
+            os.remove(self._temp_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+def write_audio_atomic(path, samples, sample_rate, output_rate=None, bitrate=None):
+    """Write an audio file under a temporary name and rename it into place"""
+    with AudioWriter(
+        path, sample_rate, output_rate=output_rate, bitrate=bitrate
+    ) as writer:
+        writer.write(samples)
+    return path
+
+
+class ArtifactStore:
+    """Per-request output directories with a byte quota, file limit and TTL.
+
+    Files are written to a local request directory, then published to the
+    artifact backend when the request is done, with their sizes recorded in
+    the shared metadata store. A worker asked for a file it doesn't have, or
+    has an outdated copy of, fetches it from the backend, so any worker can
+    serve any output.
+    """
+
+    def __init__(
+        self,
+        root=ARTIFACTS_DIR,
+        max_bytes=ARTIFACT_MAX_BYTES,
+        max_files=ARTIFACT_MAX_FILES,
+        ttl=ARTIFACT_TTL,
+        sweep_interval=ARTIFACT_SWEEP_INTERVAL,
+        backend=None,
+        metadata=None,
+    ):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.max_files = max_files
+        self.ttl = ttl
+        self.sweep_interval = sweep_interval
+        self.backend = backend or create_backend()
+        self.metadata = metadata or MetadataStore()
+
+        self._lock = threading.Lock()
+        self._active = set()
+        self._sweeper = None
+
+    def _start_sweeper(self):
+        """Start the background eviction thread once"""
+        with self._lock:
+            if self._sweeper is not None:
+                return
+            self._sweeper = threading.Thread(
+                target=self._sweep_forever, name="artifact-sweeper", daemon=True
+            )
+            self._sweeper.start()
+
+    def _sweep_forever(self):
+        while True:
+            time.sleep(self.sweep_interval)
+            try:
+                self.sweep()
+            except (OSError, sqlite3.Error) as e:
+                print(f"Error sweeping artifacts: {e}")
+
+    @contextmanager
+    def new_request(self):
+        """Create a unique request directory, protected from eviction while in use"""
+        self._start_sweeper()
+
+        request_id = uuid.uuid4().hex
+        request_dir = os.path.join(self.root, request_id)
+        with self._protect(request_id):
+            self.metadata.add_request(request_id)
+            os.makedirs(request_dir)
+            try:
+                yield request_id, request_dir
+            finally:
+                self._publish(request_id, request_dir)
+
+    @contextmanager
+    def open_request(self, request_id):
+        """Reuse an existing request directory, e.g. to resume a render"""
+        if not REQUEST_ID_PATTERN.match(request_id):
+            raise KeyError(f"Unknown request: {request_id}")
+        request_dir = os.path.join(self.root, request_id)
+        known = self.metadata.has_request(request_id)
+        if not known and not os.path.isdir(request_dir):
+            raise KeyError(f"Unknown request: {request_id}")
+
+        self._start_sweeper()
+        with self._protect(request_id):
+            # Another worker may have written the request
+            os.makedirs(request_dir, exist_ok=True)
+            for file_name in self.metadata.list_files(request_id):
+                self._get_fresh_path(request_id, file_name)
+            self.metadata.add_request(request_id)
+            os.utime(request_dir)
+            try:
+                yield request_id, request_dir
+            finally:
+                self._publish(request_id, request_dir)
+
+    @contextmanager
+    def _protect(self, request_id):
+        """Keep a request from being evicted while the block runs"""
+        with self._lock:
+            self._active.add(request_id)
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._active.discard(request_id)
+
+    def _publish(self, request_id, request_dir):
+        """Copy new or changed files to the backend and record them"""
+        files = []
+        for entry in os.scandir(request_dir):
+            # Hidden files are partial writes
+            if not entry.is_file() or entry.name.startswith("."):
+                continue
+            stat = entry.stat()
+            if self.metadata.get_file(request_id, entry.name) != (
+                stat.st_size,
+                stat.st_mtime_ns,
+            ):
+                self.backend.publish(request_id, entry.name, entry.path)
+            files.append((entry.name, stat.st_size, stat.st_mtime_ns))
+        self.metadata.set_files(request_id, files)
+
+    def _get_fresh_path(self, request_id, file_name):
+        """Local path of a published file, fetched when missing or outdated"""
+        record = self.metadata.get_file(request_id, file_name)
+        if record is None:
+            return None
+
+        path = os.path.join(self.root, request_id, file_name)
+        try:
+            stat = os.stat(path)
+            if (stat.st_size, stat.st_mtime_ns) == tuple(record):
+                return path
+        except FileNotFoundError:
+            pass
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if not self.backend.fetch(request_id, file_name, path):
+            return None
+        # Keep the original time so the copy is known fresh and validators match
+        os.utime(path, ns=(record[1], record[1]))
+        return path
+
+    def get_path(self, request_id, file_name):
+        """Resolve a finished artifact, or None when missing or not servable"""
+        if not REQUEST_ID_PATTERN.match(request_id):
+            return None
+        if file_name != os.path.basename(file_name) or file_name.startswith("."):
+            return None
+
+        path = os.path.join(self.root, request_id, file_name)
+        with self._lock:
+            writing = request_id in self._active
+        if writing or self.backend.name == "local":
+            # Only this machine has the latest version
+            if not os.path.isfile(path):
+                return None
+        else:
+            path = self._get_fresh_path(request_id, file_name)
+            if path is None:
+                return None
+
+        # Mark the request as recently used for LRU eviction
+        try:
+            os.utime(os.path.join(self.root, request_id))
+            self.metadata.touch_request(request_id)
+        except (OSError, sqlite3.Error):
+            pass
+        return path
+
+    def remove(self, request_id):
+        """Delete a request everywhere: backend, metadata and local directory"""
+        if REQUEST_ID_PATTERN.match(request_id):
+            self.backend.delete(request_id)
+            self.metadata.remove_request(request_id)
+            self._remove_local(request_id)
+
+    def _remove_local(self, request_id):
+        shutil.rmtree(os.path.join(self.root, request_id), ignore_errors=True)
+
+    def _scan(self):
+        """List local request directories with their last use, size and file count"""
+        entries = []
+        for entry in os.scandir(self.root):
+            if not entry.is_dir() or not REQUEST_ID_PATTERN.match(entry.name):
+                continue
+            size = 0
+            files = 0
+            for child in os.scandir(entry.path):
+                if child.is_file():
+                    size += child.stat().st_size
+                    files += 1
+            entries.append((entry.stat().st_mtime, entry.name, size, files))
+        entries.sort()
+        return entries
+
+    def _evict(self, entries, remove):
+        """Remove expired entries, then least recently used ones over the limits"""
+        total_bytes = sum(entry[2] for entry in entries)
+        total_files = sum(entry[3] for entry in entries)
+        now = time.time()
+
+        for last_used, request_id, size, files in entries:
+            expired = now - last_used > self.ttl
+            over_quota = total_bytes > self.max_bytes or total_files > self.max_files
+            if not expired and not over_quota:
+                break
+            remove(request_id)
+            total_bytes -= size
+            total_files -= files
+
+    def sweep(self):
+        """Evict expired requests, then least recently used ones over the limits"""
+        with self._lock:
+            active = set(self._active)
+
+        now = time.time()
+        requests = self.metadata.list_requests()
+        # Requests still being written elsewhere only go once they expire,
+        # e.g. after a worker crashed mid-render
+        self._evict(
+            [
+                entry[:4]
+                for entry in requests
+                if entry[1] not in active
+                and (not entry[4] or now - entry[0] > self.ttl)
+            ],
+            self.remove,
+        )
+        # Scan before listing, so a directory created by another worker in
+        # between is already known
+        local = self._scan()
+        requests = self.metadata.list_requests()
+        known = {entry[1] for entry in requests}
+        writing = {entry[1] for entry in requests if entry[4]}
+        for _, request_id, _, _ in local:
+            if request_id not in known and request_id not in active:
+                self._remove_local(request_id)
+        if self.backend.name == "local":
+            return
+
+        # Published local directories are only copies, kept within the same limits
+        self._evict(
+            [
+                entry
+                for entry in self._scan()
+                if entry[1] not in active and entry[1] not in writing
+            ],
+            self._remove_local,
+        )
+
+    def stats(self):
+        """Report how much the store holds"""
+        requests = self.metadata.list_requests()
+        return {
+            "backend": self.backend.name,
+            "requests": len(requests),
+            "bytes": sum(entry[2] for entry in requests),
+            "files": sum(entry[3] for entry in requests),
+            "max_bytes": self.max_bytes,
+            "max_files": self.max_files,
+        }
+
+
+# Shared store used by the API and the Streamlit app
+artifact_store = ArtifactStore()
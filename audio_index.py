@@ -0,0 +1,214 @@
+import io
+import json
+import os
+import struct
+
+import numpy as np
+
+from artifacts import check_output_settings, get_compression_level
+from config import OUTPUT_FORMATS
+
+# Sample types of WAV data that can be memory-mapped: (format tag, bits)
+WAV_DTYPES = {
+    (1, 16): np.dtype("<i2"),
+    (1, 32): np.dtype("<i4"),
+    (3, 32): np.dtype("<f4"),
+    (3, 64): np.dtype("<f8"),
+}
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+# Offset index sidecar: output.mp3 -> output.index.json
+INDEX_SUFFIX = ".index.json"
+
+# Players treat the maximum size as "read until the stream ends"
+WAV_UNKNOWN_SIZE = 0xFFFFFFFF
+
+
+def wav_header(sample_rate, data_size=WAV_UNKNOWN_SIZE, channels=1, bits_per_sample=16):
+    """Build a PCM WAV header for data of a given size"""
+    byte_rate = sample_rate * channels * bits_per_sample // 8
+    block_align = channels * bits_per_sample // 8
+    riff_size = min(data_size + 36, WAV_UNKNOWN_SIZE)
+    return (
+        b"RIFF"
+        + struct.pack("<I", riff_size)
+        + b"WAVE"
+        + b"fmt "
+        + struct.pack(
+            "<IHHIIHH",
+            16,
+            1,
+            channels,
+            sample_rate,
+            byte_rate,
+            block_align,
+            bits_per_sample,
+        )
+        + b"data"
+        + struct.pack("<I", data_size)
+    )
+
+
+def get_index_path(audio_file):
+    """Path of the offset index sidecar of a rendered file"""
+    return f"{os.path.splitext(audio_file)[0]}{INDEX_SUFFIX}"
+
+
+def save_audio_index(audio_file, sample_rate, offsets, bitrate=None):
+    """Write the (start, end) sample offsets of each sentence next to the file.
+
+    The Opus bitrate of the render is kept too, so slices encode alike.
+    """
+    path = get_index_path(audio_file)
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w") as f:
+        json.dump(
+            {
+                "file": os.path.basename(audio_file),
+                "sample_rate": sample_rate,
+                "bitrate": bitrate,
+                "sentences": [{"start": start, "end": end} for start, end in offsets],
+            },
+            f,
+        )
+    os.replace(temp_path, path)
+    return path
+
+
+def load_audio_index(audio_file):
+    """Read the offset index of a rendered file, or None when it has none"""
+    try:
+        with open(get_index_path(audio_file)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def get_wav_layout(path):
+    """Find (format tag, channels, sample rate, bits, data offset, data size) of a WAV"""
+    with open(path, "rb") as f:
+        header = f.read(12)
+        if len(header) < 12 or header[:4] != b"RIFF" or header[8:] != b"WAVE":
+            return None
+
+        fmt = None
+        while True:
+            chunk = f.read(8)
+            if len(chunk) < 8:
+                return None
+            chunk_id, size = struct.unpack("<4sI", chunk)
+            if chunk_id == b"fmt ":
+                data = f.read(size + size % 2)
+                format_tag, channels, sample_rate, _, _, bits = struct.unpack(
+                    "<HHIIHH", data[:16]
+                )
+                if format_tag == WAVE_FORMAT_EXTENSIBLE and len(data) >= 26:
+                    format_tag = struct.unpack("<H", data[24:26])[0]
+                fmt = (format_tag, channels, sample_rate, bits)
+            elif chunk_id == b"data":
+                if fmt is None:
+                    return None
+                return fmt + (f.tell(), size)
+            else:
+                f.seek(size + size % 2, os.SEEK_CUR)
+
+
+def map_wav_frames(path):
+    """Memory-map the samples of a WAV file, or None when it can't be mapped"""
+    layout = get_wav_layout(path)
+    if layout is None:
+        return None
+
+    format_tag, channels, sample_rate, bits, offset, size = layout
+    dtype = WAV_DTYPES.get((format_tag, bits))
+    if dtype is None:
+        return None
+
+    frames = min(size, os.path.getsize(path) - offset) // (dtype.itemsize * channels)
+    if not frames:
+        return np.zeros((0, channels), dtype=dtype), sample_rate
+    data = np.memmap(
+        path, dtype=dtype, mode="r", offset=offset, shape=(frames, channels)
+    )
+    return data, sample_rate
+
+
+def to_float32(samples):
+    """Scale mapped integer samples to float32 in [-1, 1]"""
+    if samples.dtype.kind == "i":
+        return samples.astype(np.float32) / np.float32(np.iinfo(samples.dtype).max + 1)
+    return samples.astype(np.float32)
+
+
+def read_audio_slice(audio_file, start, end):
+    """Read frames [start, end) of an audio file as mono float32"""
+    mapped = map_wav_frames(audio_file)
+    if mapped is not None:
+        data, sample_rate = mapped
+        # Only the pages of the slice are read from disk
+        return to_float32(data[start:end, 0]), sample_rate
+
+    # Imported here so that importing this module doesn't load libsndfile
+    import soundfile as sf
+
+    with sf.SoundFile(audio_file) as f:
+        f.seek(start)
+        samples = f.read(end - start, dtype="float32", always_2d=True)
+        return samples[:, 0], f.samplerate
+
+
+def get_sentence_offsets(audio_file, idx):
+    """(start, end) of a sentence in a rendered file, or None"""
+    index = load_audio_index(audio_file)
+    if index is None or not 0 <= idx < len(index["sentences"]):
+        return None
+    sentence = index["sentences"][idx]
+    return sentence["start"], sentence["end"]
+
+
+def read_sentence_audio(audio_file, idx):
+    """Slice the audio of one sentence out of a rendered file"""
+    offsets = get_sentence_offsets(audio_file, idx)
+    if offsets is None:
+        return None
+    return read_audio_slice(audio_file, *offsets)
+
+
+def encode_sentence_audio(audio_file, idx, output_format):
+    """Encode one sentence of a rendered file, or None when it doesn't exist.
+
+    Raises ValueError when the format can't be written at the render's rate.
+    """
+    index = load_audio_index(audio_file)
+    if index is None or not 0 <= idx < len(index["sentences"]):
+        return None
+    start, end = index["sentences"][idx]["start"], index["sentences"][idx]["end"]
+    # Slices can be requested in another format than the render's
+    check_output_settings(output_format, index["sample_rate"])
+
+    # 16-bit WAV slices are copied straight from the mapped file
+    if output_format == "wav":
+        mapped = map_wav_frames(audio_file)
+        if mapped is not None and mapped[0].dtype == WAV_DTYPES[(1, 16)]:
+            data, sample_rate = mapped
+            pcm = np.ascontiguousarray(data[start:end, 0]).tobytes()
+            return wav_header(sample_rate, len(pcm)) + pcm
+
+    import soundfile as sf
+
+    samples, sample_rate = read_audio_slice(audio_file, start, end)
+    encoding = OUTPUT_FORMATS[output_format]
+    options = {}
+    compression_level = get_compression_level(encoding, index.get("bitrate"))
+    if compression_level is not None:
+        options["compression_level"] = compression_level
+    buffer = io.BytesIO()
+    sf.write(
+        buffer,
+        samples,
+        sample_rate,
+        format=encoding["format"],
+        subtype=encoding["subtype"],
+        **options,
+    )
+    return buffer.getvalue()
@@ -0,0 +1,264 @@
+"""Render a JSONL file of jobs offline on a pool of worker processes.
+
+Each line is a job: either a list of sentences (the JSON written by the
+sentence export) or an object with "id", "sentences" and optional
+"min_pause", "max_pause" and "output_format". Outputs go to one directory
+per job, and every finished job is appended to manifest.jsonl, which is
+also the checkpoint: running the same command again skips completed jobs.
+
+    python batch_render.py jobs.jsonl --output-dir temp/batch --workers 4
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import re
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from audio_index import load_audio_index
+from cache import synthesis_cache
+from config import (
+    BATCH_RENDER_DIR,
+    DEFAULT_MAX_PAUSE,
+    DEFAULT_MIN_PAUSE,
+    DEFAULT_MODEL_FILE,
+    DEFAULT_ONNX_PROFILE,
+    DEFAULT_OUTPUT_FORMAT,
+    DEFAULT_SAMPLE_RATE,
+    DEFAULT_SENTENCE,
+    DEFAULT_VOICES_FILE,
+    PARALLEL_ONNX_THREADS,
+    PARALLEL_WORKERS,
+)
+from utils import load_kokoro_model, render_audio
+
+# Finished jobs, one JSON object per line, appended as they complete
+MANIFEST_FILE = "manifest.jsonl"
+
+# Characters allowed in the output directory name of a job
+JOB_ID_PATTERN = re.compile(r"[^A-Za-z0-9_.-]")
+
+# Model loaded once in each worker process
+_worker_kokoro = None
+
+
+def _init_worker(model_file, voices_file, onnx_threads, profile):
+    """Load the worker's own Kokoro instance"""
+    global _worker_kokoro
+    _worker_kokoro = load_kokoro_model(
+        model_file, voices_file, onnx_threads, profile=profile
+    )
+
+
+def parse_job(line, line_number):
+    """Build (job id, job settings) from a JSONL line"""
+    data = json.loads(line)
+    if isinstance(data, list):
+        data = {"sentences": data}
+    if not isinstance(data, dict) or not isinstance(data.get("sentences"), list):
+        raise ValueError("Invalid job: expected a list of sentences")
+
+    job_id = str(data.get("id") or data.get("job_id") or f"job_{line_number:06d}")
+    job = {
+        # Missing sentence fields fall back to the defaults, as on import
+        "sentences": [
+            dict(DEFAULT_SENTENCE, **sentence) for sentence in data["sentences"]
+        ],
+        "min_pause": data.get("min_pause", DEFAULT_MIN_PAUSE),
+        "max_pause": data.get("max_pause", DEFAULT_MAX_PAUSE),
+        "output_format": data.get("output_format", DEFAULT_OUTPUT_FORMAT),
+    }
+    return JOB_ID_PATTERN.sub("_", job_id), job
+
+
+def iter_jobs(jobs_file):
+    """Lazily yield (job id, job settings, error) for each line of a jobs file"""
+    with open(jobs_file, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                yield (*parse_job(line, line_number), None)
+            except (TypeError, ValueError) as e:
+                yield f"job_{line_number:06d}", None, str(e)
+
+
+def load_manifest(output_dir):
+    """Read the manifest entries of earlier runs"""
+    entries = []
+    try:
+        with open(os.path.join(output_dir, MANIFEST_FILE), encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entries.append(json.loads(line))
+                except ValueError:
+                    # A crash mid-write leaves at most one partial last line
+                    continue
+    except OSError:
+        pass
+    return entries
+
+
+def append_manifest(output_dir, entry):
+    """Append a finished job to the manifest and flush it to disk"""
+    with open(os.path.join(output_dir, MANIFEST_FILE), "a", encoding="utf-8") as f:
+        f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def render_job(job_id, job, output_dir):
+    """Render one job in a worker process and describe the result"""
+    start = time.perf_counter()
+    job_dir = os.path.join(output_dir, job_id)
+    entry = {"id": job_id, "sentences": len(job["sentences"])}
+    try:
+        os.makedirs(job_dir, exist_ok=True)
+        audio_file, _ = render_audio(
+            _worker_kokoro,
+            job["sentences"],
+            DEFAULT_SAMPLE_RATE,
+            job["min_pause"],
+            job["max_pause"],
+            job["output_format"],
+            synthesis_cache,
+            output_dir=job_dir,
+        )
+        # The offset index already knows where the last sentence ends
+        index = load_audio_index(audio_file)
+        frames = index["sentences"][-1]["end"] if index["sentences"] else 0
+        entry.update(
+            status="completed",
+            file=os.path.relpath(audio_file, output_dir),
+            duration=frames / index["sample_rate"],
+        )
+    except Exception as e:
+        entry.update(status="failed", error=str(e))
+    entry["render_time"] = time.perf_counter() - start
+    return entry
+
+
+class Throughput:
+    """Running totals of the jobs finished in this run"""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.jobs = 0
+        self.audio_seconds = 0.0
+
+    def add(self, entry):
+        if entry["status"] == "completed":
+            self.jobs += 1
+            self.audio_seconds += entry["duration"]
+
+    def describe(self):
+        elapsed = max(time.perf_counter() - self.start, 1e-9)
+        # Audio-hours per wall-clock hour is the inverse real-time factor
+        return (
+            f"{self.jobs * 60 / elapsed:.1f} jobs/min, "
+            f"{self.audio_seconds / elapsed:.2f} audio-hours/hour"
+        )
+
+
+def run_batch(
+    jobs_file,
+    output_dir=BATCH_RENDER_DIR,
+    model_file=DEFAULT_MODEL_FILE,
+    voices_file=DEFAULT_VOICES_FILE,
+    workers=PARALLEL_WORKERS,
+    onnx_threads=PARALLEL_ONNX_THREADS,
+    profile=DEFAULT_ONNX_PROFILE,
+):
+    """Render every job not yet completed, returning the (completed, failed) counts"""
+    os.makedirs(output_dir, exist_ok=True)
+    finished = {
+        entry["id"]
+        for entry in load_manifest(output_dir)
+        if entry.get("status") == "completed"
+    }
+    if finished:
+        print(f"Resuming: {len(finished)} jobs already completed")
+
+    throughput = Throughput()
+    failed = 0
+
+    def record(entry):
+        nonlocal failed
+        append_manifest(output_dir, entry)
+        throughput.add(entry)
+        if entry["status"] == "completed":
+            finished.add(entry["id"])
+            print(
+                f"{entry['id']}: {entry['duration']:.1f}s audio, "
+                f"{throughput.describe()}"
+            )
+        else:
+            failed += 1
+            print(f"{entry['id']}: failed: {entry['error']}")
+
+    # Spawn so workers don't inherit the parent's ONNX runtime threads
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(model_file, voices_file, onnx_threads, profile),
+    ) as executor:
+        # Only a few jobs per worker are queued, so the jobs file is never
+        # read into memory whole
+        running = set()
+        submitted = set()
+        try:
+            for job_id, job, error in iter_jobs(jobs_file):
+                if job_id in finished or job_id in submitted:
+                    continue
+                if error:
+                    record({"id": job_id, "status": "failed", "error": error})
+                    continue
+
+                submitted.add(job_id)
+                running.add(executor.submit(render_job, job_id, job, output_dir))
+                if len(running) >= workers * 2:
+                    done, running = wait(running, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        record(future.result())
+
+            for future in wait(running).done:
+                record(future.result())
+        except BaseException:
+            executor.shutdown(wait=False, cancel_futures=True)
+            raise
+
+    print(
+        f"Finished: {throughput.jobs} completed, {failed} failed, "
+        f"{throughput.describe()}"
+    )
+    return throughput.jobs, failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("jobs_file")
+    parser.add_argument("--output-dir", default=BATCH_RENDER_DIR)
+    parser.add_argument("--model-file", default=DEFAULT_MODEL_FILE)
+    parser.add_argument("--voices-file", default=DEFAULT_VOICES_FILE)
+    parser.add_argument("--workers", type=int, default=PARALLEL_WORKERS)
+    parser.add_argument("--threads", type=int, default=PARALLEL_ONNX_THREADS)
+    parser.add_argument("--profile", default=DEFAULT_ONNX_PROFILE)
+    args = parser.parse_args()
+
+    _, failed = run_batch(
+        args.jobs_file,
+        args.output_dir,
+        args.model_file,
+        args.voices_file,
+        args.workers,
+        args.threads,
+        args.profile,
+    )
+    raise SystemExit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
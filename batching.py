@@ -0,0 +1,191 @@
+import numpy as np
+
+from config import BATCH_MAX_SIZE, DEFAULT_SAMPLE_RATE
+from metrics import time_stage
+from phonemes import get_sentence_phonemes
+from voices import get_voice_spec, get_voice_style, resolve_voice
+
+# Longest token sequence the model accepts in one pass
+MAX_TOKENS = 510
+
+# Pauses Kokoro.create adds after sentence and clause marks (its defaults),
+# added to batched rows too so both paths give the same audio
+SENTENCE_PAUSE = 0.25
+CLAUSE_PAUSE = 0.1
+
+ONNX_DTYPES = {
+    "tensor(float)": np.float32,
+    "tensor(float16)": np.float16,
+    "tensor(double)": np.float64,
+    "tensor(int32)": np.int32,
+    "tensor(int64)": np.int64,
+}
+
+
+def supports_batching(kokoro):
+    """Check whether the model takes a batch axis and reports token durations"""
+    session = getattr(kokoro, "sess", None)
+    if session is None:
+        return False
+
+    inputs = {i.name: i for i in session.get_inputs()}
+    tokens = inputs.get("input_ids") or inputs.get("tokens")
+    if tokens is None or not tokens.shape:
+        return False
+
+    # A fixed batch of 1 means sentences can only run one at a time, and
+    # without durations padded outputs can't be cut back to real lengths
+    dynamic_batch = not isinstance(tokens.shape[0], int) or tokens.shape[0] > 1
+    has_durations = "duration" in {o.name for o in session.get_outputs()}
+    return dynamic_batch and has_durations
+
+
+def get_speed_input(speed, dtype):
+    """Speed as Kokoro feeds it: graphs taking integers get it rounded"""
+    if np.dtype(dtype).kind in "iu" and float(speed) != int(speed):
+        return max(1, round(speed))
+    return speed
+
+
+def get_batch_key(sentence):
+    """Sentences sharing voice, language and speed can run in one batch"""
+    return (
+        get_voice_spec(sentence["voice"]),
+        sentence["lang"],
+        float(sentence["speed"]),
+    )
+
+
+class BatchSynthesizer:
+    """Synthesize sentences in batches grouped by voice, lang, speed and length"""
+
+    def __init__(self, kokoro, max_batch_size=BATCH_MAX_SIZE, window=None):
+        self.kokoro = kokoro
+        self.max_batch_size = max_batch_size
+        # Sentences are grouped within a window so results can stream in order
+        self.window = window or max_batch_size * 4
+
+        inputs = {
+            i.name: ONNX_DTYPES.get(i.type, np.float32)
+            for i in kokoro.sess.get_inputs()
+        }
+        self._tokens_input = "input_ids" if "input_ids" in inputs else "tokens"
+        self._input_dtypes = inputs
+        self._output_names = [o.name for o in kokoro.sess.get_outputs()]
+
+    def _create_single(self, sentence):
+        phonemes = get_sentence_phonemes(self.kokoro, sentence)
+        with time_stage("inference"):
+            return self.kokoro.create(
+                phonemes,
+                voice=resolve_voice(self.kokoro, sentence["voice"]),
+                speed=sentence["speed"],
+                lang=sentence["lang"],
+                is_phonemes=True,
+            )
+
+    def _get_phonemes(self, sentence):
+        # Whitespace is collapsed as Kokoro.create does before tokenizing
+        return " ".join(get_sentence_phonemes(self.kokoro, sentence).split())
+
+    def _tokenize(self, sentence):
+        return self.kokoro.tokenizer.tokenize(
+            self._get_phonemes(sentence), limit=None
+        )
+
+    def _run_batch(self, sentences, token_lists):
+        """Run one padded batch and split it back into per-sentence samples"""
+        from kokoro_onnx.pauses import insert as insert_pauses
+        from kokoro_onnx.sliding import timings, token_edges
+        from kokoro_onnx.trim import trim as trim_audio
+
+        voice, _, speed = get_batch_key(sentences[0])
+        style = get_voice_style(self.kokoro, voice)
+        lengths = [len(tokens) for tokens in token_lists]
+
+        # Rows have the same length, each wrapped in the pad token 0
+        tokens = np.array([[0, *token_list, 0] for token_list in token_lists])
+        speed_dtype = self._input_dtypes["speed"]
+        inputs = {
+            self._tokens_input: tokens.astype(self._input_dtypes[self._tokens_input]),
+            "style": np.concatenate([style[length - 1] for length in lengths]).astype(
+                self._input_dtypes["style"]
+            ),
+            "speed": np.full(
+                len(sentences), get_speed_input(speed, speed_dtype), dtype=speed_dtype
+            ),
+        }
+        with time_stage("inference"):
+            outputs = self.kokoro.sess.run(None, inputs)
+        outputs = dict(zip(self._output_names, outputs))
+        audio = np.asarray(outputs[self._output_names[0]], dtype=np.float32)
+        audio = audio.reshape(len(sentences), -1)
+        duration = np.asarray(outputs["duration"]).reshape(len(sentences), -1)
+
+        # Frames map to samples at a fixed rate, taken from the longest row
+        samples_per_frame = audio.shape[1] / duration.sum(axis=1).max()
+
+        results = []
+        for row, (sentence, length) in enumerate(zip(sentences, lengths)):
+            row_duration = duration[row, : length + 2]
+            samples = audio[row, : int(round(row_duration.sum() * samples_per_frame))]
+
+            # Same steps as Kokoro.create: trim, then top up the pauses after
+            # punctuation using the phoneme timings
+            edges = token_edges(row_duration, len(samples))[1:]
+            samples, (head, _) = trim_audio(samples)
+            edges = np.clip(edges - head, 0, len(samples))
+            spoken = timings(
+                self.kokoro.tokenizer.known(self._get_phonemes(sentence)),
+                edges,
+                DEFAULT_SAMPLE_RATE,
+            )
+            samples, _ = insert_pauses(
+                samples, spoken, DEFAULT_SAMPLE_RATE, SENTENCE_PAUSE, CLAUSE_PAUSE
+            )
+            results.append((samples, DEFAULT_SAMPLE_RATE))
+        return results
+
+    def _synthesize_window(self, sentences):
+        results = [None] * len(sentences)
+
+        groups = {}
+        for idx, sentence in enumerate(sentences):
+            groups.setdefault(get_batch_key(sentence), []).append(idx)
+
+        for indexes in groups.values():
+            # Only sentences of the same token length run together: the model
+            # has no attention mask, so padding would change a row's audio
+            # and it must match the single-sentence path it shares a cache with
+            by_length = {}
+            for idx in indexes:
+                tokens = self._tokenize(sentences[idx])
+                if tokens and len(tokens) <= MAX_TOKENS:
+                    by_length.setdefault(len(tokens), []).append((idx, tokens))
+                else:
+                    # Too long for one pass: keep the chunked per-sentence path
+                    results[idx] = self._create_single(sentences[idx])
+
+            for rows in by_length.values():
+                for start in range(0, len(rows), self.max_batch_size):
+                    batch = rows[start : start + self.max_batch_size]
+                    if len(batch) == 1:
+                        idx = batch[0][0]
+                        results[idx] = self._create_single(sentences[idx])
+                        continue
+
+                    for (idx, _), result in zip(
+                        batch,
+                        self._run_batch(
+                            [sentences[idx] for idx, _ in batch],
+                            [tokens for _, tokens in batch],
+                        ),
+                    ):
+                        results[idx] = result
+
+        return results
+
+    def map(self, sentences):
+        """Synthesize sentences in batches, yielding results in input order"""
+        for start in range(0, len(sentences), self.window):
+            yield from self._synthesize_window(sentences[start : start + self.window])
@@ -0,0 +1,91 @@
+"""Compare peak memory of list-and-concatenate assembly against streaming writes.
+
+Sentences are synthetic float32 arrays, so no model files are needed:
+
+    python -m benchmarks.assembly_memory --minutes 60 --output-format wav
+"""
+
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import soundfile as sf
+
+from artifacts import AudioWriter
+from config import DEFAULT_MAX_PAUSE, DEFAULT_MIN_PAUSE, DEFAULT_SAMPLE_RATE
+from utils import generate_silence
+
+SENTENCE_SECONDS = 4.0
+
+
+def iter_sentences(count):
+    """Yield float32 arrays shaped like synthesized sentences"""
+    rng = np.random.default_rng(0)
+    for _ in range(count):
+        samples = int(SENTENCE_SECONDS * DEFAULT_SAMPLE_RATE)
+        yield (rng.standard_normal(samples) * 0.1).astype(np.float32)
+
+
+def assemble_concatenate(path, count):
+    """Assemble the way render_audio used to: float64 silence and one big concatenate"""
+    audios = []
+    for idx, samples in enumerate(iter_sentences(count)):
+        audios.append(samples)
+        if idx < count - 1:
+            pause = np.random.uniform(DEFAULT_MIN_PAUSE, DEFAULT_MAX_PAUSE)
+            audios.append(np.zeros(int(pause * DEFAULT_SAMPLE_RATE)))
+    sf.write(path, np.concatenate(audios), DEFAULT_SAMPLE_RATE)
+
+
+def assemble_streaming(path, count):
+    """Assemble the way render_audio does now: float32 written as it arrives"""
+    with AudioWriter(path, DEFAULT_SAMPLE_RATE) as writer:
+        for idx, samples in enumerate(iter_sentences(count)):
+            writer.write(samples)
+            if idx < count - 1:
+                writer.write(
+                    generate_silence(
+                        DEFAULT_SAMPLE_RATE, DEFAULT_MIN_PAUSE, DEFAULT_MAX_PAUSE
+                    )
+                )
+
+
+def measure(assemble, path, count):
+    tracemalloc.start()
+    start = time.perf_counter()
+    assemble(path, count)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--minutes", type=float, default=60)
+    parser.add_argument("--output-format", default="wav")
+    args = parser.parse_args()
+
+    count = int(args.minutes * 60 / (SENTENCE_SECONDS + DEFAULT_MAX_PAUSE))
+    sentence_mb = SENTENCE_SECONDS * DEFAULT_SAMPLE_RATE * 4 / 1024**2
+    print(f"{count} sentences, about {args.minutes:g} minutes of audio")
+    print(f"one sentence is {sentence_mb:.1f} MB of float32 samples")
+
+    with tempfile.TemporaryDirectory() as directory:
+        for name, assemble in [
+            ("concatenate", assemble_concatenate),
+            ("streaming", assemble_streaming),
+        ]:
+            path = os.path.join(directory, f"{name}.{args.output_format}")
+            elapsed, peak = measure(assemble, path, count)
+            print(
+                f"{name:12} peak {peak / 1024**2:9.1f} MB, "
+                f"{elapsed:6.2f}s, file {os.path.getsize(path) / 1024**2:.1f} MB"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""Measure how long the API takes to import and to become ready.
+
+Imports are timed in fresh interpreters. Time to ready starts the API in a
+new process and polls /health/live and /health/ready until the model is
+loaded (or failed to load). Run from the project root:
+
+    python -m benchmarks.cold_start --runs 5
+    python -m benchmarks.cold_start --backend model --profile latency
+"""
+
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+from config import DEFAULT_ONNX_PROFILE
+
+# Modules only needed once a model loads, which importing the API must not pull in
+DEFERRED_MODULES = ["kokoro_onnx", "onnxruntime", "phonemizer", "soundfile"]
+
+IMPORT_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+print(json.dumps({{
+    "seconds": time.perf_counter() - start,
+    "loaded": [name for name in {deferred!r} if name in sys.modules],
+}}))
+"""
+
+
+def get_free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def time_import(module, runs):
+    """Median import time of a module in fresh interpreters"""
+    script = IMPORT_SCRIPT.format(module=module, deferred=DEFERRED_MODULES)
+    results = [
+        json.loads(
+            subprocess.run(
+                [sys.executable, "-c", script],
+                capture_output=True,
+                check=True,
+                text=True,
+            ).stdout
+        )
+        for _ in range(runs)
+    ]
+    return {
+        "median_seconds": statistics.median(result["seconds"] for result in results),
+        "deferred_modules_loaded": results[0]["loaded"],
+    }
+
+
+def serve(port, backend):
+    """Run the API in this process, as started by time_to_ready"""
+    import uvicorn
+
+    import api
+
+    if backend == "stub":
+        from .stub_kokoro import make_stub_loader
+
+        api.model_registry.loader = make_stub_loader()
+    uvicorn.run(api.app, host="127.0.0.1", port=port, log_level="warning")
+
+
+def get_status(url):
+    """HTTP status and JSON body of a GET, or (None, None) when not answering"""
+    try:
+        with urllib.request.urlopen(url, timeout=1) as response:
+            return response.status, json.load(response)
+    except urllib.error.HTTPError as e:
+        return e.code, json.load(e)
+    except OSError:
+        return None, None
+
+
+def time_to_ready(backend, profile, timeout):
+    """Seconds from process start until the API is live and until it is ready"""
+    port = get_free_port()
+    url = f"http://127.0.0.1:{port}"
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "benchmarks.cold_start",
+            "--serve",
+            str(port),
+            "--backend",
+            backend,
+        ],
+        env=dict(os.environ, ONNX_PROFILE=profile),
+    )
+    result = {"live_seconds": None, "ready_seconds": None, "readiness": None}
+    try:
+        while time.perf_counter() - start < timeout:
+            if result["live_seconds"] is None:
+                if get_status(f"{url}/health/live")[0] == 200:
+                    result["live_seconds"] = time.perf_counter() - start
+            else:
+                status, readiness = get_status(f"{url}/health/ready")
+                result["readiness"] = readiness
+                if status == 200:
+                    result["ready_seconds"] = time.perf_counter() - start
+                    break
+                if readiness and readiness["status"] == "failed":
+                    break
+            if process.poll() is not None:
+                break
+            time.sleep(0.01)
+    finally:
+        process.terminate()
+        process.wait()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--backend", choices=["stub", "model"], default="stub")
+    parser.add_argument("--profile", default=DEFAULT_ONNX_PROFILE)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--timeout", type=float, default=300)
+    parser.add_argument("--serve", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve, args.backend)
+        return
+
+    for module in ["utils", "api"]:
+        result = time_import(module, args.runs)
+        loaded = ", ".join(result["deferred_modules_loaded"]) or "none"
+        print(
+            f"import {module}: {result['median_seconds']:.3f}s median, "
+            f"deferred modules loaded: {loaded}"
+        )
+
+    result = time_to_ready(args.backend, args.profile, args.timeout)
+    if result["live_seconds"] is None:
+        print("API never answered /health/live")
+        raise SystemExit(1)
+    print(f"live after {result['live_seconds']:.3f}s")
+    if result["ready_seconds"] is None:
+        print(f"not ready: {json.dumps(result['readiness'])}")
+        raise SystemExit(1)
+    readiness = result["readiness"]
+    print(
+        f"ready after {result['ready_seconds']:.3f}s "
+        f"(API import {readiness['import_seconds']:.3f}s, "
+        f"ready {readiness['ready_seconds']:.3f}s after import started)"
+    )
+
+
+if __name__ == "__main__":
+    main()
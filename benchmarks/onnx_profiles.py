@@ -0,0 +1,83 @@
+"""Compare load time and real-time factor of the ONNX execution profiles.
+
+Run from the project root:
+
+    python -m benchmarks.onnx_profiles --sentences 20 --profiles default latency int8
+"""
+
+import argparse
+import os
+import time
+
+from config import (
+    DEFAULT_MODEL_FILE,
+    DEFAULT_SAMPLE_RATE,
+    DEFAULT_VOICES_FILE,
+    ONNX_PROFILES,
+)
+from profiles import get_profile, resolve_model_variant
+from registry import warm_up_model
+from utils import generate_audio_for_sentence, load_kokoro_model
+
+from .parallel_synthesis import build_sentences, require_model_files
+
+
+def run_profile(model_file, voices_file, profile, sentences):
+    """Load a model with a profile and synthesize the sentences one by one"""
+    start = time.perf_counter()
+    kokoro = load_kokoro_model(model_file, voices_file, profile=profile)
+    load_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    warm_up_model(kokoro)
+    warmup_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    samples = sum(
+        len(generate_audio_for_sentence(kokoro, sentence, DEFAULT_SAMPLE_RATE)[0])
+        for sentence in sentences
+    )
+    synthesis_time = time.perf_counter() - start
+    return load_time, warmup_time, synthesis_time, samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model-file", default=DEFAULT_MODEL_FILE)
+    parser.add_argument("--voices-file", default=DEFAULT_VOICES_FILE)
+    parser.add_argument("--sentences", type=int, default=20)
+    parser.add_argument(
+        "--profiles", nargs="+", default=list(ONNX_PROFILES), choices=ONNX_PROFILES
+    )
+    args = parser.parse_args()
+    require_model_files(args.model_file, args.voices_file)
+
+    sentences = build_sentences(args.sentences)
+    print(f"CPU cores: {os.cpu_count()}, sentences: {len(sentences)}")
+    print(
+        f"{'profile':<12} {'model':<28} {'load':>8} {'warm-up':>8} "
+        f"{'synth':>8} {'RTF':>7}"
+    )
+
+    for profile in args.profiles:
+        model_file = resolve_model_variant(
+            args.model_file, get_profile(profile).get("variant")
+        )
+        load_time, warmup_time, synthesis_time, samples = run_profile(
+            args.model_file, args.voices_file, profile, sentences
+        )
+        audio_seconds = samples / DEFAULT_SAMPLE_RATE
+        print(
+            f"{profile:<12} {os.path.basename(model_file):<28} "
+            f"{load_time:7.2f}s {warmup_time:7.2f}s {synthesis_time:7.2f}s "
+            f"{synthesis_time / audio_seconds:7.3f}"
+        )
+
+    print(
+        "Profiles with save_optimized load faster from the second run on, "
+        "once their optimized graph is in temp/optimized."
+    )
+
+
+if __name__ == "__main__":
+    main()
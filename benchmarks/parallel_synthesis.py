@@ -0,0 +1,119 @@
+"""Compare the serial sentence loop against the parallel worker pool.
+
+Run from the project root:
+
+    python -m benchmarks.parallel_synthesis --sentences 200 --workers 8 --threads 4
+"""
+
+import argparse
+import os
+import time
+
+from config import (
+    DEFAULT_MODEL_FILE,
+    DEFAULT_SAMPLE_RATE,
+    DEFAULT_VOICES_FILE,
+    PARALLEL_ONNX_THREADS,
+    PARALLEL_WORKERS,
+)
+from parallel import SynthesisPool
+from utils import generate_audio_for_sentences, load_kokoro_model
+
+SAMPLE_TEXTS = [
+    "The quick brown fox jumps over the lazy dog.",
+    "Audio Studio AI turns scripts into voiceovers on your own machine.",
+    "Every sentence is synthesized separately and joined with a short pause.",
+    "Long programs are made of many short sentences like this one.",
+    "Benchmarks should use text that looks like the real workload.",
+]
+
+
+def build_sentences(count):
+    """Build distinct sentences so nothing is deduplicated"""
+    return [
+        {
+            "text": f"{SAMPLE_TEXTS[i % len(SAMPLE_TEXTS)]} Number {i + 1}.",
+            "lang": "en-us",
+            "voice": "af_sarah",
+            "speed": 1.0,
+        }
+        for i in range(count)
+    ]
+
+
+def require_model_files(*paths):
+    """Exit with a clear message when the model files aren't downloaded.
+
+    Worker processes and ONNX profiles need the real model, so these
+    benchmarks have no stub backend; benchmarks.suite runs without the files.
+    """
+    missing = [path for path in paths if not os.path.exists(path)]
+    if missing:
+        raise SystemExit(
+            f"Model files not found: {', '.join(missing)}. Download them as "
+            "described in the README, or run `python -m benchmarks.suite "
+            "--backend stub` instead."
+        )
+
+
+def run_serial(kokoro, sentences):
+    start = time.perf_counter()
+    samples = sum(
+        len(audio)
+        for audio, _ in generate_audio_for_sentences(
+            kokoro, sentences, DEFAULT_SAMPLE_RATE
+        )
+    )
+    return time.perf_counter() - start, samples
+
+
+def run_parallel(kokoro, sentences, pool):
+    start = time.perf_counter()
+    samples = sum(
+        len(audio)
+        for audio, _ in generate_audio_for_sentences(
+            kokoro, sentences, DEFAULT_SAMPLE_RATE, pool=pool
+        )
+    )
+    return time.perf_counter() - start, samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model-file", default=DEFAULT_MODEL_FILE)
+    parser.add_argument("--voices-file", default=DEFAULT_VOICES_FILE)
+    parser.add_argument("--sentences", type=int, default=50)
+    parser.add_argument("--workers", type=int, default=PARALLEL_WORKERS)
+    parser.add_argument("--threads", type=int, default=PARALLEL_ONNX_THREADS)
+    args = parser.parse_args()
+    require_model_files(args.model_file, args.voices_file)
+
+    sentences = build_sentences(args.sentences)
+    print(f"CPU cores: {os.cpu_count()}, sentences: {len(sentences)}")
+
+    # The serial baseline is the default Kokoro session, as used by the app
+    kokoro = load_kokoro_model(args.model_file, args.voices_file)
+    serial_time, serial_samples = run_serial(kokoro, sentences)
+    audio_seconds = serial_samples / DEFAULT_SAMPLE_RATE
+    print(
+        f"serial:   {serial_time:8.2f}s wall, " f"RTF {serial_time / audio_seconds:.3f}"
+    )
+
+    pool = SynthesisPool(args.model_file, args.voices_file, args.workers, args.threads)
+    try:
+        # Warm up so model loading in the workers isn't measured
+        list(pool.map(sentences[: args.workers]))
+        parallel_time, _ = run_parallel(kokoro, sentences, pool)
+    finally:
+        pool.close()
+
+    print(
+        f"parallel: {parallel_time:8.2f}s wall, "
+        f"RTF {parallel_time / audio_seconds:.3f} "
+        f"({args.workers} workers x {args.threads} threads)"
+    )
+    print(f"speedup:  {serial_time / parallel_time:8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""Compare a time-stretched speed preview against synthesizing again.
+
+Each sentence is synthesized once at speed 1.0, then every target speed is
+heard either by stretching those samples (the studio's preview) or by a new
+model pass (the final render). Run from the project root:
+
+    python -m benchmarks.speed_preview --sentences 10
+    python -m benchmarks.speed_preview --backend model --profile latency
+"""
+
+import argparse
+import time
+
+from config import DEFAULT_MODEL, DEFAULT_ONNX_PROFILE, DEFAULT_SAMPLE_RATE
+from registry import model_registry
+from timestretch import stretch_to_speed
+from utils import generate_audio_for_sentence
+
+from .parallel_synthesis import build_sentences
+from .stub_kokoro import make_stub_loader
+from .suite import summarize
+
+SPEEDS = [0.8, 0.9, 1.1, 1.2, 1.5]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--backend", choices=["stub", "model"], default="stub")
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--profile", default=DEFAULT_ONNX_PROFILE)
+    parser.add_argument("--stub-latency", type=float, default=0.05)
+    parser.add_argument("--stub-rtf", type=float, default=0.1)
+    parser.add_argument("--sentences", type=int, default=10)
+    parser.add_argument("--speeds", type=float, nargs="+", default=SPEEDS)
+    args = parser.parse_args()
+
+    if args.backend == "stub":
+        model_registry.loader = make_stub_loader(args.stub_latency, args.stub_rtf)
+    kokoro = model_registry.get_named(args.model, args.profile)
+
+    preview_seconds = []
+    inference_seconds = []
+    length_ratios = []
+    for sentence in build_sentences(args.sentences):
+        samples, sample_rate = generate_audio_for_sentence(
+            kokoro, sentence, DEFAULT_SAMPLE_RATE
+        )
+        for speed in args.speeds:
+            start = time.perf_counter()
+            preview = stretch_to_speed(samples, sample_rate, sentence["speed"], speed)
+            preview_seconds.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            rendered, _ = generate_audio_for_sentence(
+                kokoro, dict(sentence, speed=speed), DEFAULT_SAMPLE_RATE
+            )
+            inference_seconds.append(time.perf_counter() - start)
+            length_ratios.append(len(preview) / max(len(rendered), 1))
+
+    preview = summarize(preview_seconds)
+    inference = summarize(inference_seconds)
+    ratios = summarize(length_ratios)
+    print(f"Backend: {args.backend}, previews: {preview['count']}")
+    for name, result in [("preview", preview), ("re-inference", inference)]:
+        print(
+            f"{name}: p50 {result['p50'] * 1000:.1f} ms, "
+            f"p95 {result['p95'] * 1000:.1f} ms"
+        )
+    print(f"Preview is {inference['p50'] / preview['p50']:.0f}x faster at p50")
+    # The model doesn't scale durations exactly by speed
+    print(
+        f"Preview / re-inference length: {ratios['min']:.2f} to {ratios['max']:.2f}"
+    )
+
+
+if __name__ == "__main__":
+    main()
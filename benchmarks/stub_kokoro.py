@@ -0,0 +1,53 @@
+"""Deterministic stand-in for Kokoro, so benchmarks run without model files."""
+
+import time
+import zlib
+from types import SimpleNamespace
+
+import numpy as np
+
+from config import DEFAULT_SAMPLE_RATE, VOICES
+
+# Roughly how long the real model speaks per character at speed 1.0
+SECONDS_PER_CHAR = 0.065
+
+
+class StubKokoro:
+    """Produces a tone per voice with the length and latency of real synthesis"""
+
+    def __init__(self, model_file, voices_file, latency=0.05, rtf=0.1):
+        self.config = SimpleNamespace(model_path=model_file, voices_path=voices_file)
+        # Fixed cost per call plus a cost proportional to the audio produced
+        self.latency = latency
+        self.rtf = rtf
+        # Small stand-in style vectors, enough for voice blends to be computed
+        self.voices = {
+            voice: np.full((1, 1, 8), zlib.crc32(voice.encode("utf-8")), np.float32)
+            for voice in self.get_voices()
+        }
+
+    def get_voices(self):
+        return sorted({voice for voices in VOICES.values() for voice in voices})
+
+    def create(self, text, voice, speed=1.0, lang="en-us", is_phonemes=False):
+        duration = max(len(text), 1) * SECONDS_PER_CHAR / speed
+        samples = int(duration * DEFAULT_SAMPLE_RATE)
+        time.sleep(self.latency + duration * self.rtf)
+
+        # The same text and voice always give the same samples
+        if isinstance(voice, str):
+            voice = voice.encode("utf-8")
+        frequency = 110 + zlib.crc32(voice) % 330
+        phase = zlib.crc32(text.encode("utf-8")) % 1000 / 1000 * 2 * np.pi
+        t = np.arange(samples, dtype=np.float32) / DEFAULT_SAMPLE_RATE
+        audio = 0.1 * np.sin(2 * np.pi * frequency * t + phase)
+        return audio.astype(np.float32), DEFAULT_SAMPLE_RATE
+
+
+def make_stub_loader(latency=0.05, rtf=0.1):
+    """Build a model registry loader returning stub instances"""
+
+    def load_stub_model(model_file, voices_file, profile=None):
+        return StubKokoro(model_file, voices_file, latency, rtf)
+
+    return load_stub_model
@@ -0,0 +1,364 @@
+"""Measure the synthesis hot paths and write the results as JSON.
+
+Runs against the real model or a deterministic stub, so it also works on a
+machine without model files:
+
+    python -m benchmarks.suite --backend stub --clients 8 --requests 64
+    python -m benchmarks.suite --backend model --output results.json
+    python -m benchmarks.suite --backend stub --baseline results.json
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import socket
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from artifacts import ArtifactStore, check_output_settings, write_audio_atomic
+from cache import SynthesisCache
+from config import (
+    DEFAULT_MODEL,
+    DEFAULT_ONNX_PROFILE,
+    DEFAULT_OUTPUT_FORMAT,
+    DEFAULT_SAMPLE_RATE,
+    OUTPUT_FORMATS,
+    TEMP_DIR,
+)
+from metadata import MetadataStore
+from registry import model_registry
+from storage import LocalBackend
+from streaming import iter_audio_stream
+from utils import generate_audio_for_sentence
+
+from .parallel_synthesis import build_sentences
+from .stub_kokoro import make_stub_loader
+
+
+def summarize(values):
+    """Mean, spread and tail percentiles of a list of measurements"""
+    values = np.asarray(values, dtype=np.float64)
+    if not len(values):
+        return {}
+    return {
+        "count": int(len(values)),
+        "mean": float(values.mean()),
+        "min": float(values.min()),
+        "p50": float(np.percentile(values, 50)),
+        "p95": float(np.percentile(values, 95)),
+        "p99": float(np.percentile(values, 99)),
+        "max": float(values.max()),
+    }
+
+
+def get_peak_rss():
+    """Peak resident set size of this process in bytes, when the OS reports it"""
+    try:
+        import resource
+    except ImportError:
+        return None
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def bench_synthesis(kokoro, sentences):
+    """Real-time factor of each sentence synthesized on its own"""
+    rtfs = []
+    start = time.perf_counter()
+    for sentence in sentences:
+        sentence_start = time.perf_counter()
+        samples, sample_rate = generate_audio_for_sentence(
+            kokoro, sentence, DEFAULT_SAMPLE_RATE
+        )
+        elapsed = time.perf_counter() - sentence_start
+        rtfs.append(elapsed / (len(samples) / sample_rate))
+    return {
+        "rtf": summarize(rtfs),
+        "wall_seconds": time.perf_counter() - start,
+    }
+
+
+def bench_first_audio(kokoro, sentences, repeats):
+    """Time until the stream yields its first audio bytes"""
+    times = []
+    for i in range(repeats):
+        # Fresh text each time so nothing is deduplicated across runs
+        script = [
+            dict(sentence, text=f"{sentence['text']} {i}") for sentence in sentences
+        ]
+        start = time.perf_counter()
+        # PCM has no header, so the first chunk is the first sentence
+        stream = iter_audio_stream(kokoro, script, DEFAULT_SAMPLE_RATE, 0.5, 0.5, "pcm")
+        next(stream)
+        times.append(time.perf_counter() - start)
+        stream.close()
+    return {"seconds": summarize(times)}
+
+
+def bench_encoding(formats, sample_rates, seconds, repeats):
+    """Time to resample, encode and write the same audio in each format and rate"""
+    rng = np.random.default_rng(0)
+    samples = (rng.standard_normal(int(seconds * DEFAULT_SAMPLE_RATE)) * 0.1).astype(
+        np.float32
+    )
+
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        for output_format in formats:
+            for sample_rate in sample_rates:
+                name = f"{output_format}@{sample_rate}"
+                path = os.path.join(directory, f"output.{output_format}")
+                try:
+                    check_output_settings(output_format, sample_rate)
+                    times = []
+                    for _ in range(repeats):
+                        start = time.perf_counter()
+                        write_audio_atomic(
+                            path, samples, DEFAULT_SAMPLE_RATE, sample_rate
+                        )
+                        times.append(time.perf_counter() - start)
+                except Exception as e:
+                    results[name] = {"error": str(e)}
+                    continue
+
+                file_bytes = os.path.getsize(path)
+                results[name] = {
+                    "seconds": summarize(times),
+                    "audio_seconds": seconds,
+                    "file_bytes": file_bytes,
+                    "bytes_per_audio_second": file_bytes / seconds,
+                }
+    return results
+
+
+def get_free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@contextlib.contextmanager
+def serve_api():
+    """Run the API in this process, with its cache and outputs in a temp dir"""
+    import uvicorn
+
+    import api
+
+    with tempfile.TemporaryDirectory() as directory:
+        api.synthesis_cache = SynthesisCache(os.path.join(directory, "cache"))
+        api.artifact_store = ArtifactStore(
+            os.path.join(directory, "artifacts"),
+            backend=LocalBackend(),
+            metadata=MetadataStore(os.path.join(directory, "artifacts.db")),
+        )
+
+        port = get_free_port()
+        server = uvicorn.Server(
+            uvicorn.Config(api.app, host="127.0.0.1", port=port, log_level="warning")
+        )
+        thread = threading.Thread(target=server.run, daemon=True)
+        thread.start()
+        while not server.started:
+            if not thread.is_alive():
+                raise RuntimeError("API server failed to start")
+            time.sleep(0.05)
+
+        try:
+            yield f"http://127.0.0.1:{port}"
+        finally:
+            server.should_exit = True
+            thread.join()
+
+
+def post_json(url, payload):
+    request = urllib.request.Request(
+        url,
+        data=json.dumps(payload).encode("utf-8"),
+        headers={"Content-Type": "application/json"},
+        method="POST",
+    )
+    with urllib.request.urlopen(request) as response:
+        return json.loads(response.read())
+
+
+def bench_load(url, args):
+    """End-to-end /generate-audio latency under concurrent clients"""
+
+    def run_request(i):
+        # Distinct text per request so the cache doesn't answer for the model
+        sentences = [
+            dict(sentence, text=f"{sentence['text']} Request {i}.")
+            for sentence in build_sentences(args.request_sentences)
+        ]
+        payload = {
+            "sentences": sentences,
+            "output_format": args.output_format,
+            "model": args.model,
+            "profile": args.profile,
+        }
+        start = time.perf_counter()
+        try:
+            post_json(f"{url}/generate-audio", payload)
+        except Exception:
+            return None
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.clients) as executor:
+        latencies = list(executor.map(run_request, range(args.requests)))
+    wall = time.perf_counter() - start
+
+    succeeded = [latency for latency in latencies if latency is not None]
+    return {
+        "clients": args.clients,
+        "requests": args.requests,
+        "sentences_per_request": args.request_sentences,
+        "errors": len(latencies) - len(succeeded),
+        "latency_seconds": summarize(succeeded),
+        "requests_per_second": len(succeeded) / wall,
+        "wall_seconds": wall,
+    }
+
+
+def flatten(data, prefix=""):
+    """Flatten nested results into dotted metric names"""
+    metrics = {}
+    for key, value in data.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            metrics.update(flatten(value, f"{name}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            metrics[name] = value
+    return metrics
+
+
+def print_comparison(baseline, results):
+    """Print each metric next to its value in a previous run"""
+    old = flatten(baseline["results"])
+    new = flatten(results["results"])
+    for name in sorted(new):
+        if name in old and old[name]:
+            change = (new[name] - old[name]) / old[name]
+            print(f"{name:55} {old[name]:12.4f} -> {new[name]:12.4f} {change:+8.1%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--backend", choices=["stub", "model"], default="stub")
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--profile", default=DEFAULT_ONNX_PROFILE)
+    parser.add_argument("--stub-latency", type=float, default=0.05)
+    parser.add_argument("--stub-rtf", type=float, default=0.1)
+    parser.add_argument("--sentences", type=int, default=20)
+    parser.add_argument("--first-audio-runs", type=int, default=5)
+    parser.add_argument("--clients", type=int, default=4)
+    parser.add_argument("--requests", type=int, default=32)
+    parser.add_argument("--request-sentences", type=int, default=3)
+    parser.add_argument("--output-format", default=DEFAULT_OUTPUT_FORMAT)
+    parser.add_argument("--encode-formats", nargs="+", default=list(OUTPUT_FORMATS))
+    parser.add_argument(
+        "--encode-rates", nargs="+", type=int, default=[DEFAULT_SAMPLE_RATE]
+    )
+    parser.add_argument("--encode-seconds", type=float, default=60)
+    parser.add_argument("--encode-runs", type=int, default=3)
+    parser.add_argument(
+        "--url", help="Load test a running API instead of one started here"
+    )
+    parser.add_argument("--output")
+    parser.add_argument("--baseline", help="Results of a previous run to compare")
+    args = parser.parse_args()
+
+    if args.backend == "stub":
+        model_registry.loader = make_stub_loader(args.stub_latency, args.stub_rtf)
+
+    start = time.perf_counter()
+    kokoro = model_registry.get_named(args.model, args.profile)
+    load_seconds = time.perf_counter() - start
+
+    sentences = build_sentences(args.sentences)
+    results = {}
+    peak_rss = {}
+
+    print("Measuring per-sentence synthesis...")
+    results["synthesis"] = bench_synthesis(kokoro, sentences)
+    peak_rss["synthesis"] = get_peak_rss()
+
+    print("Measuring time to first audio...")
+    results["first_audio"] = bench_first_audio(
+        kokoro, sentences[:3], args.first_audio_runs
+    )
+
+    print("Measuring encode and write time...")
+    results["encoding"] = bench_encoding(
+        args.encode_formats, args.encode_rates, args.encode_seconds, args.encode_runs
+    )
+    peak_rss["encoding"] = get_peak_rss()
+
+    print(f"Load testing /generate-audio with {args.clients} clients...")
+    if args.url:
+        results["load"] = bench_load(args.url.rstrip("/"), args)
+    else:
+        with serve_api() as url:
+            results["load"] = bench_load(url, args)
+    peak_rss["load"] = get_peak_rss()
+
+    results["model_load_seconds"] = load_seconds
+    results["peak_rss_bytes"] = peak_rss
+
+    report = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "backend": args.backend,
+        "settings": vars(args),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "results": results,
+    }
+
+    output = args.output or os.path.join(
+        TEMP_DIR, "benchmarks", f"{time.strftime('%Y%m%d-%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    synthesis = results["synthesis"]["rtf"]
+    load = results["load"]
+    print(f"RTF p50 {synthesis['p50']:.3f}, p95 {synthesis['p95']:.3f}")
+    print(f"first audio p50 {results['first_audio']['seconds']['p50']:.3f}s")
+    for name, encoding in results["encoding"].items():
+        if "error" in encoding:
+            print(f"{name}: {encoding['error']}")
+            continue
+        print(
+            f"{name}: encode p50 {encoding['seconds']['p50']:.3f}s, "
+            f"{encoding['bytes_per_audio_second'] / 1000:.1f} kB per audio second"
+        )
+    if load["latency_seconds"]:
+        print(
+            f"/generate-audio p50 {load['latency_seconds']['p50']:.3f}s, "
+            f"p95 {load['latency_seconds']['p95']:.3f}s, "
+            f"p99 {load['latency_seconds']['p99']:.3f}s, "
+            f"{load['requests_per_second']:.2f} req/s, {load['errors']} errors"
+        )
+    print(f"Results written to {output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            print_comparison(json.load(f), report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from config import CACHE_DIR, CACHE_DISK_MAX_BYTES, CACHE_MEMORY_MAX_BYTES
+
+
+def file_fingerprint(path):
+    """Identify a file by its path, size and modification time"""
+    try:
+        stat = os.stat(path)
+        return [os.path.abspath(path), stat.st_size, stat.st_mtime_ns]
+    except OSError:
+        return [os.path.abspath(path), 0, 0]
+
+
+def make_cache_key(sentence, model_file, voices_file):
+    """Build the content hash of a sentence synthesized with a given model"""
+    parts = [
+        sentence["text"],
+        sentence["lang"],
+        sentence["voice"],
+        float(sentence["speed"]),
+        file_fingerprint(model_file),
+        file_fingerprint(voices_file),
+    ]
+    # Given phonemes replace G2P, so they change the audio
+    if sentence.get("phonemes"):
+        parts.append(sentence["phonemes"])
+    payload = json.dumps(parts, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class SynthesisCache:
+    """Two-tier cache of synthesized samples: memory LRU backed by a disk store"""
+
+    def __init__(
+        self,
+        cache_dir=CACHE_DIR,
+        memory_max_bytes=CACHE_MEMORY_MAX_BYTES,
+        disk_max_bytes=CACHE_DISK_MAX_BYTES,
+    ):
+        self.cache_dir = cache_dir
+        self.memory_max_bytes = memory_max_bytes
+        self.disk_max_bytes = disk_max_bytes
+
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()
+        self._memory_bytes = 0
+        self._disk_bytes = self._scan_disk_bytes()
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.npz")
+
+    def _scan_disk_bytes(self):
+        """Sum the size of the entries already on disk"""
+        if not os.path.isdir(self.cache_dir):
+            return 0
+        return sum(
+            entry.stat().st_size
+            for entry in os.scandir(self.cache_dir)
+            if entry.name.endswith(".npz")
+        )
+
+    def _remember(self, key, samples, sample_rate):
+        """Insert into the memory tier, evicting least recently used entries"""
+        if samples.nbytes > self.memory_max_bytes:
+            return
+
+        if key in self._memory:
+            self._memory.move_to_end(key)
+            return
+
+        self._memory[key] = (samples, sample_rate)
+        self._memory_bytes += samples.nbytes
+
+        while self._memory_bytes > self.memory_max_bytes:
+            _, (evicted, _) = self._memory.popitem(last=False)
+            self._memory_bytes -= evicted.nbytes
+
+    def _evict_disk(self):
+        """Remove the oldest disk entries until the store fits its budget"""
+        entries = []
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.endswith(".npz"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        entries.sort()
+
+        # Evict a little below the limit so we don't rescan on every write
+        target = int(self.disk_max_bytes * 0.9)
+        for _, size, path in entries:
+            if self._disk_bytes <= target:
+                break
+            try:
+                os.remove(path)
+                self._disk_bytes -= size
+            except OSError:
+                pass
+
+    def contains(self, key):
+        """Check whether a key is cached without loading it"""
+        with self._lock:
+            if key in self._memory:
+                return True
+        return os.path.exists(self._path(key))
+
+    def get(self, key):
+        """Return cached (samples, sample_rate) for a key, or None"""
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return self._memory[key]
+
+        path = self._path(key)
+        try:
+            with np.load(path) as data:
+                samples = data["samples"]
+                sample_rate = int(data["sample_rate"])
+            # Refresh mtime so disk eviction follows recent use
+            os.utime(path)
+        except (OSError, KeyError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+
+        samples.flags.writeable = False
+        with self._lock:
+            self.disk_hits += 1
+            self._remember(key, samples, sample_rate)
+        return samples, sample_rate
+
+    def put(self, key, samples, sample_rate):
+        """Store samples in both tiers"""
+        samples = np.asarray(samples, dtype=np.float32)
+        samples.flags.writeable = False
+
+        path = self._path(key)
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(temp_path, "wb") as f:
+                np.savez(f, samples=samples, sample_rate=sample_rate)
+            size = os.path.getsize(temp_path)
+            if os.path.exists(path):
+                size -= os.path.getsize(path)
+            os.replace(temp_path, path)
+        except OSError:
+            # The disk tier is best effort, the memory tier still works
+            size = 0
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+        with self._lock:
+            self._remember(key, samples, sample_rate)
+            self._disk_bytes += size
+            if self._disk_bytes > self.disk_max_bytes:
+                self._evict_disk()
+
+        return samples, sample_rate
+
+    def stats(self):
+        """Report hit/miss counts and tier sizes"""
+        with self._lock:
+            hits = self.memory_hits + self.disk_hits
+            lookups = hits + self.misses
+            return {
+                "hits": hits,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": hits / lookups if lookups else 0.0,
+                "memory_entries": len(self._memory),
+                "memory_bytes": self._memory_bytes,
+                "disk_bytes": self._disk_bytes,
+            }
+
+    def clear(self):
+        """Drop every entry from both tiers"""
+        with self._lock:
+            self._memory.clear()
+            self._memory_bytes = 0
+            # The disk tier is only created when the first entry is saved
+            if os.path.isdir(self.cache_dir):
+                for entry in os.scandir(self.cache_dir):
+                    if entry.name.endswith(".npz"):
+                        os.remove(entry.path)
+            self._disk_bytes = 0
+
+
+# Shared cache used by the API and the Streamlit app
+synthesis_cache = SynthesisCache()
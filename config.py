@@ -4,14 +4,202 @@ import os
 TEMP_DIR = "temp"
 os.makedirs(TEMP_DIR, exist_ok=True)
 
+# Directory for per-request output files
+ARTIFACTS_DIR = os.path.join(TEMP_DIR, "artifacts")
+os.makedirs(ARTIFACTS_DIR, exist_ok=True)
+
+# Directory for serialized optimized ONNX graphs
+OPTIMIZED_MODELS_DIR = os.path.join(TEMP_DIR, "optimized")
+
+# Directory for persisted voice blends
+VOICE_BLENDS_DIR = os.path.join(TEMP_DIR, "voices")
+
+# Directory for offline batch render outputs
+BATCH_RENDER_DIR = os.path.join(TEMP_DIR, "batch")
+
+# Directory for cached sentence audio
+CACHE_DIR = os.path.join(TEMP_DIR, "cache")
+os.makedirs(CACHE_DIR, exist_ok=True)
+
+# Directory for cached phonemes (set to None to keep them in memory only)
+PHONEME_CACHE_DIR = os.path.join(TEMP_DIR, "phonemes")
+
+# Directory of the model files; models registered through the API must be
+# in it or listed in MODELS
+MODELS_DIR = "models"
+
 # Default values
-DEFAULT_MODEL_FILE = os.path.join("models", "kokoro-v1.0.onnx")
-DEFAULT_VOICES_FILE = os.path.join("models", "voices-v1.0.bin")
+DEFAULT_MODEL_FILE = os.path.join(MODELS_DIR, "kokoro-v1.0.onnx")
+DEFAULT_VOICES_FILE = os.path.join(MODELS_DIR, "voices-v1.0.bin")
+DEFAULT_MODEL = "default"
 DEFAULT_OUTPUT_FORMAT = "mp3"
+DEFAULT_STREAM_FORMAT = "wav"
 DEFAULT_MIN_PAUSE = 0.5
 DEFAULT_MAX_PAUSE = 1.2
 DEFAULT_SAMPLE_RATE = 24000
 
+# Output encodings by file extension: soundfile format and subtype, the
+# sample rates the encoder accepts (None for any) and the default bitrate
+# (bits per second) where it can be set
+OUTPUT_FORMATS = {
+    "wav": {"format": "WAV", "subtype": "PCM_16", "sample_rates": None},
+    "mp3": {"format": "MP3", "subtype": "MPEG_LAYER_III", "sample_rates": None},
+    "flac": {"format": "FLAC", "subtype": "PCM_16", "sample_rates": None},
+    "ogg": {
+        "format": "OGG",
+        "subtype": "OPUS",
+        "sample_rates": [8000, 12000, 16000, 24000, 48000],
+        "bitrate": 32000,
+    },
+}
+
+# Output sample rates, audio is resampled from DEFAULT_SAMPLE_RATE
+OUTPUT_SAMPLE_RATES = [8000, 16000, 22050, 24000, 44100, 48000]
+
+# Resampling filter length, in zero crossings of the sinc on each side
+RESAMPLE_ZERO_CROSSINGS = 16
+
+# Synthesis cache limits
+CACHE_MEMORY_MAX_BYTES = 256 * 1024 * 1024
+CACHE_DISK_MAX_BYTES = 2 * 1024 * 1024 * 1024
+
+# Phoneme cache limits, in entries
+PHONEME_CACHE_MAX_ENTRIES = 50000
+PHONEME_CACHE_DISK_MAX_ENTRIES = 500000
+
+# Output file limits, older requests are evicted first
+ARTIFACT_MAX_BYTES = 5 * 1024 * 1024 * 1024
+ARTIFACT_MAX_FILES = 20000
+ARTIFACT_TTL = 24 * 3600
+ARTIFACT_SWEEP_INTERVAL = 60
+
+# Where finished outputs are published so every API worker can serve them:
+# "local" (only this machine), "shared" (a directory mounted on every node)
+# or "s3" (an S3-compatible bucket). The metadata database must be reachable
+# by every worker too.
+ARTIFACT_BACKEND = os.environ.get("ARTIFACT_BACKEND", "local")
+ARTIFACT_DB = os.environ.get("ARTIFACT_DB", os.path.join(TEMP_DIR, "artifacts.db"))
+ARTIFACT_SHARED_DIR = os.environ.get(
+    "ARTIFACT_SHARED_DIR", os.path.join(TEMP_DIR, "shared")
+)
+ARTIFACT_S3_BUCKET = os.environ.get("ARTIFACT_S3_BUCKET", "audio-studio")
+ARTIFACT_S3_PREFIX = os.environ.get("ARTIFACT_S3_PREFIX", "artifacts")
+# Endpoint of an S3-compatible service (empty for AWS); "local" stores the
+# bucket in ARTIFACT_S3_LOCAL_DIR instead, for development and tests
+ARTIFACT_S3_ENDPOINT = os.environ.get("ARTIFACT_S3_ENDPOINT", "")
+ARTIFACT_S3_LOCAL_DIR = os.path.join(TEMP_DIR, "s3")
+
+# Encoded audio each Streamlit session keeps in memory for playback and
+# download, and the total for all sessions together
+SESSION_AUDIO_MAX_BYTES = 64 * 1024 * 1024
+SESSION_AUDIO_TOTAL_MAX_BYTES = 1024 * 1024 * 1024
+
+# Finished outputs never change, so clients and CDNs may keep them until
+# they expire; files rewritten while a render runs are always revalidated
+DOWNLOAD_CACHE_CONTROL = f"public, max-age={ARTIFACT_TTL}, immutable"
+DOWNLOAD_MUTABLE_CACHE_CONTROL = "no-cache"
+
+# ONNX Runtime execution profiles. Keys: intra_op_threads, inter_op_threads,
+# execution_mode (sequential/parallel), graph_optimization (disable/basic/
+# extended/all), save_optimized (reuse the optimized graph on later startups),
+# variant (int8/fp16, used when e.g. kokoro-v1.0.int8.onnx is present) and
+# providers. The empty profile keeps the session kokoro_onnx creates.
+ONNX_PROFILES = {
+    "default": {},
+    # One request at a time using every core
+    "latency": {
+        "intra_op_threads": os.cpu_count() or 1,
+        "inter_op_threads": 1,
+        "execution_mode": "sequential",
+        "graph_optimization": "all",
+        "save_optimized": True,
+    },
+    # Several concurrent requests sharing the cores
+    "throughput": {
+        "intra_op_threads": 2,
+        "inter_op_threads": 1,
+        "execution_mode": "sequential",
+        "graph_optimization": "all",
+        "save_optimized": True,
+    },
+    "int8": {
+        "variant": "int8",
+        "graph_optimization": "all",
+        "save_optimized": True,
+    },
+    "fp16": {
+        "variant": "fp16",
+        "graph_optimization": "all",
+        "save_optimized": True,
+    },
+}
+DEFAULT_ONNX_PROFILE = os.environ.get("ONNX_PROFILE", "default")
+
+# Models the API can serve, by name (model file, voices file)
+MODELS = {
+    DEFAULT_MODEL: (DEFAULT_MODEL_FILE, DEFAULT_VOICES_FILE),
+}
+
+# Named voice blends usable as a sentence voice, as "voice:weight" specs,
+# e.g. {"narrator": "af_sarah:0.6,af_nicole:0.4"}. They are saved to
+# VOICE_BLENDS_DIR and loaded when a model loads; other blends are computed
+# on first use and kept in memory, up to VOICE_BLEND_CACHE_SIZE of them
+VOICE_BLENDS = {}
+VOICE_BLEND_CACHE_SIZE = 64
+
+# Model registry: how many models stay loaded and the warm-up sentence
+MODEL_REGISTRY_MAX_LOADED = 2
+WARMUP_TEXT = "Warming up."
+
+# Admission control for synthesis requests: how many run at once, how many
+# may wait in total (503 beyond) and per client (429 beyond), and how long
+# one may wait. Clients are told apart by ADMISSION_CLIENT_HEADER, or their
+# address. A request costs its characters plus a fixed cost per sentence;
+# Retry-After starts from ADMISSION_CHARS_PER_SECOND until speed is measured
+ADMISSION_MAX_CONCURRENT = max(1, (os.cpu_count() or 1) // 4)
+ADMISSION_MAX_QUEUE = 64
+ADMISSION_MAX_QUEUE_PER_CLIENT = 8
+ADMISSION_MAX_WAIT = 30
+ADMISSION_SENTENCE_COST = 20
+ADMISSION_CHARS_PER_SECOND = 200
+ADMISSION_CLIENT_HEADER = "X-Client-Id"
+
+# Background job settings
+JOB_WORKERS = 2
+JOB_RESULT_TTL = 3600
+# Seconds between progress updates saved for the other workers
+JOB_PROGRESS_SAVE_INTERVAL = 1.0
+
+# Batched inference: sentences sharing voice, language, speed and token length
+# run together
+# when the model supports it (set to 1 to disable)
+BATCH_MAX_SIZE = 8
+
+# Parallel synthesis settings (workers x threads should not exceed the cores)
+PARALLEL_ONNX_THREADS = 2
+PARALLEL_WORKERS = max(1, (os.cpu_count() or 1) // PARALLEL_ONNX_THREADS)
+
+# Document mode: longest sentence (characters) per language that stays well
+# under the model's 510 phoneme tokens, and sentences rendered per chunk
+# (an interrupted render resumes from the last finished chunk)
+DOCUMENT_MAX_CHARS = {
+    "en-us": 350,
+    "en-gb": 350,
+    "es": 300,
+    "fr": 300,
+    "it": 300,
+    "pt-br": 300,
+    "hi": 250,
+    "ja": 120,
+    "zh": 120,
+}
+DOCUMENT_CHUNK_SENTENCES = 32
+# Largest document accepted for upload
+DOCUMENT_MAX_BYTES = 50 * 1024 * 1024
+
+# Histogram buckets (seconds) of the /metrics latency and stage timers
+METRICS_BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60]
+
 # Default sentence configuration
 DEFAULT_SENTENCE = {
     "text": "",
@@ -20,6 +208,10 @@ DEFAULT_SENTENCE = {
     "speed": 1.0,
 }
 
+# Speech speeds the model accepts
+MIN_SPEED = 0.5
+MAX_SPEED = 2.0
+
 # Voice configurations
 VOICES = {
     "en-us": [
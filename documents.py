@@ -0,0 +1,331 @@
+import glob
+import json
+import os
+import re
+from contextlib import nullcontext
+from itertools import groupby, islice
+
+from artifacts import AudioWriter, get_download_url
+from config import DOCUMENT_CHUNK_SENTENCES, DOCUMENT_MAX_CHARS
+from utils import RenderCancelled, generate_audio_for_sentences, generate_silence
+
+# Chapter index written next to the chapter files, also used to resume
+CHAPTER_INDEX_FILE = "chapters.json"
+
+# Uploaded document and its render settings, kept hidden in the request dir
+DOCUMENT_FILE = ".document.txt"
+DOCUMENT_SETTINGS_FILE = ".document.json"
+
+# Markdown "# Title" / "## Title" and plain text "Chapter 12" style headings
+HEADING_PATTERN = re.compile(r"^ {0,3}#{1,2}\s+(.+?)\s*#*\s*$")
+CHAPTER_PATTERN = re.compile(
+    r"^\s*(chapter|cap[ií]tulo|chapitre|capitolo|kapitel)\s+\S+.*$", re.IGNORECASE
+)
+
+# A sentence runs up to end punctuation (and closing quotes) followed by a
+# space, or up to CJK / Devanagari end punctuation, which needs no space
+SENTENCE_PATTERN = re.compile(
+    r"\S.*?(?:[.!?…]+[\"'”’»)\]]*(?=\s|$)|[。！？।]+[\"'”’»」』)\]]*|$)", re.DOTALL
+)
+CLAUSE_PATTERN = re.compile(r"[,;:、，；：—–]\s*")
+
+# Flush very long paragraphs early so a file without blank lines still
+# streams instead of being read into memory
+MAX_PARAGRAPH_CHARS = 20000
+
+
+def clean_markdown(line):
+    """Strip markdown markup that shouldn't be read aloud"""
+    line = re.sub(r"!\[[^\]]*\]\([^)]*\)", "", line)
+    line = re.sub(r"\[([^\]]*)\]\([^)]*\)", r"\1", line)
+    line = re.sub(r"^\s*(?:[-*+]|\d+[.)]|>+)\s+", "", line)
+    line = re.sub(r"[*_`~]+", "", line)
+    return line.strip()
+
+
+def split_to_fit(text, max_chars):
+    """Split a sentence at clauses, then words, so each piece fits the limit"""
+    while len(text) > max_chars:
+        window = text[:max_chars]
+        clauses = list(CLAUSE_PATTERN.finditer(window))
+        if clauses and clauses[-1].end() > max_chars // 3:
+            cut = clauses[-1].end()
+        elif " " in window:
+            cut = window.rindex(" ") + 1
+        else:
+            cut = max_chars
+        yield text[:cut].strip()
+        text = text[cut:].strip()
+    if text:
+        yield text
+
+
+def split_sentences(paragraph, max_chars):
+    """Split a paragraph into sentences that fit the model's input limit"""
+    for match in SENTENCE_PATTERN.finditer(paragraph):
+        sentence = " ".join(match.group().split())
+        if sentence:
+            yield from split_to_fit(sentence, max_chars)
+
+
+class SentenceBuffer:
+    """Collect text arriving in fragments and hand out each sentence once complete.
+
+    A sentence is complete when something follows its end punctuation, since
+    "3." may still become "3.5". Text running past the length limit without
+    an end is cut at clauses or words like long document sentences.
+    """
+
+    def __init__(self, lang):
+        self.max_chars = DOCUMENT_MAX_CHARS.get(lang, min(DOCUMENT_MAX_CHARS.values()))
+        self.text = ""
+
+    def feed(self, fragment):
+        """Add a text fragment, returning the sentences it completes"""
+        self.text += fragment
+        sentences = []
+        position = 0
+        for match in SENTENCE_PATTERN.finditer(self.text):
+            # The last match may still grow
+            if match.end() >= len(self.text):
+                break
+            sentences.extend(split_sentences(match.group(), self.max_chars))
+            position = match.end()
+        self.text = self.text[position:]
+
+        if len(self.text) > self.max_chars:
+            *complete, self.text = split_to_fit(
+                " ".join(self.text.split()), self.max_chars
+            )
+            sentences.extend(complete)
+        return sentences
+
+    def flush(self):
+        """Return the buffered text as sentences, even without an end"""
+        sentences = list(split_sentences(self.text, self.max_chars))
+        self.text = ""
+        return sentences
+
+    def clear(self):
+        """Drop the buffered text"""
+        self.text = ""
+
+
+def iter_document_sentences(lines, lang):
+    """Lazily yield (chapter number, chapter title, sentence text) from text lines"""
+    max_chars = DOCUMENT_MAX_CHARS.get(lang, min(DOCUMENT_MAX_CHARS.values()))
+    chapter = 1
+    title = None
+    has_content = False
+    paragraph = []
+    paragraph_chars = 0
+    in_code_block = False
+
+    def flush():
+        nonlocal has_content, paragraph_chars
+        text = " ".join(paragraph)
+        paragraph.clear()
+        paragraph_chars = 0
+        for sentence in split_sentences(text, max_chars):
+            has_content = True
+            yield chapter, title or f"Chapter {chapter}", sentence
+
+    for line in lines:
+        if line.lstrip().startswith("```"):
+            in_code_block = not in_code_block
+            continue
+        if in_code_block:
+            continue
+
+        match = HEADING_PATTERN.match(line)
+        heading = match.group(1) if match else None
+        if heading is None and CHAPTER_PATTERN.match(line):
+            heading = line
+        if heading is not None:
+            yield from flush()
+            # Headings with nothing under them (e.g. the book title right
+            # before chapter one) are replaced by the next one
+            if has_content:
+                chapter += 1
+                has_content = False
+            title = clean_markdown(heading)
+            continue
+
+        text = clean_markdown(line)
+        if text:
+            paragraph.append(text)
+            paragraph_chars += len(text)
+        if not text or paragraph_chars > MAX_PARAGRAPH_CHARS:
+            yield from flush()
+
+    yield from flush()
+
+
+def count_document_sentences(lines, lang):
+    """Count the sentences of a document without keeping them"""
+    return sum(1 for _ in iter_document_sentences(lines, lang))
+
+
+def load_chapter_index(output_dir):
+    """Read the chapter index of a render, or None when it hasn't started"""
+    try:
+        with open(os.path.join(output_dir, CHAPTER_INDEX_FILE)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def save_chapter_index(output_dir, index):
+    """Write the chapter index atomically so an interrupted write can't corrupt it"""
+    path = os.path.join(output_dir, CHAPTER_INDEX_FILE)
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w") as f:
+        json.dump(index, f, indent=2, ensure_ascii=False)
+    os.replace(temp_path, path)
+    return path
+
+
+def get_part_path(output_dir, chapter, chunk):
+    # Hidden names are never served by the download endpoint
+    return os.path.join(output_dir, f".chapter_{chapter:03d}.part_{chunk:05d}.wav")
+
+
+def write_chunk(
+    kokoro, sentences, part_path, sample_rate, min_pause, max_pause, first, cache, pool
+):
+    """Render a chunk of sentences into a lossless part file"""
+    with AudioWriter(part_path, sample_rate, subtype="FLOAT") as writer:
+        for idx, (samples, sample_rate) in enumerate(
+            generate_audio_for_sentences(kokoro, sentences, sample_rate, cache, pool)
+        ):
+            # Silence goes before every sentence but the chapter's first
+            if idx or not first:
+                writer.write(generate_silence(sample_rate, min_pause, max_pause))
+            writer.write(samples)
+
+
+def join_parts(part_paths, chapter_path, sample_rate):
+    """Encode the part files of a chapter into its final file, block by block"""
+    # Imported here so that importing this module doesn't load libsndfile
+    import soundfile as sf
+
+    with AudioWriter(chapter_path, sample_rate) as writer:
+        for part_path in part_paths:
+            for block in sf.blocks(
+                part_path, blocksize=sample_rate * 10, dtype="float32"
+            ):
+                writer.write(block)
+    return writer.frames
+
+
+def render_document(
+    kokoro,
+    lines,
+    lang,
+    voice,
+    speed,
+    sample_rate,
+    min_pause,
+    max_pause,
+    output_format,
+    output_dir,
+    cache=None,
+    pool=None,
+    chunk_size=DOCUMENT_CHUNK_SENTENCES,
+    on_progress=None,
+    should_cancel=None,
+    admission=None,
+):
+    """Render a document into one audio file per chapter plus a chapter index.
+
+    Sentences are read, synthesized and written a chunk at a time, so memory
+    doesn't grow with the document. Finished chunks and chapters are kept on
+    disk, and rendering again into the same directory resumes after them.
+    admission(sentences), when given, returns a context manager holding a
+    synthesis slot while a chunk is rendered.
+    """
+    admission = admission or (lambda sentences: nullcontext())
+    settings = {
+        "lang": lang,
+        "voice": voice,
+        "speed": speed,
+        "output_format": output_format,
+        "chunk_size": chunk_size,
+    }
+
+    index = load_chapter_index(output_dir)
+    if index is None or index["settings"] != settings:
+        # Different settings produce different audio, so start over
+        for part_path in glob.glob(os.path.join(output_dir, ".chapter_*.part_*.wav")):
+            os.remove(part_path)
+        index = {"settings": settings, "complete": False, "chapters": []}
+        save_chapter_index(output_dir, index)
+    finished = {chapter["number"] for chapter in index["chapters"]}
+
+    done = 0
+    for number, chapter_sentences in groupby(
+        iter_document_sentences(lines, lang), key=lambda item: item[0]
+    ):
+        chapter_sentences = iter(chapter_sentences)
+        chunk_number = 0
+        part_paths = []
+        title = None
+        count = 0
+
+        while True:
+            chunk = list(islice(chapter_sentences, chunk_size))
+            if not chunk:
+                break
+            title = chunk[0][1]
+            count += len(chunk)
+            done += len(chunk)
+
+            if number not in finished:
+                part_path = get_part_path(output_dir, number, chunk_number)
+                part_paths.append(part_path)
+                # Chunks finished before an interruption are not rendered again
+                if not os.path.exists(part_path):
+                    sentences = [
+                        {"text": text, "lang": lang, "voice": voice, "speed": speed}
+                        for _, _, text in chunk
+                    ]
+                    with admission(sentences):
+                        write_chunk(
+                            kokoro,
+                            sentences,
+                            part_path,
+                            sample_rate,
+                            min_pause,
+                            max_pause,
+                            chunk_number == 0,
+                            cache,
+                            pool,
+                        )
+
+            chunk_number += 1
+            if on_progress:
+                on_progress(done)
+            if should_cancel and should_cancel():
+                raise RenderCancelled("Render cancelled")
+
+        if number in finished:
+            continue
+
+        chapter_path = os.path.join(output_dir, f"chapter_{number:03d}.{output_format}")
+        frames = join_parts(part_paths, chapter_path, sample_rate)
+        index["chapters"].append(
+            {
+                "number": number,
+                "title": title,
+                "file": os.path.basename(chapter_path),
+                "url_download": get_download_url(chapter_path),
+                "sentences": count,
+                "duration": frames / sample_rate,
+            }
+        )
+        save_chapter_index(output_dir, index)
+        for part_path in part_paths:
+            os.remove(part_path)
+
+    index["complete"] = True
+    return save_chapter_index(output_dir, index)
@@ -0,0 +1,62 @@
+import threading
+import time
+
+
+class Readiness:
+    """Progress of the model load started when the API starts.
+
+    The API answers as soon as it is imported; the liveness probe passes
+    from then on, while the readiness probe waits for the model to be
+    loaded and warmed up, and reports the stage or the reason it failed.
+    """
+
+    def __init__(self, started_at):
+        # perf_counter() when the API module started importing
+        self.started_at = started_at
+        self.import_seconds = None
+        self.status = "starting"
+        self.stage = None
+        self.error = None
+        self.ready_seconds = None
+        self._stage_started_at = None
+        self._lock = threading.Lock()
+
+    def imported(self):
+        """Record that the API module finished importing"""
+        self.import_seconds = time.perf_counter() - self.started_at
+
+    def set_stage(self, stage):
+        """Record the loading stage that is starting"""
+        with self._lock:
+            self.status = "loading"
+            self.stage = stage
+            self._stage_started_at = time.perf_counter()
+
+    def set_ready(self):
+        with self._lock:
+            self.status = "ready"
+            self.stage = None
+            self.ready_seconds = time.perf_counter() - self.started_at
+
+    def set_failed(self, error):
+        with self._lock:
+            self.status = "failed"
+            self.error = f"{type(error).__name__}: {error}"
+
+    def is_ready(self):
+        return self.status == "ready"
+
+    def describe(self):
+        """Report the status, the current stage and the startup timings"""
+        with self._lock:
+            data = {
+                "status": self.status,
+                "stage": self.stage,
+                "import_seconds": self.import_seconds,
+                "ready_seconds": self.ready_seconds,
+            }
+            if self.status == "loading":
+                data["stage_seconds"] = time.perf_counter() - self._stage_started_at
+            if self.error is not None:
+                data["error"] = self.error
+            return data
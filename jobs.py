@@ -0,0 +1,179 @@
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from artifacts import artifact_store, get_download_url, get_request_id
+from config import JOB_PROGRESS_SAVE_INTERVAL, JOB_RESULT_TTL, JOB_WORKERS
+from metrics import record_error
+from utils import RenderCancelled
+
+
+# Statuses of jobs that won't change anymore
+FINISHED_STATUSES = ("completed", "failed", "cancelled")
+
+
+class Job:
+    """State of an audio generation job.
+
+    The state is saved to the shared metadata store, so any worker can
+    report or cancel the job.
+    """
+
+    def __init__(self, total, metadata=None):
+        self.id = uuid.uuid4().hex
+        self.status = "queued"
+        self.total = total
+        self.done = 0
+        self.audio_file = None
+        self.error = None
+        self.created_at = time.time()
+        self.finished_at = None
+        self.cancel_event = threading.Event()
+        self.future = None
+        self.metadata = metadata
+        self._saved_at = 0.0
+
+    def save(self):
+        """Store the current state for the other workers"""
+        if self.metadata is not None:
+            self._saved_at = time.monotonic()
+            self.metadata.save_job(self.id, self.to_dict())
+
+    def set_progress(self, done):
+        """Update the progress, saving it at most every few seconds"""
+        self.done = done
+        if time.monotonic() - self._saved_at > JOB_PROGRESS_SAVE_INTERVAL:
+            self.save()
+
+    def is_cancelled(self):
+        """Whether the job was cancelled here or from another worker"""
+        if self.cancel_event.is_set() or self.metadata is None:
+            return self.cancel_event.is_set()
+        if self.metadata.is_job_cancel_requested(self.id):
+            self.cancel_event.set()
+        return self.cancel_event.is_set()
+
+    def to_dict(self):
+        """Describe the job for API responses"""
+        data = {
+            "job_id": self.id,
+            "status": self.status,
+            "progress": {"done": self.done, "total": self.total},
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+        }
+        if self.audio_file:
+            data["url_download"] = get_download_url(self.audio_file)
+        if self.error:
+            data["error"] = self.error
+        return data
+
+
+class JobManager:
+    """Run render jobs on a bounded worker pool and keep results for a TTL"""
+
+    def __init__(
+        self,
+        max_workers=JOB_WORKERS,
+        result_ttl=JOB_RESULT_TTL,
+        metadata=None,
+        on_expire=None,
+    ):
+        self.result_ttl = result_ttl
+        # Called with each job forgotten once its TTL has passed
+        self.on_expire = on_expire
+        self.metadata = metadata or artifact_store.metadata
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="job"
+        )
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, render, total):
+        """Queue a job; render(job) must return the path of the final audio file"""
+        self.purge_expired()
+
+        job = Job(total, self.metadata)
+        job.save()
+        with self._lock:
+            self._jobs[job.id] = job
+        job.future = self._executor.submit(self._run, job, render)
+        return job
+
+    def _run(self, job, render):
+        if job.is_cancelled():
+            self._finish(job, "cancelled")
+            return
+
+        job.status = "running"
+        job.save()
+        try:
+            job.audio_file = render(job)
+            self._finish(job, "completed")
+        except RenderCancelled:
+            self._finish(job, "cancelled")
+        except Exception as e:
+            record_error(e)
+            job.error = str(e)
+            self._finish(job, "failed")
+
+    def _finish(self, job, status):
+        job.status = status
+        job.finished_at = time.time()
+        job.save()
+
+    def get(self, job_id):
+        """Get a job of this worker by id, or None when unknown or expired"""
+        self.purge_expired()
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def describe(self, job_id):
+        """Describe a job run by any worker, or None when unknown or expired"""
+        job = self.get(job_id)
+        if job is not None:
+            return job.to_dict()
+        return self.metadata.get_job(job_id)
+
+    def cancel(self, job_id):
+        """Cancel a queued or running job, returning its description"""
+        job = self.get(job_id)
+        if job is None:
+            # The worker running the job sees the request on its next check
+            data = self.metadata.get_job(job_id)
+            if data is not None and data["status"] not in FINISHED_STATUSES:
+                self.metadata.request_job_cancel(job_id)
+            return data
+
+        job.cancel_event.set()
+        # Jobs still waiting for a worker never start
+        if job.future.cancel():
+            self._finish(job, "cancelled")
+        return job.to_dict()
+
+    def purge_expired(self):
+        """Forget finished jobs and remove their outputs once the TTL has passed"""
+        now = time.time()
+        with self._lock:
+            expired = [
+                job
+                for job in self._jobs.values()
+                if job.finished_at and now - job.finished_at > self.result_ttl
+            ]
+            for job in expired:
+                del self._jobs[job.id]
+        self.metadata.remove_jobs_before(now - self.result_ttl, FINISHED_STATUSES)
+
+        for job in expired:
+            if job.audio_file:
+                artifact_store.remove(get_request_id(job.audio_file))
+            if self.on_expire:
+                self.on_expire(job)
+
+    def shutdown(self):
+        """Stop accepting jobs and cancel pending ones"""
+        with self._lock:
+            for job in self._jobs.values():
+                job.cancel_event.set()
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,215 @@
+import asyncio
+import json
+import time
+
+from fastapi import WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
+
+from admission import AdmissionRejected, estimate_cost
+from documents import SentenceBuffer
+from metrics import live_flush_seconds, record_error, record_sentence
+from resample import Resampler
+from streaming import to_pcm16, wav_stream_header
+from utils import generate_audio_for_sentence, generate_silence
+
+# Formats of live sessions: an Ogg encoder holds audio back until a page is
+# full, which would delay the end of every utterance
+LIVE_STREAM_FORMATS = ("pcm", "wav")
+
+
+class LiveSession:
+    """Speak text arriving over a WebSocket, one sentence as soon as it ends.
+
+    Client messages are JSON: {"type": "text", "text": "..."} adds a
+    fragment, {"type": "flush"} speaks the buffered rest right away and
+    {"type": "cancel"} drops buffered text and audio not yet sent. Audio goes
+    back as binary frames; JSON events announce each sentence ("sentence"),
+    the end of a flush with its latency ("flushed"), cancellations
+    ("cancelled") and errors ("error").
+
+    Complete sentences are queued and synthesized in order by one task, so
+    fragments keep being received while a sentence is synthesized. Every
+    message is sent by that task, so events stay in order with the audio.
+    """
+
+    def __init__(
+        self,
+        websocket,
+        kokoro,
+        sentence,
+        sample_rate,
+        min_pause,
+        max_pause,
+        stream_format,
+        output_rate=None,
+        cache=None,
+        admission=None,
+        client_id=None,
+    ):
+        self.websocket = websocket
+        self.kokoro = kokoro
+        # Language, voice and speed of every sentence of the session
+        self.sentence = sentence
+        self.sample_rate = sample_rate
+        self.min_pause = min_pause
+        self.max_pause = max_pause
+        self.stream_format = stream_format
+        self.output_rate = output_rate or sample_rate
+        self.cache = cache
+        self.admission = admission
+        self.client_id = client_id
+
+        self.buffer = SentenceBuffer(sentence["lang"])
+        self.queue = asyncio.Queue()
+        # Bumped on cancel, so queued and in-flight work of before is dropped
+        self.generation = 0
+        self.sentences = 0
+        self._resampler = None
+        self._spoken = False
+        self._reset_utterance()
+
+    def _reset_utterance(self):
+        """Start the next utterance without a pause or filter history"""
+        self._spoken = False
+        if self.output_rate != self.sample_rate:
+            self._resampler = Resampler(self.sample_rate, self.output_rate)
+
+    def _encode(self, samples):
+        if self._resampler is not None:
+            samples = self._resampler.process(samples)
+        return to_pcm16(samples)
+
+    def _put(self, kind, value=None):
+        self.queue.put_nowait((self.generation, kind, value))
+
+    async def run(self):
+        """Serve the session until the client disconnects"""
+        if self.stream_format == "wav":
+            await self.websocket.send_bytes(wav_stream_header(self.output_rate))
+
+        speaker = asyncio.create_task(self._speak())
+        try:
+            await self._receive()
+        finally:
+            speaker.cancel()
+            try:
+                await speaker
+            except (asyncio.CancelledError, WebSocketDisconnect, RuntimeError):
+                pass
+
+    async def _receive(self):
+        while True:
+            frame = await self.websocket.receive()
+            if frame["type"] == "websocket.disconnect":
+                return
+            if frame.get("text") is None:
+                self._put("error", "Messages must be JSON text frames")
+                continue
+            try:
+                message = json.loads(frame["text"])
+            except ValueError:
+                self._put("error", "Messages must be JSON")
+                continue
+
+            kind = message.get("type") if isinstance(message, dict) else None
+            if kind == "text":
+                for text in self.buffer.feed(str(message.get("text", ""))):
+                    self._put("sentence", text)
+            elif kind == "flush":
+                for text in self.buffer.flush():
+                    self._put("sentence", text)
+                # The flush time stands for the last token of the text
+                self._put("flush", time.perf_counter())
+            elif kind == "cancel":
+                self.buffer.clear()
+                self.generation += 1
+                while not self.queue.empty():
+                    self.queue.get_nowait()
+                self._put("cancel")
+            else:
+                self._put("error", f"Unknown message type: {kind}")
+
+    async def _speak(self):
+        while True:
+            generation, kind, value = await self.queue.get()
+            if generation != self.generation:
+                continue
+
+            if kind == "sentence":
+                await self._speak_sentence(generation, value)
+            elif kind == "flush":
+                await self._finish_utterance(value)
+            elif kind == "cancel":
+                self._reset_utterance()
+                await self.websocket.send_json({"type": "cancelled"})
+            else:
+                await self.websocket.send_json({"type": "error", "detail": value})
+
+    async def _speak_sentence(self, generation, text):
+        sentence = dict(self.sentence, text=text)
+        ticket = None
+        try:
+            if self.admission is not None:
+                ticket = await self.admission.acquire(
+                    self.client_id, estimate_cost([sentence])
+                )
+            samples, sample_rate = await run_in_threadpool(
+                generate_audio_for_sentence,
+                self.kokoro,
+                sentence,
+                self.sample_rate,
+                self.cache,
+            )
+        except AdmissionRejected as e:
+            await self.websocket.send_json(
+                {
+                    "type": "error",
+                    "status": e.status_code,
+                    "detail": str(e),
+                    "retry_after": e.retry_after,
+                    "text": text,
+                }
+            )
+            return
+        except Exception as e:
+            record_error(e)
+            await self.websocket.send_json(
+                {"type": "error", "detail": str(e), "text": text}
+            )
+            return
+        finally:
+            if ticket is not None:
+                self.admission.release(ticket)
+
+        # Cancelled while synthesizing
+        if generation != self.generation:
+            return
+
+        record_sentence(sentence, samples, sample_rate)
+        chunk = b""
+        if self._spoken:
+            chunk = self._encode(
+                generate_silence(sample_rate, self.min_pause, self.max_pause)
+            )
+        chunk += self._encode(samples)
+        self._spoken = True
+
+        await self.websocket.send_json(
+            {"type": "sentence", "index": self.sentences, "text": text}
+        )
+        await self.websocket.send_bytes(chunk)
+        self.sentences += 1
+
+    async def _finish_utterance(self, flushed_at):
+        """Send the resampler tail and report the latency of the flush"""
+        if self._resampler is not None:
+            tail = to_pcm16(self._resampler.flush())
+            if tail:
+                await self.websocket.send_bytes(tail)
+        self._reset_utterance()
+
+        latency = time.perf_counter() - flushed_at
+        live_flush_seconds.observe(latency)
+        await self.websocket.send_json(
+            {"type": "flushed", "sentences": self.sentences, "latency": latency}
+        )
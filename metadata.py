@@ -0,0 +1,171 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from config import ARTIFACT_DB
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS requests (
+    request_id TEXT PRIMARY KEY,
+    created_at REAL NOT NULL,
+    last_used REAL NOT NULL,
+    writing INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS files (
+    request_id TEXT NOT NULL,
+    file_name TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    PRIMARY KEY (request_id, file_name)
+);
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    data TEXT NOT NULL,
+    cancel_requested INTEGER NOT NULL DEFAULT 0,
+    updated_at REAL NOT NULL
+);
+"""
+
+
+class MetadataStore:
+    """Requests, their files and job states in SQLite, shared by every worker.
+
+    Each thread gets its own connection. WAL mode lets readers run while
+    another worker writes, so the database file must be on storage every
+    worker process can reach.
+    """
+
+    def __init__(self, path=ARTIFACT_DB):
+        self.path = path
+        self._local = threading.local()
+
+    def _connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(SCHEMA)
+            self._local.connection = connection
+        return connection
+
+    def _execute(self, query, parameters=()):
+        return self._connection().execute(query, parameters)
+
+    def add_request(self, request_id):
+        """Record a request whose files are being written"""
+        now = time.time()
+        self._execute(
+            "INSERT OR IGNORE INTO requests VALUES (?, ?, ?, 1)",
+            (request_id, now, now),
+        )
+        self._execute(
+            "UPDATE requests SET writing = 1, last_used = ? WHERE request_id = ?",
+            (now, request_id),
+        )
+
+    def has_request(self, request_id):
+        row = self._execute(
+            "SELECT 1 FROM requests WHERE request_id = ?", (request_id,)
+        ).fetchone()
+        return row is not None
+
+    def touch_request(self, request_id):
+        """Mark a request as recently used for LRU eviction"""
+        self._execute(
+            "UPDATE requests SET last_used = ? WHERE request_id = ?",
+            (time.time(), request_id),
+        )
+
+    def set_files(self, request_id, files):
+        """Replace the (file name, size, mtime_ns) list of a finished request"""
+        connection = self._connection()
+        with connection:
+            connection.execute("BEGIN IMMEDIATE")
+            connection.execute("DELETE FROM files WHERE request_id = ?", (request_id,))
+            connection.executemany(
+                "INSERT INTO files VALUES (?, ?, ?, ?)",
+                [(request_id, *file) for file in files],
+            )
+            connection.execute(
+                "UPDATE requests SET writing = 0, last_used = ? WHERE request_id = ?",
+                (time.time(), request_id),
+            )
+
+    def get_file(self, request_id, file_name):
+        """(size, mtime_ns) of a published file, or None"""
+        return self._execute(
+            "SELECT size, mtime_ns FROM files WHERE request_id = ? AND file_name = ?",
+            (request_id, file_name),
+        ).fetchone()
+
+    def list_files(self, request_id):
+        """File names of a published request"""
+        rows = self._execute(
+            "SELECT file_name FROM files WHERE request_id = ?", (request_id,)
+        )
+        return [row[0] for row in rows]
+
+    def remove_request(self, request_id):
+        connection = self._connection()
+        with connection:
+            connection.execute("BEGIN IMMEDIATE")
+            connection.execute("DELETE FROM files WHERE request_id = ?", (request_id,))
+            connection.execute(
+                "DELETE FROM requests WHERE request_id = ?", (request_id,)
+            )
+
+    def list_requests(self):
+        """(last used, request id, bytes, files, writing) by least recent use"""
+        return self._execute(
+            """
+            SELECT r.last_used, r.request_id, COALESCE(SUM(f.size), 0),
+                COUNT(f.file_name), r.writing
+            FROM requests r LEFT JOIN files f ON f.request_id = r.request_id
+            GROUP BY r.request_id
+            ORDER BY r.last_used
+            """
+        ).fetchall()
+
+    def save_job(self, job_id, data):
+        """Store the state of a job so any worker can report it"""
+        self._execute(
+            """
+            INSERT INTO jobs (job_id, data, updated_at) VALUES (?, ?, ?)
+            ON CONFLICT (job_id) DO UPDATE
+            SET data = excluded.data, updated_at = excluded.updated_at
+            """,
+            (job_id, json.dumps(data), time.time()),
+        )
+
+    def get_job(self, job_id):
+        """The last stored state of a job, or None"""
+        row = self._execute(
+            "SELECT data FROM jobs WHERE job_id = ?", (job_id,)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def request_job_cancel(self, job_id):
+        """Ask the worker running a job to cancel it"""
+        self._execute(
+            "UPDATE jobs SET cancel_requested = 1 WHERE job_id = ?", (job_id,)
+        )
+
+    def is_job_cancel_requested(self, job_id):
+        row = self._execute(
+            "SELECT cancel_requested FROM jobs WHERE job_id = ?", (job_id,)
+        ).fetchone()
+        return bool(row and row[0])
+
+    def remove_jobs_before(self, timestamp, statuses):
+        """Forget jobs in one of the statuses last updated before a time"""
+        placeholders = ", ".join("?" * len(statuses))
+        self._execute(
+            f"""
+            DELETE FROM jobs WHERE updated_at < ?
+            AND json_extract(data, '$.status') IN ({placeholders})
+            """,
+            (timestamp, *statuses),
+        )
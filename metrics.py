@@ -0,0 +1,210 @@
+import bisect
+import contextlib
+import contextvars
+import threading
+import time
+
+from config import METRICS_BUCKETS
+
+# Stage totals of the current render, only collected when a caller asks
+_timings = contextvars.ContextVar("timings", default=None)
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    escaped = (
+        (name, str(value).replace("\\", "\\\\").replace('"', '\\"'))
+        for name, value in labels
+    )
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(value)
+
+
+class Counter:
+    """Monotonic count, optionally split by labels"""
+
+    kind = "counter"
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        """Yield (name, labels, value) lines for the text exposition format"""
+        with self._lock:
+            values = sorted(self._values.items())
+        for key, value in values:
+            yield self.name, list(zip(self.labelnames, key)), value
+
+
+class Histogram:
+    """Distribution of observations in cumulative buckets"""
+
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), buckets=METRICS_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = sorted(buckets) + [float("inf")]
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            if key not in self._values:
+                self._values[key] = [[0] * len(self.buckets), 0.0]
+            entry = self._values[key]
+            entry[0][index] += 1
+            entry[1] += value
+
+    def samples(self):
+        """Yield (name, labels, value) lines for the text exposition format"""
+        with self._lock:
+            values = sorted(
+                (key, list(counts), total)
+                for key, (counts, total) in self._values.items()
+            )
+        for key, counts, total in values:
+            labels = list(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                yield f"{self.name}_bucket", labels + [
+                    ("le", _format_value(bound))
+                ], cumulative
+            yield f"{self.name}_sum", labels, total
+            yield f"{self.name}_count", labels, cumulative
+
+
+class MetricsRegistry:
+    """Named metrics rendered in the Prometheus text format"""
+
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def counter(self, name, help_text, labelnames=()):
+        metric = Counter(name, help_text, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help_text, labelnames=(), buckets=METRICS_BUCKETS):
+        metric = Histogram(name, help_text, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collect):
+        """Add a callable returning [(name, help, value)] gauges read at scrape time"""
+        self._collectors.append(collect)
+
+    def render(self):
+        """Render every metric in the Prometheus text exposition format"""
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.help_text}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+
+        for collect in self._collectors:
+            for name, help_text, value in collect():
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} gauge")
+                lines.append(f"{name} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+# Shared metrics used by the synthesis helpers, the API and the Streamlit app
+metrics_registry = MetricsRegistry()
+
+requests_total = metrics_registry.counter(
+    "audio_studio_requests_total", "HTTP requests handled", ["endpoint", "status"]
+)
+request_seconds = metrics_registry.histogram(
+    "audio_studio_request_seconds",
+    "Time until the response starts, by endpoint",
+    ["endpoint"],
+)
+stage_seconds = metrics_registry.histogram(
+    "audio_studio_stage_seconds", "Time spent in each render stage", ["stage"]
+)
+sentences_total = metrics_registry.counter(
+    "audio_studio_sentences_total", "Sentences synthesized or served from cache"
+)
+characters_total = metrics_registry.counter(
+    "audio_studio_characters_total", "Characters of sentence text processed"
+)
+audio_seconds_total = metrics_registry.counter(
+    "audio_studio_audio_seconds_total", "Seconds of sentence audio produced"
+)
+errors_total = metrics_registry.counter(
+    "audio_studio_errors_total", "Errors by exception type", ["type"]
+)
+admission_rejected_total = metrics_registry.counter(
+    "audio_studio_admission_rejected_total",
+    "Requests turned away by admission control, by status",
+    ["status"],
+)
+live_flush_seconds = metrics_registry.histogram(
+    "audio_studio_live_flush_seconds",
+    "Time from the end of live session text to its last audio frame",
+)
+
+
+def record_error(error):
+    """Count an error by its exception type"""
+    errors_total.inc(type=type(error).__name__)
+
+
+def record_sentence(sentence, samples, sample_rate):
+    """Count a sentence and the audio produced for it"""
+    sentences_total.inc()
+    characters_total.inc(len(sentence["text"]))
+    audio_seconds_total.inc(len(samples) / sample_rate)
+
+
+def observe_stage(stage, seconds):
+    """Record time spent in a render stage"""
+    stage_seconds.observe(seconds, stage=stage)
+    timings = _timings.get()
+    if timings is not None:
+        total, count = timings.get(stage, (0.0, 0))
+        timings[stage] = (total + seconds, count + 1)
+
+
+@contextlib.contextmanager
+def time_stage(stage):
+    """Time a block as one render stage"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(stage, time.perf_counter() - start)
+
+
+@contextlib.contextmanager
+def collect_timings():
+    """Collect {stage: (seconds, count)} of the renders run inside the block"""
+    timings = {}
+    token = _timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _timings.reset(token)
@@ -0,0 +1,141 @@
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from config import (
+    DEFAULT_ONNX_PROFILE,
+    DEFAULT_SAMPLE_RATE,
+    PARALLEL_ONNX_THREADS,
+    PARALLEL_WORKERS,
+)
+from profiles import get_profile, resolve_model_variant
+from utils import generate_audio_for_sentence, load_kokoro_model
+
+# Model loaded once in each worker process
+_worker_kokoro = None
+
+
+def _init_worker(model_file, voices_file, onnx_threads, profile):
+    """Load the worker's own Kokoro instance"""
+    global _worker_kokoro
+    _worker_kokoro = load_kokoro_model(model_file, voices_file, onnx_threads, profile)
+
+
+def _synthesize(sentence):
+    """Synthesize one sentence in a worker process"""
+    return generate_audio_for_sentence(_worker_kokoro, sentence, DEFAULT_SAMPLE_RATE)
+
+
+class SynthesisPool:
+    """Pool of worker processes, each holding a loaded Kokoro model"""
+
+    def __init__(
+        self,
+        model_file,
+        voices_file,
+        workers=PARALLEL_WORKERS,
+        onnx_threads=PARALLEL_ONNX_THREADS,
+        profile=DEFAULT_ONNX_PROFILE,
+    ):
+        self.model_file = model_file
+        self.voices_file = voices_file
+        self.workers = workers
+        self.onnx_threads = onnx_threads
+        # Workers load the model variant of the profile, like the registry
+        self.profile = profile
+        self._lock = threading.Lock()
+        self._executor = self._start_executor()
+
+    def _start_executor(self):
+        # Spawn so workers don't inherit the parent's ONNX runtime threads
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(
+                self.model_file,
+                self.voices_file,
+                self.onnx_threads,
+                self.profile,
+            ),
+        )
+
+    def _restart(self, broken):
+        """Replace an executor whose worker died, once however many noticed"""
+        with self._lock:
+            if self._executor is broken:
+                broken.shutdown(wait=False, cancel_futures=True)
+                self._executor = self._start_executor()
+            return self._executor
+
+    def map(self, sentences):
+        """Synthesize sentences in parallel, yielding results in input order.
+
+        Work is submitted right away. When a worker dies, e.g. failing to
+        load its model or crashing mid-request, new workers are started and
+        the sentences not yielded yet are submitted again, once per call.
+        """
+        sentences = list(sentences)
+        with self._lock:
+            executor = self._executor
+        try:
+            results = executor.map(_synthesize, sentences)
+        except BrokenProcessPool:
+            executor = self._restart(executor)
+            results = executor.map(_synthesize, sentences)
+        return self._collect(sentences, executor, results)
+
+    def _collect(self, sentences, executor, results):
+        done = 0
+        retried = False
+        while True:
+            try:
+                for result in results:
+                    done += 1
+                    yield result
+                return
+            except BrokenProcessPool:
+                if retried:
+                    raise
+                retried = True
+                executor = self._restart(executor)
+                results = executor.map(_synthesize, sentences[done:])
+
+    def close(self):
+        """Stop the worker processes"""
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_synthesis_pool(
+    model_file,
+    voices_file,
+    workers=PARALLEL_WORKERS,
+    onnx_threads=PARALLEL_ONNX_THREADS,
+    profile=DEFAULT_ONNX_PROFILE,
+):
+    """Get the shared pool for a model and profile, starting it on first use"""
+    # The resolved variant is part of the key, so a quantized file added
+    # next to the model starts a new pool, as it loads a new registry model
+    variant_file = resolve_model_variant(
+        model_file, get_profile(profile).get("variant")
+    )
+    key = (model_file, voices_file, variant_file, profile, workers, onnx_threads)
+    with _pools_lock:
+        if key not in _pools:
+            _pools[key] = SynthesisPool(
+                model_file, voices_file, workers, onnx_threads, profile
+            )
+        return _pools[key]
+
+
+def close_synthesis_pools():
+    """Stop every shared pool"""
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.close()
+        _pools.clear()
@@ -0,0 +1,173 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+from config import (
+    PHONEME_CACHE_DIR,
+    PHONEME_CACHE_DISK_MAX_ENTRIES,
+    PHONEME_CACHE_MAX_ENTRIES,
+)
+from metrics import time_stage
+
+
+def make_phoneme_key(text, lang):
+    """Build the hash of a text phonemized for a language"""
+    payload = json.dumps([text, lang], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class PhonemeCache:
+    """Phonemes by (text, lang): memory LRU, optionally backed by a disk store"""
+
+    def __init__(
+        self,
+        cache_dir=PHONEME_CACHE_DIR,
+        max_entries=PHONEME_CACHE_MAX_ENTRIES,
+        disk_max_entries=PHONEME_CACHE_DISK_MAX_ENTRIES,
+    ):
+        # No directory keeps the cache in memory only
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self.disk_max_entries = disk_max_entries
+
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()
+        self._disk_entries = None
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.txt")
+
+    def _remember(self, key, phonemes):
+        self._memory[key] = phonemes
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _read(self, key):
+        if not self.cache_dir:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, encoding="utf-8") as f:
+                phonemes = f.read()
+            os.utime(path)
+        except OSError:
+            return None
+        return phonemes
+
+    def _write(self, key, phonemes):
+        """Store phonemes on disk, evicting the oldest entries past the limit"""
+        if not self.cache_dir:
+            return
+        path = self._path(key)
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(temp_path, "w", encoding="utf-8") as f:
+                f.write(phonemes)
+            os.replace(temp_path, path)
+        except OSError:
+            # The disk tier is best effort, the memory tier still works
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            return
+
+        with self._lock:
+            if self._disk_entries is None:
+                self._disk_entries = self._count_disk_entries()
+            else:
+                self._disk_entries += 1
+            if self._disk_entries > self.disk_max_entries:
+                self._evict_disk()
+
+    def _count_disk_entries(self):
+        return sum(
+            1 for entry in os.scandir(self.cache_dir) if entry.name.endswith(".txt")
+        )
+
+    def _evict_disk(self):
+        entries = sorted(
+            (entry.stat().st_mtime, entry.path)
+            for entry in os.scandir(self.cache_dir)
+            if entry.name.endswith(".txt")
+        )
+        # Evict a little below the limit so we don't rescan on every write
+        excess = len(entries) - int(self.disk_max_entries * 0.9)
+        for _, path in entries[: max(excess, 0)]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        self._disk_entries = self._count_disk_entries()
+
+    def get(self, text, lang, phonemize):
+        """Get the phonemes of a text, calling phonemize(text, lang) on a miss"""
+        key = make_phoneme_key(text, lang)
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return self._memory[key]
+
+        phonemes = self._read(key)
+        if phonemes is not None:
+            with self._lock:
+                self.disk_hits += 1
+                self._remember(key, phonemes)
+            return phonemes
+
+        with time_stage("phonemize"):
+            phonemes = phonemize(text, lang)
+        self._write(key, phonemes)
+        with self._lock:
+            self.misses += 1
+            self._remember(key, phonemes)
+        return phonemes
+
+    def stats(self):
+        """Report hit/miss counts and the number of entries in memory"""
+        with self._lock:
+            hits = self.memory_hits + self.disk_hits
+            lookups = hits + self.misses
+            return {
+                "hits": hits,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": hits / lookups if lookups else 0.0,
+                "memory_entries": len(self._memory),
+            }
+
+    def clear(self):
+        """Drop every entry from memory and disk"""
+        with self._lock:
+            self._memory.clear()
+            if self.cache_dir and os.path.isdir(self.cache_dir):
+                for entry in os.scandir(self.cache_dir):
+                    if entry.name.endswith(".txt"):
+                        os.remove(entry.path)
+            self._disk_entries = 0
+
+
+# Shared cache used by the API and the Streamlit app
+phoneme_cache = PhonemeCache()
+
+
+def get_sentence_phonemes(kokoro, sentence, cache=phoneme_cache):
+    """Get the phonemes of a sentence, or None when the model phonemizes itself.
+
+    Phonemes sent with the sentence are used as is, skipping G2P.
+    """
+    if sentence.get("phonemes"):
+        return sentence["phonemes"]
+
+    tokenizer = getattr(kokoro, "tokenizer", None)
+    if tokenizer is None:
+        return None
+    return cache.get(sentence["text"], sentence["lang"], tokenizer.phonemize)
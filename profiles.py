@@ -0,0 +1,109 @@
+import hashlib
+import os
+
+from cache import file_fingerprint
+from config import ONNX_PROFILES, OPTIMIZED_MODELS_DIR
+
+# ONNX Runtime enum members by profile value; onnxruntime is only imported
+# when a session is created, so importing this module stays cheap
+EXECUTION_MODES = {
+    "sequential": "ORT_SEQUENTIAL",
+    "parallel": "ORT_PARALLEL",
+}
+
+GRAPH_OPTIMIZATION_LEVELS = {
+    "disable": "ORT_DISABLE_ALL",
+    "basic": "ORT_ENABLE_BASIC",
+    "extended": "ORT_ENABLE_EXTENDED",
+    "all": "ORT_ENABLE_ALL",
+}
+
+
+def get_profile(name):
+    """Get an execution profile by name"""
+    if name not in ONNX_PROFILES:
+        raise KeyError(f"Unknown ONNX profile: {name}")
+    return ONNX_PROFILES[name]
+
+
+def resolve_model_variant(model_file, variant):
+    """Find the quantized or half precision file next to a model, if present"""
+    if not variant:
+        return model_file
+
+    # kokoro-v1.0.onnx -> kokoro-v1.0.int8.onnx / kokoro-v1.0.fp16.onnx
+    base, extension = os.path.splitext(model_file)
+    variant_file = f"{base}.{variant}{extension}"
+    if os.path.exists(variant_file):
+        return variant_file
+    return model_file
+
+
+def get_providers(profile):
+    """Execution providers of a profile, CPU only by default"""
+    return profile.get("providers", ["CPUExecutionProvider"])
+
+
+def get_optimized_model_path(model_file, profile):
+    """Path of the serialized optimized graph for a model and profile.
+
+    Optimizations depend on the execution providers (a CUDA graph may fuse
+    nodes the CPU one can't run), so they are part of the key.
+    """
+    payload = repr(
+        (
+            file_fingerprint(model_file),
+            profile.get("graph_optimization", "all"),
+            get_providers(profile),
+        )
+    )
+    digest = hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+    name = os.path.splitext(os.path.basename(model_file))[0]
+    return os.path.join(OPTIMIZED_MODELS_DIR, f"{name}.{digest}.optimized.onnx")
+
+
+def create_session_options(profile, num_threads=None):
+    """Build session options from a profile"""
+    import onnxruntime as rt
+
+    options = rt.SessionOptions()
+
+    intra_op_threads = num_threads or profile.get("intra_op_threads")
+    if intra_op_threads:
+        options.intra_op_num_threads = intra_op_threads
+    if profile.get("inter_op_threads"):
+        options.inter_op_num_threads = profile["inter_op_threads"]
+    if profile.get("execution_mode"):
+        options.execution_mode = getattr(
+            rt.ExecutionMode, EXECUTION_MODES[profile["execution_mode"]]
+        )
+    options.graph_optimization_level = getattr(
+        rt.GraphOptimizationLevel,
+        GRAPH_OPTIMIZATION_LEVELS[profile.get("graph_optimization", "all")],
+    )
+    return options
+
+
+def create_session(model_file, profile, num_threads=None):
+    """Create an inference session configured by a profile"""
+    import onnxruntime as rt
+
+    options = create_session_options(profile, num_threads)
+    providers = get_providers(profile)
+
+    if not profile.get("save_optimized"):
+        return rt.InferenceSession(model_file, options, providers=providers)
+
+    # Later startups load the already optimized graph and skip optimization
+    optimized_path = get_optimized_model_path(model_file, profile)
+    if os.path.exists(optimized_path):
+        options.graph_optimization_level = rt.GraphOptimizationLevel.ORT_DISABLE_ALL
+        return rt.InferenceSession(optimized_path, options, providers=providers)
+
+    os.makedirs(OPTIMIZED_MODELS_DIR, exist_ok=True)
+    temp_path = f"{optimized_path}.{os.getpid()}.tmp.onnx"
+    options.optimized_model_filepath = temp_path
+    session = rt.InferenceSession(model_file, options, providers=providers)
+    if os.path.exists(temp_path):
+        os.replace(temp_path, optimized_path)
+    return session
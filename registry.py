@@ -0,0 +1,175 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from cache import file_fingerprint
+from config import (
+    DEFAULT_ONNX_PROFILE,
+    MODEL_REGISTRY_MAX_LOADED,
+    MODELS,
+    WARMUP_TEXT,
+)
+from utils import load_kokoro_model
+from voices import voice_blend_cache
+
+
+def warm_up_model(kokoro):
+    """Run a short inference so graph initialization happens before real requests"""
+    voices = kokoro.get_voices()
+    if voices:
+        kokoro.create(WARMUP_TEXT, voice=voices[0], speed=1.0, lang="en-us")
+
+
+class LoadedModel:
+    """A resident Kokoro instance and what it was loaded from"""
+
+    def __init__(self, kokoro, model_file, voices_file, profile, load_time):
+        self.kokoro = kokoro
+        self.model_file = model_file
+        self.voices_file = voices_file
+        self.profile = profile
+        self.load_time = load_time
+        self.fingerprint = (file_fingerprint(model_file), file_fingerprint(voices_file))
+
+    def is_stale(self):
+        """Check whether the files changed on disk since loading"""
+        return self.fingerprint != (
+            file_fingerprint(self.model_file),
+            file_fingerprint(self.voices_file),
+        )
+
+
+class ModelRegistry:
+    """Lazily loaded, warmed-up models keyed by (model file, voices file, profile)"""
+
+    def __init__(
+        self, models=MODELS, max_loaded=MODEL_REGISTRY_MAX_LOADED, loader=None
+    ):
+        self.max_loaded = max_loaded
+        # Builds a Kokoro instance from (model file, voices file, profile)
+        self.loader = loader or load_kokoro_model
+        self._names = dict(models)
+        self._loaded = OrderedDict()
+        self._lock = threading.Lock()
+        # Key -> [load lock, threads holding or waiting for it]
+        self._loading = {}
+
+    def _key(self, model_file, voices_file, profile):
+        return (os.path.abspath(model_file), os.path.abspath(voices_file), profile)
+
+    @contextmanager
+    def _load_lock(self, key):
+        """Hold the lock of one model, so concurrent first requests load it once.
+
+        The lock is dropped once no thread holds or waits for it, so keys of
+        models that were loaded and evicted don't pile up.
+        """
+        with self._lock:
+            entry = self._loading.setdefault(key, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._lock:
+                entry[1] -= 1
+                if not entry[1]:
+                    del self._loading[key]
+
+    def _load(self, model_file, voices_file, profile, progress=None):
+        # progress(stage) is told which loading stage is starting
+        progress = progress or (lambda stage: None)
+        start = time.perf_counter()
+        progress("loading_model")
+        kokoro = self.loader(model_file, voices_file, profile=profile)
+        progress("warming_up")
+        warm_up_model(kokoro)
+        progress("preloading_voice_blends")
+        voice_blend_cache.preload(kokoro)
+        return LoadedModel(
+            kokoro, model_file, voices_file, profile, time.perf_counter() - start
+        )
+
+    def _store(self, key, loaded):
+        """Keep a model resident, evicting the least recently used ones"""
+        with self._lock:
+            self._loaded[key] = loaded
+            self._loaded.move_to_end(key)
+            while len(self._loaded) > self.max_loaded:
+                self._loaded.popitem(last=False)
+
+    def get(self, model_file, voices_file, profile=DEFAULT_ONNX_PROFILE, progress=None):
+        """Get a loaded model, loading it on first use or when its files changed"""
+        key = self._key(model_file, voices_file, profile)
+
+        with self._lock:
+            loaded = self._loaded.get(key)
+            if loaded is not None:
+                self._loaded.move_to_end(key)
+
+        if loaded is not None and not loaded.is_stale():
+            return loaded.kokoro
+
+        with self._load_lock(key):
+            with self._lock:
+                current = self._loaded.get(key)
+            if current is not None and current is not loaded and not current.is_stale():
+                return current.kokoro
+
+            # The old instance keeps serving until the new one is warmed up
+            loaded = self._load(model_file, voices_file, profile, progress)
+            self._store(key, loaded)
+            return loaded.kokoro
+
+    def reload(self, model_file, voices_file, profile=DEFAULT_ONNX_PROFILE):
+        """Load a fresh instance and swap it in without downtime"""
+        key = self._key(model_file, voices_file, profile)
+        with self._load_lock(key):
+            loaded = self._load(model_file, voices_file, profile)
+            self._store(key, loaded)
+        return loaded.kokoro
+
+    def get_files(self, name):
+        """Get the (model file, voices file) registered under a name"""
+        with self._lock:
+            if name not in self._names:
+                raise KeyError(f"Unknown model: {name}")
+            return self._names[name]
+
+    def get_named(self, name, profile=DEFAULT_ONNX_PROFILE, progress=None):
+        """Get the loaded model registered under a name"""
+        return self.get(*self.get_files(name), profile, progress)
+
+    def register(
+        self, name, model_file, voices_file, load=True, profile=DEFAULT_ONNX_PROFILE
+    ):
+        """Point a name at model files, warming them up before switching"""
+        kokoro = self.get(model_file, voices_file, profile) if load else None
+        with self._lock:
+            self._names[name] = (model_file, voices_file)
+        return kokoro
+
+    def list_models(self):
+        """Describe the registered names and the resident models"""
+        with self._lock:
+            loaded = list(self._loaded.values())
+            return [
+                {
+                    "name": name,
+                    "model_file": model_file,
+                    "voices_file": voices_file,
+                    "loaded": [
+                        {"profile": model.profile, "load_time": model.load_time}
+                        for model in loaded
+                        if (model.model_file, model.voices_file)
+                        == (model_file, voices_file)
+                    ],
+                }
+                for name, (model_file, voices_file) in self._names.items()
+            ]
+
+
+# Shared registry used by the API and the Streamlit app
+model_registry = ModelRegistry()
@@ -0,0 +1,116 @@
+from math import gcd
+
+import numpy as np
+
+from config import RESAMPLE_ZERO_CROSSINGS
+
+# Outputs computed per vectorized step, bounding the gathered matrix
+RESAMPLE_BLOCK = 16384
+
+# Kaiser window shape of the low-pass filter (about 80 dB stopband)
+KAISER_BETA = 8.0
+
+# Passband edge as a fraction of the lower Nyquist frequency
+ROLLOFF = 0.94
+
+
+def design_polyphase_filter(up, down, zero_crossings=RESAMPLE_ZERO_CROSSINGS):
+    """Windowed-sinc low-pass filter split into `up` phases of equal length"""
+    factor = max(up, down)
+    cutoff = ROLLOFF / (2 * factor)
+    length = 2 * zero_crossings * factor + 1
+
+    n = np.arange(length) - (length - 1) / 2
+    taps = 2 * cutoff * np.sinc(2 * cutoff * n) * np.kaiser(length, KAISER_BETA)
+    # Each phase passes DC with unit gain after zero-stuffing by `up`
+    taps *= up / taps.sum()
+
+    # Pad to a multiple of `up` so phase p holds taps p, p + up, p + 2 up, ...
+    phase_length = -(-length // up)
+    padded = np.zeros(phase_length * up)
+    padded[:length] = taps
+    return padded.reshape(phase_length, up).T.astype(np.float32), (length - 1) // 2
+
+
+class Resampler:
+    """Streaming rational resampler: polyphase FIR applied block by block.
+
+    Input may arrive in pieces of any size; the filter history is carried
+    between calls so the output is the same as resampling everything at
+    once, and flush() emits the remaining samples.
+    """
+
+    def __init__(self, input_rate, output_rate):
+        self.input_rate = input_rate
+        self.output_rate = output_rate
+        divisor = gcd(input_rate, output_rate)
+        self.up = output_rate // divisor
+        self.down = input_rate // divisor
+        self.phases, self.delay = design_polyphase_filter(self.up, self.down)
+        self.taps_per_phase = self.phases.shape[1]
+
+        # Zeros stand in for the samples before the start
+        self._buffer = np.zeros(self.taps_per_phase, dtype=np.float32)
+        self._buffer_start = -self.taps_per_phase
+        self._input_frames = 0
+        self._output_frames = 0
+
+    def _emit(self, available):
+        """Compute every output whose input samples are all buffered"""
+        # Output n is taken at position n * down + delay of the upsampled
+        # signal, so the filter delay is compensated
+        end = max(-(-(available * self.up - self.delay) // self.down), 0)
+        end = max(end, self._output_frames)
+        outputs = []
+        offsets = np.arange(self.taps_per_phase)
+        for start in range(self._output_frames, end, RESAMPLE_BLOCK):
+            n = np.arange(start, min(start + RESAMPLE_BLOCK, end))
+            position = n * self.down + self.delay
+            newest, phase = np.divmod(position, self.up)
+            indexes = newest[:, None] - offsets[None, :] - self._buffer_start
+            outputs.append(
+                np.einsum("nk,nk->n", self._buffer[indexes], self.phases[phase])
+            )
+
+        if outputs:
+            self._output_frames = end
+            # Keep only the history the next output still needs
+            newest = (end * self.down + self.delay) // self.up
+            keep_from = newest - self.taps_per_phase + 1 - self._buffer_start
+            if keep_from > 0:
+                self._buffer = self._buffer[keep_from:]
+                self._buffer_start += keep_from
+            return np.concatenate(outputs).astype(np.float32)
+        return np.zeros(0, dtype=np.float32)
+
+    def process(self, samples):
+        """Resample a piece of input, returning the outputs it completes"""
+        samples = np.asarray(samples, dtype=np.float32)
+        self._buffer = np.concatenate([self._buffer, samples])
+        self._input_frames += len(samples)
+        return self._emit(self._input_frames)
+
+    def flush(self):
+        """Emit the last outputs, treating the input after the end as silence"""
+        total = -(-self._input_frames * self.up // self.down)
+        padding = self.taps_per_phase + self.delay // self.up + 1
+        self._buffer = np.concatenate(
+            [self._buffer, np.zeros(padding, dtype=np.float32)]
+        )
+        emitted = self._output_frames
+        samples = self._emit(self._input_frames + padding)
+        # Padding only completes the tail, it doesn't add outputs
+        self._output_frames = total
+        return samples[: max(total - emitted, 0)]
+
+    def output_frames(self, input_frames):
+        """Frames the given number of input frames resample to"""
+        return -(-input_frames * self.up // self.down)
+
+
+def resample(samples, input_rate, output_rate):
+    """Resample a whole signal"""
+    if input_rate == output_rate:
+        return np.asarray(samples, dtype=np.float32)
+    resampler = Resampler(input_rate, output_rate)
+    return np.concatenate([resampler.process(samples), resampler.flush()])
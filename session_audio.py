@@ -0,0 +1,107 @@
+import itertools
+import threading
+import weakref
+from collections import OrderedDict
+
+from config import SESSION_AUDIO_MAX_BYTES, SESSION_AUDIO_TOTAL_MAX_BYTES
+
+# All stores share one lock and one clock, so the total budget can evict
+# the least recently used audio of any session
+_lock = threading.Lock()
+_clock = itertools.count()
+_stores = weakref.WeakSet()
+
+
+def read_file(path):
+    """Read a whole file"""
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def _enforce_total(max_bytes):
+    """Evict the least recently used entries of all sessions over the budget"""
+    stores = [store for store in _stores if store._entries]
+    total = sum(store.size for store in stores)
+    while total > max_bytes and stores:
+        # Entries are ordered by last use, so a store's first one is its oldest
+        oldest = min(
+            stores, key=lambda store: next(iter(store._entries.values()))[0]
+        )
+        total -= oldest._evict_oldest()
+        if not oldest._entries:
+            stores.remove(oldest)
+
+
+class SessionAudioStore:
+    """Encoded audio of one Streamlit session, kept in memory.
+
+    Entries are evicted least recently used first when the session holds
+    more than max_bytes, or all sessions together more than total_max_bytes.
+    The store lives in the session state, so it is released with the session.
+    """
+
+    def __init__(
+        self,
+        max_bytes=SESSION_AUDIO_MAX_BYTES,
+        total_max_bytes=SESSION_AUDIO_TOTAL_MAX_BYTES,
+    ):
+        self.max_bytes = max_bytes
+        self.total_max_bytes = total_max_bytes
+        # Key -> (last use, encoded bytes), least recently used first
+        self._entries = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        with _lock:
+            _stores.add(self)
+
+    def _evict_oldest(self):
+        _, (_, data) = self._entries.popitem(last=False)
+        self.size -= len(data)
+        return len(data)
+
+    def get(self, key, load):
+        """Get the bytes stored under a key, calling load() on a miss.
+
+        Audio larger than the session limit is returned without being kept.
+        """
+        with _lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries[key] = (next(_clock), entry[1])
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+
+        data = load()
+        with _lock:
+            self.misses += 1
+            if data is None or len(data) > self.max_bytes:
+                return data
+
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.size -= len(previous[1])
+            self._entries[key] = (next(_clock), data)
+            self.size += len(data)
+            while self.size > self.max_bytes:
+                self._evict_oldest()
+            _enforce_total(self.total_max_bytes)
+        return data
+
+    def clear(self):
+        """Drop every entry, e.g. when the audio they came from is replaced"""
+        with _lock:
+            self._entries.clear()
+            self.size = 0
+
+    def stats(self):
+        """Report hit/miss counts and what the session holds"""
+        with _lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self._entries),
+                "bytes": self.size,
+                "max_bytes": self.max_bytes,
+            }
@@ -0,0 +1,184 @@
+import os
+import shutil
+import uuid
+
+from config import (
+    ARTIFACT_BACKEND,
+    ARTIFACT_S3_BUCKET,
+    ARTIFACT_S3_ENDPOINT,
+    ARTIFACT_S3_LOCAL_DIR,
+    ARTIFACT_S3_PREFIX,
+    ARTIFACT_SHARED_DIR,
+)
+
+
+def copy_atomic(source, target):
+    """Copy a file under a temporary name and rename it into place"""
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    temp_path = os.path.join(os.path.dirname(target), f".{uuid.uuid4().hex}.tmp")
+    try:
+        shutil.copyfile(source, temp_path)
+        os.replace(temp_path, target)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+class LocalBackend:
+    """Outputs stay in the local artifacts directory only"""
+
+    name = "local"
+
+    def publish(self, request_id, file_name, path):
+        pass
+
+    def fetch(self, request_id, file_name, path):
+        """Copy a published file to path; False when it doesn't exist"""
+        return False
+
+    def delete(self, request_id):
+        pass
+
+
+class SharedDirectoryBackend:
+    """Outputs copied to a directory every node mounts (NFS, EFS, SMB...)"""
+
+    name = "shared"
+
+    def __init__(self, root=ARTIFACT_SHARED_DIR):
+        self.root = root
+
+    def publish(self, request_id, file_name, path):
+        copy_atomic(path, os.path.join(self.root, request_id, file_name))
+
+    def fetch(self, request_id, file_name, path):
+        try:
+            copy_atomic(os.path.join(self.root, request_id, file_name), path)
+        except FileNotFoundError:
+            return False
+        return True
+
+    def delete(self, request_id):
+        shutil.rmtree(os.path.join(self.root, request_id), ignore_errors=True)
+
+
+class DirectoryS3Client:
+    """Stand-in for the parts of the boto3 S3 client the S3 backend uses.
+
+    Objects are files under root/bucket/key, so the S3 backend can run
+    without a server.
+    """
+
+    def __init__(self, root=ARTIFACT_S3_LOCAL_DIR):
+        self.root = root
+
+    def _path(self, bucket, key):
+        return os.path.join(self.root, bucket, *key.split("/"))
+
+    def upload_file(self, Filename, Bucket, Key):
+        copy_atomic(Filename, self._path(Bucket, Key))
+
+    def download_file(self, Bucket, Key, Filename):
+        shutil.copyfile(self._path(Bucket, Key), Filename)
+
+    def list_objects_v2(self, Bucket, Prefix, **kwargs):
+        bucket_dir = os.path.join(self.root, Bucket)
+        keys = []
+        for directory, _, files in os.walk(bucket_dir):
+            for file_name in files:
+                path = os.path.relpath(os.path.join(directory, file_name), bucket_dir)
+                key = path.replace(os.sep, "/")
+                if key.startswith(Prefix):
+                    keys.append(key)
+        return {
+            "Contents": [{"Key": key} for key in sorted(keys)],
+            "IsTruncated": False,
+        }
+
+    def delete_objects(self, Bucket, Delete):
+        for item in Delete["Objects"]:
+            path = self._path(Bucket, item["Key"])
+            if os.path.exists(path):
+                os.remove(path)
+        return {}
+
+
+def is_missing_object(error):
+    """Whether an S3 client error means the object doesn't exist"""
+    if isinstance(error, FileNotFoundError):
+        return True
+    code = getattr(error, "response", {}).get("Error", {}).get("Code")
+    return code in ("404", "NoSuchKey")
+
+
+class S3Backend:
+    """Outputs uploaded to an S3-compatible bucket under a key prefix"""
+
+    name = "s3"
+
+    def __init__(self, client, bucket=ARTIFACT_S3_BUCKET, prefix=ARTIFACT_S3_PREFIX):
+        self.client = client
+        self.bucket = bucket
+        self.prefix = prefix.strip("/")
+
+    def _key(self, request_id, file_name=""):
+        return "/".join(filter(None, [self.prefix, request_id, file_name]))
+
+    def publish(self, request_id, file_name, path):
+        self.client.upload_file(path, self.bucket, self._key(request_id, file_name))
+
+    def fetch(self, request_id, file_name, path):
+        # Download under a temp name so readers never see a partial file
+        temp_path = os.path.join(os.path.dirname(path), f".{uuid.uuid4().hex}.tmp")
+        try:
+            self.client.download_file(
+                self.bucket, self._key(request_id, file_name), temp_path
+            )
+            os.replace(temp_path, path)
+        except Exception as e:
+            if is_missing_object(e):
+                return False
+            raise
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        return True
+
+    def delete(self, request_id):
+        prefix = self._key(request_id) + "/"
+        options = {}
+        while True:
+            response = self.client.list_objects_v2(
+                Bucket=self.bucket, Prefix=prefix, **options
+            )
+            objects = [{"Key": item["Key"]} for item in response.get("Contents", [])]
+            if objects:
+                self.client.delete_objects(
+                    Bucket=self.bucket, Delete={"Objects": objects}
+                )
+            if not response.get("IsTruncated"):
+                break
+            options["ContinuationToken"] = response["NextContinuationToken"]
+
+
+def create_s3_client(endpoint=ARTIFACT_S3_ENDPOINT):
+    """boto3 S3 client for the endpoint, or the local stand-in"""
+    if endpoint == "local":
+        return DirectoryS3Client()
+
+    try:
+        import boto3
+    except ImportError:
+        raise RuntimeError("The s3 artifact backend requires boto3")
+    return boto3.client("s3", endpoint_url=endpoint or None)
+
+
+def create_backend(name=ARTIFACT_BACKEND):
+    """Build the artifact backend selected in the configuration"""
+    if name == "local":
+        return LocalBackend()
+    if name == "shared":
+        return SharedDirectoryBackend()
+    if name == "s3":
+        return S3Backend(create_s3_client())
+    raise ValueError(f"Unknown artifact backend: {name}")
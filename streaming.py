@@ -0,0 +1,135 @@
+import numpy as np
+
+from audio_index import WAV_UNKNOWN_SIZE, wav_header
+from resample import Resampler
+from utils import generate_audio_for_sentences, generate_silence
+
+STREAM_MEDIA_TYPES = {
+    "wav": "audio/wav",
+    "pcm": "audio/L16",
+    "ogg": "audio/ogg",
+}
+
+
+def wav_stream_header(sample_rate, channels=1, bits_per_sample=16):
+    """Build a PCM WAV header with unknown length for streaming"""
+    return wav_header(sample_rate, WAV_UNKNOWN_SIZE, channels, bits_per_sample)
+
+
+def to_pcm16(samples):
+    """Convert float samples to little-endian 16-bit PCM bytes"""
+    samples = np.clip(samples, -1.0, 1.0)
+    return (samples * 32767).astype("<i2").tobytes()
+
+
+class _ChunkSink:
+    """Write-only file object that hands out encoded bytes as they are produced"""
+
+    def __init__(self):
+        self.position = 0
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def seek(self, offset, whence=0):
+        target = {0: offset, 1: self.position + offset, 2: self.position + offset}
+        # Bytes already sent can't be rewritten, so only no-op seeks are allowed
+        if target[whence] != self.position:
+            raise OSError("Stream sink is not seekable")
+        return self.position
+
+    def read(self, size=-1):
+        return b""
+
+    def drain(self):
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+class OggStreamEncoder:
+    """Incremental Ogg/Opus encoder producing bytes as audio is appended"""
+
+    def __init__(self, sample_rate):
+        # Imported here so that importing this module doesn't load libsndfile
+        import soundfile as sf
+
+        self._sink = _ChunkSink()
+        self._file = sf.SoundFile(
+            self._sink,
+            mode="w",
+            samplerate=sample_rate,
+            channels=1,
+            format="OGG",
+            subtype="OPUS",
+        )
+
+    def encode(self, samples):
+        """Encode samples and return the bytes ready to send"""
+        self._file.write(samples)
+        return self._sink.drain()
+
+    def close(self):
+        """Flush the encoder and return the remaining bytes"""
+        self._file.close()
+        return self._sink.drain()
+
+
+def iter_audio_stream(
+    kokoro,
+    sentences,
+    sample_rate,
+    min_pause,
+    max_pause,
+    stream_format,
+    cache=None,
+    output_rate=None,
+):
+    """Yield encoded audio sentence by sentence with silence between them"""
+    if stream_format not in STREAM_MEDIA_TYPES:
+        raise ValueError(f"Unsupported stream format: {stream_format}")
+
+    output_rate = output_rate or sample_rate
+    resampler = None
+    if output_rate != sample_rate:
+        resampler = Resampler(sample_rate, output_rate)
+
+    encoder = None
+    if stream_format == "wav":
+        yield wav_stream_header(output_rate)
+    elif stream_format == "ogg":
+        encoder = OggStreamEncoder(output_rate)
+
+    def encode(samples):
+        if resampler:
+            samples = resampler.process(samples)
+        if encoder:
+            return encoder.encode(samples)
+        return to_pcm16(samples)
+
+    for idx, (samples, sample_rate) in enumerate(
+        generate_audio_for_sentences(kokoro, sentences, sample_rate, cache)
+    ):
+        chunk = encode(samples)
+
+        # Add silence between sentences (except for last sentence)
+        if idx < len(sentences) - 1:
+            chunk += encode(generate_silence(sample_rate, min_pause, max_pause))
+
+        if chunk:
+            yield chunk
+
+    if resampler:
+        samples = resampler.flush()
+        chunk = encoder.encode(samples) if encoder else to_pcm16(samples)
+        if chunk:
+            yield chunk
+
+    if encoder:
+        yield encoder.close()
@@ -0,0 +1,60 @@
+import numpy as np
+
+# Frames span a few pitch periods and overlap by half; the search for the
+# best-matching frame covers at least one period of the lowest voices
+FRAME_SECONDS = 0.03
+TOLERANCE_SECONDS = 0.012
+
+
+def time_stretch(samples, rate, sample_rate):
+    """Change the tempo of audio by `rate` keeping its pitch, using WSOLA.
+
+    rate > 1 plays faster and shortens the audio to len(samples) / rate.
+    Each output frame is the input frame near its nominal position that best
+    continues the previous one, found with one cross-correlation per frame.
+    """
+    samples = np.asarray(samples, dtype=np.float32)
+    length = int(round(len(samples) / rate))
+    if rate == 1 or not len(samples):
+        return samples.copy()
+
+    hop = max(int(sample_rate * FRAME_SECONDS) // 2, 1)
+    frame = 2 * hop
+    tolerance = int(sample_rate * TOLERANCE_SECONDS)
+    if len(samples) < frame:
+        # Too short to hold a frame: stretching it is just interpolation
+        positions = np.linspace(0, len(samples) - 1, max(length, 1))
+        return np.interp(positions, np.arange(len(samples)), samples).astype(
+            np.float32
+        )
+
+    # Periodic Hann windows at half overlap sum to one
+    window = np.hanning(frame + 1)[:frame].astype(np.float32)
+    hop_in = hop * rate
+
+    # Frame k is read near input position (k - 1) * hop_in and written at
+    # output position k * hop; frame 0 only fades in the start and the
+    # first hop of the output is dropped
+    frames = -(-length // hop) + 2
+    lead = tolerance + int(np.ceil(hop_in))
+    last_start = lead + int((frames - 1) * hop_in) + tolerance + frame
+    padded = np.zeros(max(last_start, lead + len(samples)), dtype=np.float32)
+    padded[lead : lead + len(samples)] = samples
+
+    output = np.zeros(frames * hop + frame, dtype=np.float32)
+    start = lead - int(round(hop_in))
+    output[:frame] += padded[start : start + frame] * window
+    for k in range(1, frames):
+        # Natural continuation of the frame just written
+        template = padded[start + hop : start + hop + frame]
+        nominal = lead + int(round((k - 1) * hop_in))
+        region = padded[nominal - tolerance : nominal + tolerance + frame]
+        start = nominal - tolerance + int(np.argmax(np.correlate(region, template)))
+        output[k * hop : k * hop + frame] += padded[start : start + frame] * window
+
+    return output[hop : hop + length]
+
+
+def stretch_to_speed(samples, sample_rate, from_speed, to_speed):
+    """Approximate audio synthesized at one speed as if spoken at another"""
+    return time_stretch(samples, to_speed / from_speed, sample_rate)
@@ -1,49 +1,280 @@
 import json
 import os
 import random
+from collections import Counter
+from contextlib import nullcontext
 
 import numpy as np
-import soundfile as sf
-from kokoro_onnx import Kokoro
 
-from config import DEFAULT_SENTENCE, TEMP_DIR, VOICES
+from artifacts import AudioWriter, write_audio_atomic
+from audio_index import save_audio_index
+from batching import BatchSynthesizer, supports_batching
+from cache import make_cache_key
+from config import (
+    BATCH_MAX_SIZE,
+    DEFAULT_ONNX_PROFILE,
+    DEFAULT_SENTENCE,
+    TEMP_DIR,
+    VOICES,
+)
+from metrics import record_sentence, time_stage
+from phonemes import get_sentence_phonemes
+from profiles import create_session, get_profile, resolve_model_variant
+from voices import get_voice_spec, load_voice_styles, resolve_voice
 
 
-def load_kokoro_model(model_file, voices_file):
-    """Load the Kokoro TTS model"""
+def load_kokoro_model(
+    model_file, voices_file, num_threads=None, profile=DEFAULT_ONNX_PROFILE
+):
+    """Load the Kokoro TTS model with an ONNX execution profile"""
+    # Imported here so that importing this module doesn't load ONNX Runtime
+    from kokoro_onnx import Kokoro
+
     try:
-        return Kokoro(model_file, voices_file)
+        settings = get_profile(profile)
+        if not settings and num_threads is None:
+            kokoro = Kokoro(model_file, voices_file)
+            kokoro.voices = load_voice_styles(voices_file)
+            return kokoro
+
+        # An explicit thread count keeps the session to one op at a time
+        if num_threads is not None:
+            settings = dict(settings, inter_op_threads=1)
+
+        variant_file = resolve_model_variant(model_file, settings.get("variant"))
+        session = create_session(variant_file, settings, num_threads)
+        kokoro = Kokoro.from_session(session, voices_file)
+        # Style vectors are mapped from the voices file, not copied per process
+        kokoro.voices = load_voice_styles(voices_file)
+        # Cache keys follow the model file, not the serialized optimized graph
+        kokoro.config.model_path = variant_file
+        return kokoro
     except Exception as e:
         raise Exception(f"Error loading model: {e}")
 
 
-def generate_audio_for_sentence(kokoro, sentence, sample_rate):
+def get_sentence_cache_key(kokoro, sentence):
+    """Get the synthesis cache key of a sentence for a loaded model"""
+    # Equivalent blends and named blends share the key of their normalized spec
+    sentence = dict(sentence, voice=get_voice_spec(sentence["voice"]))
+    return make_cache_key(sentence, kokoro.config.model_path, kokoro.config.voices_path)
+
+
+def generate_audio_for_sentence(kokoro, sentence, sample_rate, cache=None):
     """Generate audio for a single sentence"""
-    return kokoro.create(
-        sentence["text"],
-        voice=sentence["voice"],
-        speed=sentence["speed"],
-        lang=sentence["lang"],
-    )
+    if cache is None:
+        # Phonemize through the phoneme cache, so inference skips G2P
+        phonemes = get_sentence_phonemes(kokoro, sentence)
+        with time_stage("inference"):
+            return kokoro.create(
+                sentence["text"] if phonemes is None else phonemes,
+                voice=resolve_voice(kokoro, sentence["voice"]),
+                speed=sentence["speed"],
+                lang=sentence["lang"],
+                is_phonemes=phonemes is not None,
+            )
+
+    key = get_sentence_cache_key(kokoro, sentence)
+    cached = cache.get(key)
+    if cached is not None:
+        return cached
+
+    samples, sample_rate = generate_audio_for_sentence(kokoro, sentence, sample_rate)
+    return cache.put(key, samples, sample_rate)
+
 
+def generate_audio_for_sentences(kokoro, sentences, sample_rate, cache=None, pool=None):
+    """Generate audio for each sentence, synthesizing repeated sentences once"""
+    keys = [get_sentence_cache_key(kokoro, sentence) for sentence in sentences]
+    # Results are kept only until the last repeat of their sentence is yielded
+    remaining = Counter(keys)
+    generated = {}
 
-def save_sentence_audio(samples, sample_rate, idx, output_format="wav"):
+    # Without a worker pool, batch sentences when the model supports it
+    if pool is None and BATCH_MAX_SIZE > 1 and supports_batching(kokoro):
+        pool = BatchSynthesizer(kokoro)
+
+    # Fan the cache misses out to the pool (or batcher), which returns
+    # results in the order the misses first appear in the sentences
+    pending = {}
+    if pool is not None:
+        for key, sentence in zip(keys, sentences):
+            if key not in pending and (cache is None or not cache.contains(key)):
+                pending[key] = sentence
+    synthesized = zip(pending, pool.map(list(pending.values()))) if pending else None
+    # The batcher times phonemizing and inference itself, while waiting on
+    # worker processes is all inference
+    timed = not isinstance(pool, BatchSynthesizer)
+
+    for key, sentence in zip(keys, sentences):
+        if key not in generated:
+            if key in pending:
+                while key not in generated:
+                    with time_stage("inference") if timed else nullcontext():
+                        pending_key, (samples, rate) = next(synthesized)
+                    if cache is not None:
+                        samples, rate = cache.put(pending_key, samples, rate)
+                    generated[pending_key] = (samples, rate)
+            else:
+                generated[key] = generate_audio_for_sentence(
+                    kokoro, sentence, sample_rate, cache
+                )
+
+        result = generated[key]
+        remaining[key] -= 1
+        if not remaining[key]:
+            del generated[key]
+        record_sentence(sentence, *result)
+        yield result
+
+
+def save_sentence_audio(
+    samples,
+    sample_rate,
+    idx,
+    output_format="wav",
+    output_dir=TEMP_DIR,
+    output_rate=None,
+    bitrate=None,
+):
     """Save audio for a single sentence"""
-    temp_sent_file = os.path.join(TEMP_DIR, f"sentence_{idx}.{output_format}")
-    sf.write(temp_sent_file, samples, sample_rate)
-    return temp_sent_file
+    temp_sent_file = os.path.join(output_dir, f"sentence_{idx}.{output_format}")
+    return write_audio_atomic(
+        temp_sent_file, samples, sample_rate, output_rate, bitrate
+    )
 
 
 def generate_silence(sample_rate, min_pause, max_pause):
     """Generate silence between sentences"""
-    return np.zeros(int(random.uniform(min_pause, max_pause) * sample_rate))
+    return np.zeros(
+        int(random.uniform(min_pause, max_pause) * sample_rate), dtype=np.float32
+    )
 
 
-def save_final_audio(full_audio, sample_rate, output_format):
+def save_final_audio(
+    full_audio,
+    sample_rate,
+    output_format,
+    output_dir=TEMP_DIR,
+    output_rate=None,
+    bitrate=None,
+):
     """Save the complete audio file"""
-    full_path = os.path.join(TEMP_DIR, f"output.{output_format}")
-    sf.write(full_path, full_audio, sample_rate)
-    return full_path
+    full_path = os.path.join(output_dir, f"output.{output_format}")
+    return write_audio_atomic(full_path, full_audio, sample_rate, output_rate, bitrate)
+
+
+class RenderCancelled(Exception):
+    """Raised when a render is cancelled between sentences"""
+
+
+def assemble_audio(
+    sentence_audios,
+    count,
+    sample_rate,
+    min_pause,
+    max_pause,
+    output_format,
+    output_dir=TEMP_DIR,
+    on_progress=None,
+    should_cancel=None,
+    save_sentences=False,
+    output_rate=None,
+    bitrate=None,
+):
+    """Write sentence audio into one file with silence between sentences.
+
+    The start and end sample of each sentence go to an index sidecar, so
+    sentences can be sliced out of the final file later. Separate sentence
+    files are only written when save_sentences is set. With an output rate,
+    audio is resampled as it is written and offsets are in output samples.
+    """
+    sentence_files = []
+    offsets = []
+
+    # Samples go straight to the open output file, so only the current
+    # sentence is held in memory however long the program is
+    audio_file = os.path.join(output_dir, f"output.{output_format}")
+    writer = AudioWriter(
+        audio_file, sample_rate, output_rate=output_rate, bitrate=bitrate
+    )
+    try:
+        for idx, (samples, sample_rate) in enumerate(sentence_audios):
+            start = writer.frames
+            with time_stage("write_output"):
+                writer.write(samples)
+            offsets.append((start, writer.frames))
+
+            # Save individual sentence audio
+            if save_sentences:
+                with time_stage("save_sentence_audio"):
+                    sentence_files.append(
+                        save_sentence_audio(
+                            samples,
+                            sample_rate,
+                            idx,
+                            output_format,
+                            output_dir,
+                            output_rate,
+                            bitrate,
+                        )
+                    )
+
+            # Add silence between sentences (except for last sentence)
+            if idx < count - 1:
+                with time_stage("silence"):
+                    silence = generate_silence(sample_rate, min_pause, max_pause)
+                with time_stage("write_output"):
+                    writer.write(silence)
+
+            if on_progress:
+                on_progress(idx + 1, count)
+
+            if should_cancel and should_cancel():
+                raise RenderCancelled("Render cancelled")
+    except BaseException:
+        writer.abort()
+        raise
+
+    # Flush the encoder and move the file into place
+    with time_stage("save_final_audio"):
+        writer.close()
+    save_audio_index(audio_file, writer.sample_rate, offsets, bitrate)
+
+    return audio_file, sentence_files
+
+
+def render_audio(
+    kokoro,
+    sentences,
+    sample_rate,
+    min_pause,
+    max_pause,
+    output_format,
+    cache=None,
+    pool=None,
+    output_dir=TEMP_DIR,
+    on_progress=None,
+    should_cancel=None,
+    save_sentences=False,
+    output_rate=None,
+    bitrate=None,
+):
+    """Render sentences into one audio file with silence between them"""
+    return assemble_audio(
+        generate_audio_for_sentences(kokoro, sentences, sample_rate, cache, pool),
+        len(sentences),
+        sample_rate,
+        min_pause,
+        max_pause,
+        output_format,
+        output_dir,
+        on_progress,
+        should_cancel,
+        save_sentences,
+        output_rate,
+        bitrate,
+    )
 
 
 def get_voices_for_lang(lang):
@@ -0,0 +1,202 @@
+import hashlib
+import os
+import struct
+import threading
+import zipfile
+from collections import OrderedDict
+
+import numpy as np
+
+from cache import file_fingerprint
+from config import VOICE_BLEND_CACHE_SIZE, VOICE_BLENDS, VOICE_BLENDS_DIR
+
+# Fixed part of a zip local file header, followed by the name and extra field
+ZIP_LOCAL_HEADER_SIZE = 30
+
+
+def parse_voice_blend(spec):
+    """Parse "af_sarah:0.6,af_nicole:0.4" into (voice, weight) pairs summing to 1"""
+    weights = {}
+    for part in spec.split(","):
+        name, _, weight = part.strip().partition(":")
+        name = name.strip()
+        if not name:
+            raise ValueError(f"Invalid voice blend: {spec}")
+        try:
+            weight = float(weight) if weight.strip() else 1.0
+        except ValueError:
+            raise ValueError(f"Invalid voice weight in blend: {spec}")
+        if not np.isfinite(weight) or weight < 0:
+            raise ValueError(f"Invalid voice weight in blend: {spec}")
+        weights[name] = weights.get(name, 0.0) + weight
+
+    total = sum(weights.values())
+    if total <= 0:
+        raise ValueError(f"Voice blend weights must not all be zero: {spec}")
+    return sorted((name, weight / total) for name, weight in weights.items() if weight)
+
+
+def normalize_voice_spec(spec):
+    """Canonical form of a voice or blend, so equal blends share one cache entry"""
+    blend = parse_voice_blend(spec)
+    if len(blend) == 1:
+        return blend[0][0]
+    return ",".join(f"{name}:{round(weight, 4):g}" for name, weight in blend)
+
+
+def get_voice_spec(voice):
+    """Expand a named blend and normalize the result"""
+    return normalize_voice_spec(VOICE_BLENDS.get(voice, voice))
+
+
+def is_voice_blend(spec):
+    """Check whether a normalized spec mixes several voices"""
+    return "," in spec
+
+
+def load_voice_styles(voices_file):
+    """Memory-map the style arrays of a voices file, keyed by voice name.
+
+    The voices file is an .npz archive. Stored members are mapped in place,
+    so every process reading them shares the same pages instead of holding
+    its own copy; compressed members are read into memory.
+    """
+    styles = {}
+    with zipfile.ZipFile(voices_file) as archive, open(voices_file, "rb") as f:
+        for info in archive.infolist():
+            name = info.filename.removesuffix(".npy")
+            if info.compress_type != zipfile.ZIP_STORED:
+                with archive.open(info) as member:
+                    styles[name] = np.load(member)
+                continue
+
+            f.seek(info.header_offset)
+            header = f.read(ZIP_LOCAL_HEADER_SIZE)
+            name_length, extra_length = struct.unpack("<HH", header[26:30])
+            f.seek(info.header_offset + len(header) + name_length + extra_length)
+
+            version = np.lib.format.read_magic(f)
+            if version == (1, 0):
+                shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+            else:
+                shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+            styles[name] = np.memmap(
+                voices_file,
+                dtype=dtype,
+                mode="r",
+                offset=f.tell(),
+                shape=shape,
+                order="F" if fortran_order else "C",
+            )
+    return styles
+
+
+def blend_voice_styles(styles, blend):
+    """Weighted sum of the style vectors of a blend"""
+    missing = [name for name, _ in blend if name not in styles]
+    if missing:
+        raise ValueError(f"Unknown voice: {', '.join(missing)}")
+
+    weights = np.array([weight for _, weight in blend], dtype=np.float32)
+    stacked = np.stack([styles[name] for name, _ in blend]).astype(np.float32)
+    return np.tensordot(weights, stacked, axes=1)
+
+
+class VoiceBlendCache:
+    """LRU cache of blended style vectors, keyed by voices file and blend spec"""
+
+    def __init__(
+        self,
+        max_entries=VOICE_BLEND_CACHE_SIZE,
+        blends_dir=VOICE_BLENDS_DIR,
+        named_blends=VOICE_BLENDS,
+    ):
+        self.max_entries = max_entries
+        self.blends_dir = blends_dir
+        self.named_blends = named_blends
+
+        self._lock = threading.Lock()
+        self._blends = OrderedDict()
+
+    def _path(self, fingerprint, spec):
+        payload = repr((fingerprint, spec))
+        digest = hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+        return os.path.join(self.blends_dir, f"{digest}.npy")
+
+    def _load_persisted(self, path):
+        try:
+            return np.load(path, mmap_mode="r")
+        except (OSError, ValueError):
+            return None
+
+    def _persist(self, path, style):
+        """Save a blend for later startups, best effort"""
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(self.blends_dir, exist_ok=True)
+            with open(temp_path, "wb") as f:
+                np.save(f, style)
+            os.replace(temp_path, path)
+        except OSError:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    def get(self, kokoro, spec, persist=False):
+        """Get the style vector of a normalized blend for a loaded model"""
+        fingerprint = tuple(file_fingerprint(kokoro.config.voices_path))
+        key = (fingerprint, spec)
+        with self._lock:
+            if key in self._blends:
+                self._blends.move_to_end(key)
+                return self._blends[key]
+
+        path = self._path(fingerprint, spec)
+        style = self._load_persisted(path) if persist else None
+        if style is None:
+            style = blend_voice_styles(kokoro.voices, parse_voice_blend(spec))
+            style.flags.writeable = False
+            if persist:
+                self._persist(path, style)
+
+        with self._lock:
+            self._blends[key] = style
+            self._blends.move_to_end(key)
+            while len(self._blends) > self.max_entries:
+                self._blends.popitem(last=False)
+        return style
+
+    def preload(self, kokoro):
+        """Load or compute the named blends so the first request doesn't wait"""
+        if getattr(kokoro, "voices", None) is None:
+            return
+        for spec in self.named_blends.values():
+            spec = normalize_voice_spec(spec)
+            if is_voice_blend(spec):
+                self.get(kokoro, spec, persist=True)
+
+    def clear(self):
+        """Drop every blend held in memory"""
+        with self._lock:
+            self._blends.clear()
+
+
+# Shared blend cache used by the API and the Streamlit app
+voice_blend_cache = VoiceBlendCache()
+
+
+def get_voice_style(kokoro, voice):
+    """Get the style vector of a voice, named blend or blend spec"""
+    spec = get_voice_spec(voice)
+    if is_voice_blend(spec):
+        return voice_blend_cache.get(kokoro, spec, persist=voice in VOICE_BLENDS)
+    if spec not in kokoro.voices:
+        raise ValueError(f"Unknown voice: {spec}")
+    return kokoro.voices[spec]
+
+
+def resolve_voice(kokoro, voice):
+    """Get what kokoro.create takes: the voice name, or a blended style vector"""
+    spec = get_voice_spec(voice)
+    if is_voice_blend(spec):
+        return voice_blend_cache.get(kokoro, spec, persist=voice in VOICE_BLENDS)
+    return spec